@@ -12,15 +12,18 @@ def analyse_habits(choice: str, **kwargs) -> list:
     Receives stored habits, performs different analysis task on them and returns the result as a list.
 
     User choices to analyse the habits are "Currently tracked habits.", "Paused habits.",
-    "All habits with same period.", "Habit with longest streak.", "Completed tasks."
+    "All habits with same period.", "Habit with longest streak.", "Completed tasks.",
+    "Completions per week."
 
     Parameters:
         choice (str): The chosen analysis task
         kwargs:
             "active_habits": list of all habit instances with active status
             "inactive_habits": list of all habit instances with inactive status
-            "completed_tasks": list of all task instances saved for a specific habit
+            "completed_tasks": iterable of the task instances saved for a specific habit, e.g. one page of them
+            "first_number": number of the first task in completed_tasks (default 1)
             "period": periodicity in days as integer
+            "weekly_completions": dict of completed tasks by tuple of ISO year and ISO week number
 
     Return:
         (list): The result of the analysis
@@ -28,7 +31,9 @@ def analyse_habits(choice: str, **kwargs) -> list:
     active_habits = kwargs.get("active_habits")
     inactive_habits = kwargs.get("inactive_habits")
     completed_tasks = kwargs.get("completed_tasks")
+    first_number = kwargs.get("first_number", 1)
     period = kwargs.get("period", int)
+    weekly_completions = kwargs.get("weekly_completions")
     if choice == "Currently tracked habits.":
         return [
             f"""{habit.name}:
@@ -55,4 +60,9 @@ def analyse_habits(choice: str, **kwargs) -> list:
         return [f"{habit.name} with {habit.longest_streak} times" for habit in record_habits]
 
     elif choice == "Completed tasks.":
-        return [f"{completed_tasks.index(task) + 1}. Task. Completed on: {task.created}" for task in completed_tasks]
+        return [f"{number}. Task. Completed on: {task.created}"
+                for number, task in enumerate(completed_tasks, start=first_number)]
+
+    elif choice == "Completions per week.":
+        return [f"Week {week} of {year}: {completions} completed tasks"
+                for (year, week), completions in weekly_completions.items()]
@@ -0,0 +1,80 @@
+"""
+Compacts the completion history of a habit into a small binary representation for cold storage.
+
+The creation datetimes of the archived tasks are stored as seconds since the epoch, delta encoded
+(each value is the distance to its predecessor) and compressed with zlib. Regular completions
+produce nearly identical deltas, which compress to a few bytes per period.
+
+Functions:
+    compress_history(created_datetimes) -> bytes
+        Returns the compressed history of the given creation datetimes.
+    decompress_history(history) -> list
+        Returns the creation datetimes stored in a compressed history in ascending order.
+    merge_histories(history, created_datetimes) -> bytes
+        Returns a compressed history containing the stored and the given creation datetimes.
+"""
+import sys
+import zlib
+from array import array
+from db import datetime_to_epoch, epoch_to_datetime
+
+
+def compress_history(created_datetimes) -> bytes:
+    """
+    Returns the compressed history of the given creation datetimes.
+
+    Param:
+        created_datetimes: iterable
+            Creation datetimes of the archived tasks in any order
+
+    Return:
+        bytes
+            Delta encoded and zlib compressed seconds since the epoch
+    """
+    epochs = sorted(datetime_to_epoch(created) for created in created_datetimes)
+    deltas = array("q", [epoch - previous for previous, epoch in zip([0] + epochs, epochs)])
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return zlib.compress(deltas.tobytes(), 9)
+
+
+def decompress_history(history: bytes) -> list:
+    """
+    Returns the creation datetimes stored in a compressed history in ascending order.
+
+    Param:
+        history: bytes
+            History as returned by compress_history
+
+    Return:
+        list
+            Creation datetimes of the archived tasks
+    """
+    deltas = array("q")
+    deltas.frombytes(zlib.decompress(history))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    created_datetimes = []
+    epoch = 0
+    for delta in deltas:
+        epoch += delta
+        created_datetimes.append(epoch_to_datetime(epoch))
+    return created_datetimes
+
+
+def merge_histories(history: bytes, created_datetimes) -> bytes:
+    """
+    Returns a compressed history containing the stored and the given creation datetimes.
+
+    Params:
+        history: bytes
+            History as returned by compress_history or None if nothing is archived yet
+        created_datetimes: iterable
+            Creation datetimes of the tasks to add to the history
+
+    Return:
+        bytes
+            Compressed history of all creation datetimes
+    """
+    archived = decompress_history(history) if history is not None else []
+    return compress_history(archived + list(created_datetimes))
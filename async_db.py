@@ -0,0 +1,219 @@
+"""
+Contains the AsyncDatabase class, an asyncio counterpart of the db_logic and user_logic functions.
+
+The functions run on a pool of worker threads, each with its own connection to the database in
+write-ahead log mode. Readers therefore run in parallel and do not wait for each other or for the
+writer, the event loop is never blocked by SQLite:
+
+    async with AsyncDatabase("main.db") as database:
+        habits = await database.get_all_habits("test user 1", True)
+
+Class:
+    AsyncDatabase
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import date, datetime
+from itertools import islice
+import db_logic
+import user_logic
+from db import get_db, PROFILES
+from habit import Habit
+from user import User
+
+
+class AsyncDatabase:
+    """
+    Class to run the db_logic and user_logic functions from coroutines without blocking the event loop.
+
+    Every method is the awaitable counterpart of the function with the same name, takes the same
+    arguments except the database, and returns the same Habit, Task, and User instances.
+
+    Attributes:
+        name: str
+            Name of the database file
+        workers: int
+            Number of worker threads, each with its own connection
+
+    Methods:
+        close()
+            Waits for all pending calls and closes the connections
+        get_habit_by_name(name, user_name, streaks_from_bitmap=False) -> Habit
+        get_habits_by_names(names, user_name) -> list
+        get_all_habits(user_name, is_active, streaks_from_bitmap=False) -> list
+        search_habits(user_name, query, limit=10, is_active=None) -> list
+        add_habit(habit, user_name)
+        remove_habit(name, user_name)
+        get_all_tasks(habit_name, user_name) -> list
+        iterate_completed_tasks(habit_name, user_name, first_day=None, last_day=None, page_size=500)
+        archive_tasks(periods=52, now=None) -> int
+        update_streaks(name, user_name, completed=None)
+        update_active_status(name, user_name, new_active_status)
+        import_habits(habits, user_name=None, chunk_size=10000) -> dict
+        import_tasks(tasks, habit_id=None, chunk_size=10000) -> dict
+        validate_password(user_name, password) -> bool
+        get_user_by_name(user_name) -> User
+        add_user(user)
+        remove_user(active_user, user_name)
+        get_all_users() -> list
+        get_users_page(after: str = None, limit: int = 20, name_prefix: str = None) -> list
+    """
+
+    def __init__(self, name: str = "main.db", workers: int = 4, profile: str = "throughput"):
+        """
+        Constructor for an AsyncDatabase instance.
+
+        Params:
+            name: str
+                Name of the database file, in-memory databases can not be shared between threads
+            workers: int
+                Number of worker threads, each with its own connection (default 4)
+            profile: str
+                Name of a tuning profile of db.PROFILES with write-ahead log (default "throughput")
+        """
+        assert name != ":memory:", "An in-memory database can not be shared between worker threads"
+        assert workers >= 1, f"Number of workers {workers} has to be greater or equal than one"
+        assert PROFILES[profile]["journal_mode"] == "wal", f"Profile {profile} does not use a write-ahead log"
+
+        self.name = name
+        self.workers = workers
+        self.__profile = profile
+        self.__local = threading.local()
+        self.__connections = []
+        self.__connections_lock = threading.Lock()
+        # Creates or upgrades the schema once before the workers open their connections.
+        get_db(name, profile).close()
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-db",
+                                             initializer=self.__connect)
+
+    def close(self):
+        """Waits for all pending calls and closes the connections."""
+        self.__executor.shutdown(wait=True)
+        with self.__connections_lock:
+            for db in self.__connections:
+                db.close()
+            self.__connections.clear()
+
+    async def get_habit_by_name(self, name: str, user_name: str, streaks_from_bitmap: bool = False) -> Habit or None:
+        """Awaitable counterpart of db_logic.get_habit_by_name."""
+        return await self.__run(db_logic.get_habit_by_name, name, user_name, streaks_from_bitmap)
+
+    async def get_habits_by_names(self, names: list, user_name: str) -> list:
+        """Awaitable counterpart of db_logic.get_habits_by_names."""
+        return await self.__run(db_logic.get_habits_by_names, names, user_name)
+
+    async def get_all_habits(self, user_name: str, is_active: bool, streaks_from_bitmap: bool = False) -> list:
+        """Awaitable counterpart of db_logic.get_all_habits."""
+        return await self.__run(db_logic.get_all_habits, user_name, is_active, streaks_from_bitmap)
+
+    async def search_habits(self, user_name: str, query: str, limit: int = 10, is_active: bool = None) -> list:
+        """Awaitable counterpart of db_logic.search_habits."""
+        return await self.__run(db_logic.search_habits, user_name, query, limit, is_active)
+
+    async def add_habit(self, habit: Habit, user_name: str):
+        """Awaitable counterpart of db_logic.add_habit."""
+        await self.__run(db_logic.add_habit, habit, user_name)
+
+    async def remove_habit(self, name: str, user_name: str):
+        """Awaitable counterpart of db_logic.remove_habit."""
+        await self.__run(db_logic.remove_habit, name, user_name)
+
+    async def get_all_tasks(self, habit_name: str, user_name: str) -> list:
+        """Awaitable counterpart of db_logic.get_all_tasks."""
+        return await self.__run(db_logic.get_all_tasks, habit_name, user_name)
+
+    async def iterate_completed_tasks(self, habit_name: str, user_name: str, first_day: date = None,
+                                      last_day: date = None, page_size: int = 500):
+        """
+        Asynchronous generator counterpart of db_logic.iterate_completed_tasks.
+
+        The generator keeps reading from the same connection between two pages, so it gets a connection of its own
+        instead of sharing the connection of a worker thread. Every page is read in a worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        db = await loop.run_in_executor(
+            self.__executor, partial(get_db, self.name, self.__profile, check_same_thread=False)
+        )
+        tasks = db_logic.iterate_completed_tasks(db, habit_name, user_name, first_day, last_day, page_size)
+        try:
+            while page := await loop.run_in_executor(self.__executor, partial(self.__read_page, tasks, page_size)):
+                for task in page:
+                    yield task
+        finally:
+            tasks.close()
+            db.close()
+
+    async def archive_tasks(self, periods: int = 52, now: datetime = None) -> int:
+        """Awaitable counterpart of db_logic.archive_tasks."""
+        return await self.__run(db_logic.archive_tasks, periods, now)
+
+    async def update_streaks(self, name: str, user_name: str, completed: datetime = None):
+        """Awaitable counterpart of db_logic.update_streaks."""
+        await self.__run(db_logic.update_streaks, name, user_name, completed)
+
+    async def update_active_status(self, name: str, user_name: str, new_active_status: bool):
+        """Awaitable counterpart of db_logic.update_active_status."""
+        await self.__run(db_logic.update_active_status, name, user_name, new_active_status)
+
+    async def import_habits(self, habits, user_name: str = None, chunk_size: int = 10000) -> dict:
+        """Awaitable counterpart of db_logic.import_habits, the habits are consumed in a worker thread."""
+        return await self.__run(db_logic.import_habits, habits, user_name, chunk_size)
+
+    async def import_tasks(self, tasks, habit_id: str = None, chunk_size: int = 10000) -> dict:
+        """Awaitable counterpart of db_logic.import_tasks, the tasks are consumed in a worker thread."""
+        return await self.__run(db_logic.import_tasks, tasks, habit_id, chunk_size)
+
+    async def validate_password(self, user_name: str, password: str) -> bool:
+        """Awaitable counterpart of user_logic.validate_password."""
+        return await self.__run(user_logic.validate_password, user_name, password)
+
+    async def get_user_by_name(self, user_name: str) -> User or None:
+        """Awaitable counterpart of user_logic.get_user_by_name."""
+        return await self.__run(user_logic.get_user_by_name, user_name)
+
+    async def add_user(self, user: User):
+        """Awaitable counterpart of user_logic.add_user."""
+        await self.__run(user_logic.add_user, user)
+
+    async def remove_user(self, active_user: str, user_name: str):
+        """Awaitable counterpart of user_logic.remove_user."""
+        await self.__run(user_logic.remove_user, active_user, user_name)
+
+    async def get_all_users(self) -> list:
+        """Awaitable counterpart of user_logic.get_all_users."""
+        return await self.__run(user_logic.get_all_users)
+
+    async def get_users_page(self, after: str = None, limit: int = 20, name_prefix: str = None) -> list:
+        """Awaitable counterpart of user_logic.get_users_page."""
+        return await self.__run(user_logic.get_users_page, after, limit, name_prefix)
+
+    async def __run(self, function, *args):
+        # Runs a function with the connection of a worker thread and waits for its result without blocking.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, partial(self.__call, function, *args))
+
+    @staticmethod
+    def __read_page(tasks, page_size):
+        # Returns the next tasks of a task generator, an empty list once the generator is exhausted.
+        return list(islice(tasks, page_size))
+
+    def __call(self, function, *args):
+        # Calls a function with the connection of the current worker thread.
+        return function(self.__local.db, *args)
+
+    def __connect(self):
+        # Opens the connection of a new worker thread, the connection is closed by close() after the thread ended.
+        self.__local.db = get_db(self.name, self.__profile, check_same_thread=False)
+        with self.__connections_lock:
+            self.__connections.append(self.__local.db)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{self.name}', '{self.workers}')"
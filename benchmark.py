@@ -0,0 +1,278 @@
+"""
+Measures the performance of the database functionalities and prints the results as JSON.
+
+The benchmarks run on a temporary database that is removed afterwards:
+
+    python benchmark.py --habits 20 --years 10
+
+The suite measures the functions behind the user interface on synthetic datasets of growing size and
+writes the results to a JSON file, which can be compared between commits:
+
+    python benchmark.py --suite --scales 1000 100000 1000000 --output benchmark_results.json
+
+Functions:
+    benchmark_streaks(habits=20, years=10, repeats=5) -> dict
+        Compares counting the task rows of a habit with computing its streaks from the completion bitmap.
+    benchmark_sweep(habits=1000000, overdue_share=0.1) -> dict
+        Measures how long expiring the overdue habits takes.
+    benchmark_suite(scales=(1000, 100000, 1000000), samples=200, history_days=28, seed=42) -> dict
+        Measures the latencies of the functions behind the user interface on generated datasets of several sizes.
+    main(args=None)
+        Runs the benchmarks requested by the command line arguments.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from db import get_db, store_habit_items, store_task_items, get_tasks_by_habit_name, unit_of_work
+from db_logic import get_habit_by_name, get_completion_bitmap, expire_overdue_habits, get_all_habits, \
+    update_streaks, update_active_status, build_missing_completion_bitmaps
+from user_logic import validate_password
+from analysis import analyse_habits
+from setup import generate_dataset
+
+
+def benchmark_streaks(habits: int = 20, years: int = 10, repeats: int = 5) -> dict:
+    """
+    Compares counting the task rows of a habit with computing its streaks from the completion bitmap.
+
+    Every habit is daily and was completed every day except every 30th day over the given number of years.
+
+    Params:
+        habits: int
+            Number of habits (default 20)
+        years: int
+            Length of the history of each habit in years (default 10)
+        repeats: int
+            Number of times all habits are read, the fastest run is reported (default 5)
+
+    Return:
+        dict
+            Number of tasks per habit and the seconds per habit for both ways
+    """
+    with __temporary_db() as db:
+        days = years * 365
+        created = datetime.now().replace(microsecond=0) - timedelta(days=days)
+        with unit_of_work(db):
+            store_habit_items(db, [
+                (f"habit {number}", f"habit {number}", "benchmark user", created, 1, created + timedelta(days=days + 1),
+                 True, 0, 0)
+                for number in range(habits)
+            ])
+            store_task_items(db, [
+                (f"{number} {day}", created + timedelta(days=day, hours=8), f"habit {number}")
+                for number in range(habits) for day in range(days) if day % 30 != 29
+            ])
+        habit_entities = [get_habit_by_name(db, f"habit {number}", "benchmark user") for number in range(habits)]
+        build_missing_completion_bitmaps(db, "benchmark user")
+
+        def count_rows():
+            for habit in habit_entities:
+                len(get_tasks_by_habit_name(db, habit.name, "benchmark user"))
+
+        def compute_from_bitmap():
+            for habit in habit_entities:
+                completion_bitmap = get_completion_bitmap(db, habit, "benchmark user")
+                completion_bitmap.current_streak()
+                completion_bitmap.longest_streak()
+
+        return {
+            "habits": habits,
+            "tasks_per_habit": len(get_tasks_by_habit_name(db, "habit 0", "benchmark user")),
+            "row_count_seconds_per_habit": __fastest(count_rows, repeats) / habits,
+            "bitmap_seconds_per_habit": __fastest(compute_from_bitmap, repeats) / habits
+        }
+
+
+def benchmark_sweep(habits: int = 1000000, overdue_share: float = 0.1) -> dict:
+    """
+    Measures how long expiring the overdue habits takes.
+
+    Params:
+        habits: int
+            Number of stored habits (default 1000000)
+        overdue_share: float
+            Share of the habits that missed their deadline (default 0.1)
+
+    Return:
+        dict
+            Number of habits, number of expired habits, and the seconds of the sweep
+    """
+    with __temporary_db() as db:
+        now = datetime.now().replace(microsecond=0)
+        overdue_every = round(1 / overdue_share) if overdue_share > 0 else habits + 1
+        with unit_of_work(db):
+            store_habit_items(db, (
+                (str(number), f"habit {number}", f"user {number // 10}", now - timedelta(days=30), 1 + number % 7,
+                 now + timedelta(days=-3 if number % overdue_every == 0 else 3), True, 5, 5)
+                for number in range(habits)
+            ))
+        start = time.perf_counter()
+        expired = expire_overdue_habits(db, now)
+        return {
+            "habits": habits,
+            "expired": expired,
+            "seconds": time.perf_counter() - start
+        }
+
+
+def benchmark_suite(scales: tuple = (1000, 100000, 1000000), samples: int = 200, history_days: int = 28,
+                    seed: int = 42) -> dict:
+    """
+    Measures the latencies of the functions behind the user interface on generated datasets of several sizes.
+
+    For every scale a new dataset with about that many habits, ten per user on average, is generated with
+    setup.generate_dataset. Every function is then called for randomly drawn users and habits of the dataset.
+
+    Params:
+        scales: tuple
+            Approximate numbers of habits of the datasets (default (1000, 100000, 1000000))
+        samples: int
+            Number of calls per function and scale (default 200)
+        history_days: int
+            Length of the history of the generated habits in days (default 28)
+        seed: int
+            Seed of the datasets and of the drawn users and habits (default 42)
+
+    Return:
+        dict
+            Environment of the run and per scale the generated dataset and the latencies of every function
+    """
+    results = {
+        "commit": __current_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "samples": samples,
+        "scales": {}
+    }
+    for scale in scales:
+        with __temporary_db() as db:
+            users = max(1, scale // 10)
+            dataset = generate_dataset(db, users=users, periods=(1, 7, 28), history_days=history_days, seed=seed)
+            random_numbers = random.Random(seed)
+            user_names = [f"user {random_numbers.randrange(users)}" for _ in range(samples)]
+            # "habit 0" is the only habit every generated user is guaranteed to have.
+            habits = {
+                user_name: get_habit_by_name(db, "habit 0", user_name) for user_name in dict.fromkeys(user_names)
+            }
+            passwords = {user_name: hashlib.sha3_256(user_name.encode()).hexdigest() for user_name in habits}
+            is_active = {user_name: habit.is_active for user_name, habit in habits.items()}
+            now = datetime.now().replace(microsecond=0)
+
+            def toggle_active_status(user_name):
+                is_active[user_name] = not is_active[user_name]
+                update_active_status(db, "habit 0", user_name, is_active[user_name])
+
+            operations = {
+                "login": lambda user_name: validate_password(db, user_name, passwords[user_name]),
+                "get_all_habits": lambda user_name: get_all_habits(db, user_name, True),
+                "get_habit_by_name": lambda user_name: get_habit_by_name(db, "habit 0", user_name),
+                "analyse_habits": lambda user_name: analyse_habits(
+                    "Habit with longest streak.", active_habits=get_all_habits(db, user_name, True)),
+                "update_streaks": lambda user_name: update_streaks(db, "habit 0", user_name, now),
+                "update_active_status": toggle_active_status
+            }
+            results["scales"][str(scale)] = {
+                "dataset": dataset,
+                "operations": {
+                    name: __latencies(operation, user_names) for name, operation in operations.items()
+                }
+            }
+    return results
+
+
+def main(args=None):
+    """
+    Runs the benchmarks requested by the command line arguments.
+
+    Param:
+        args: list
+            Command line arguments (default None reads them from sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the database functionalities.")
+    parser.add_argument("--habits", type=int, default=20, help="number of habits (default 20)")
+    parser.add_argument("--years", type=int, default=10, help="length of the history in years (default 10)")
+    parser.add_argument("--repeats", type=int, default=5, help="number of repetitions (default 5)")
+    parser.add_argument("--sweep-habits", type=int, default=1000000,
+                        help="number of habits of the sweep benchmark (default 1000000)")
+    parser.add_argument("--suite", action="store_true", help="run the benchmark suite instead")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="approximate numbers of habits of the suite datasets (default 1000 100000 1000000)")
+    parser.add_argument("--samples", type=int, default=200, help="calls per function of the suite (default 200)")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="file the suite results are written to (default benchmark_results.json)")
+    arguments = parser.parse_args(args)
+    if arguments.suite:
+        results = benchmark_suite(tuple(arguments.scales), arguments.samples)
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=4)
+        print(json.dumps(results, indent=4))
+        return
+    results = {
+        "streaks": benchmark_streaks(arguments.habits, arguments.years, arguments.repeats),
+        "sweep": benchmark_sweep(arguments.sweep_habits)
+    }
+    print(json.dumps(results, indent=4))
+
+
+@contextmanager
+def __temporary_db():
+    # Yields a connection to a new database file, the file is removed afterwards.
+    directory = tempfile.mkdtemp()
+    db = get_db(os.path.join(directory, "benchmark.db"), "throughput")
+    try:
+        yield db
+    finally:
+        db.close()
+        for file_name in os.listdir(directory):
+            os.remove(os.path.join(directory, file_name))
+        os.rmdir(directory)
+
+
+def __latencies(operation, user_names) -> dict:
+    # Calls the operation once per user name and returns the mean and percentiles of the latencies in milliseconds.
+    timings = []
+    for user_name in user_names:
+        start = time.perf_counter()
+        operation(user_name)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "p50_ms": round(timings[int(len(timings) * 0.50)], 4),
+        "p95_ms": round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 4),
+        "p99_ms": round(timings[min(int(len(timings) * 0.99), len(timings) - 1)], 4)
+    }
+
+
+def __current_commit():
+    # Returns the hash of the checked out git commit or None outside of a git repository.
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def __fastest(function, repeats: int) -> float:
+    # Returns the fastest of several runs of a function in seconds.
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Contains the CompletionBitmap class."""
+from datetime import datetime, timedelta
+
+
+class CompletionBitmap:
+    """
+    Class to represent the completions of a habit as one bit per period since the creation of the habit.
+
+    Period N covers the time from created + N * period days up to the next period. The bit of a period
+    is set once at least one task was completed in it, so streaks and rates are computed with bit
+    operations instead of counting the stored tasks.
+
+    Attributes:
+        created: datetime
+            Date and time of the creation of the habit
+        period: int
+            Periodicity of the habit in days
+        bits: bytearray
+            One bit per period, period N is bit N % 8 of byte N // 8
+
+    Methods:
+        period_of(moment: datetime) -> int
+            Returns the number of the period a moment falls into
+        mark(completed: datetime)
+            Sets the bit of the period in which a task was completed
+        is_completed(period_number: int) -> bool
+            Returns True if a task was completed in the given period
+        current_streak(now: datetime = None) -> int
+            Returns the number of consecutive completed periods up to now
+        longest_streak() -> int
+            Returns the highest number of consecutive completed periods
+        completion_rate(now: datetime = None) -> float
+            Returns the share of completed periods from creation up to now
+        to_bytes() -> bytes
+            Returns the bits for storage in the database
+    """
+
+    def __init__(self, created: datetime, period: int, bits: bytes = b""):
+        """
+        Constructor for a CompletionBitmap instance.
+
+        Params:
+            created: datetime
+                Date and time of the creation of the habit
+            period: int
+                Periodicity of the habit in days
+            bits: bytes
+                Stored bits as returned by to_bytes (default empty)
+        """
+        assert period >= 1, f"Period {period} has to be greater or equal than one"
+
+        self.created = created
+        self.period = period
+        self.bits = bytearray(bits)
+
+    def period_of(self, moment: datetime) -> int:
+        """
+        Returns the number of the period a moment falls into.
+
+        Param:
+            moment: datetime
+                Date and time not before the creation of the habit
+
+        Return:
+            int
+                Number of the period, the first period is 0
+        """
+        assert moment >= self.created, f"{moment} is before the creation of the habit"
+        return (moment - self.created) // timedelta(days=self.period)
+
+    def mark(self, completed: datetime):
+        """
+        Sets the bit of the period in which a task was completed.
+
+        Param:
+            completed: datetime
+                Date and time of the completion
+        """
+        period_number = self.period_of(completed)
+        if period_number // 8 >= len(self.bits):
+            self.bits.extend(bytes(period_number // 8 + 1 - len(self.bits)))
+        self.bits[period_number // 8] |= 1 << period_number % 8
+
+    def is_completed(self, period_number: int) -> bool:
+        """
+        Returns True if a task was completed in the given period.
+
+        Param:
+            period_number: int
+                Number of the period, the first period is 0
+
+        Return:
+            bool
+        """
+        if period_number < 0 or period_number // 8 >= len(self.bits):
+            return False
+        return bool(self.bits[period_number // 8] >> period_number % 8 & 1)
+
+    def current_streak(self, now: datetime = None) -> int:
+        """
+        Returns the number of consecutive completed periods up to now.
+
+        A current period without completion does not break the streak, as its deadline has not passed yet.
+
+        Param:
+            now: datetime
+                Moment up to which the streak is counted (default None uses the current time)
+
+        Return:
+            int
+        """
+        last = self.period_of(now or datetime.now())
+        if not self.is_completed(last):
+            last -= 1
+        if last < 0:
+            return 0
+        value = self.__as_int() & ((1 << last + 1) - 1)
+        # The streak ends at the highest period up to the last one that was not completed.
+        return last + 1 - (~value & ((1 << last + 1) - 1)).bit_length()
+
+    def longest_streak(self) -> int:
+        """
+        Returns the highest number of consecutive completed periods.
+
+        Return:
+            int
+        """
+        value = self.__as_int()
+        longest = 0
+        # Each shift shortens every run of set bits by one, the number of steps is the longest run.
+        while value:
+            value &= value >> 1
+            longest += 1
+        return longest
+
+    def completion_rate(self, now: datetime = None) -> float:
+        """
+        Returns the share of completed periods from creation up to now.
+
+        Param:
+            now: datetime
+                Moment up to which the periods are counted (default None uses the current time)
+
+        Return:
+            float
+                Share between 0 and 1
+        """
+        periods = self.period_of(now or datetime.now()) + 1
+        value = self.__as_int() & ((1 << periods) - 1)
+        return bin(value).count("1") / periods
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the bits for storage in the database.
+
+        Return:
+            bytes
+        """
+        return bytes(self.bits)
+
+    def __as_int(self):
+        # Returns the bits as one integer, period N is bit N.
+        return int.from_bytes(self.bits, "little")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{self.created}', '{self.period}', '{self.bits.hex()}')"
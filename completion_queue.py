@@ -0,0 +1,201 @@
+"""
+Contains the CompletionQueue class, which stores completed tasks in the background in batches.
+
+Completing a task with db_logic.update_streaks reads and writes the habit and commits right away.
+With a CompletionQueue the completion is only queued and a writer thread applies the queued
+completions in order, many of them in a single transaction:
+
+    completions = CompletionQueue("main.db", flush_interval=0.5, max_batch=500)
+    completions.complete("go running", "test user 1")
+    completions.flush()
+    completions.close()
+
+Completions that are queued but not yet written are lost if the process ends without close().
+If the writer connection can not be opened, the constructor raises the error. If the writer thread
+stops because of an error, complete() and flush() raise a CompletionQueueError.
+
+Class:
+    CompletionQueue
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from db import get_db, unit_of_work
+from db_logic import update_streaks
+from custom_exceptions import CompletionQueueError
+
+
+class CompletionQueue:
+    """
+    Class to queue completed tasks and to write them in batches with a background thread.
+
+    The completions are applied in the order they were queued with the time they were queued,
+    so the streaks are the same as if db_logic.update_streaks had been called directly.
+
+    Attributes:
+        name: str
+            Name of the database file
+        flush_interval: float
+            Seconds a completion waits at most before it is written
+        max_batch: int
+            Highest number of completions written in one transaction
+        errors: list
+            Tuples of habit name, user name, completion time, and exception of the completions that failed
+
+    Methods:
+        complete(name: str, user_name: str, completed: datetime = None)
+            Queues the completion of a task of a habit
+        flush()
+            Waits until all queued completions are written, returns right away after close()
+        close()
+            Writes all queued completions and stops the writer thread
+    """
+
+    __FLUSH = object()
+    __CLOSE = object()
+
+    def __init__(self, name: str = "main.db", flush_interval: float = 0.5, max_batch: int = 500,
+                 profile: str = None):
+        """
+        Constructor for a CompletionQueue instance, the writer thread is started right away.
+
+        The constructor waits until the writer thread has opened its connection and raises the error if it could not.
+
+        Params:
+            name: str
+                Name of the database file (default "main.db")
+            flush_interval: float
+                Seconds a completion waits at most before it is written (default 0.5)
+            max_batch: int
+                Highest number of completions written in one transaction (default 500)
+            profile: str
+                Name of the tuning profile of the writer connection (default None)
+        """
+        assert flush_interval > 0, f"Flush interval {flush_interval} has to be greater than zero"
+        assert max_batch >= 1, f"Max batch {max_batch} has to be greater or equal than one"
+
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.errors = []
+        self.__profile = profile
+        self.__completions = queue.Queue()
+        self.__closed = False
+        self.__lock = threading.Lock()
+        self.__stopped = False
+        self.__error = None
+        started = threading.Event()
+        self.__writer = threading.Thread(target=self.__write, args=(started,), name="completion-queue", daemon=True)
+        self.__writer.start()
+        started.wait()
+        if self.__error is not None:
+            self.__writer.join()
+            raise self.__error
+
+    def complete(self, name: str, user_name: str, completed: datetime = None):
+        """
+        Queues the completion of a task of a habit.
+
+        Params:
+            name: str
+                Name of the habit
+            user_name: str
+                Name of the user to which the habit belongs
+            completed: datetime
+                Date and time the task was completed (default None uses the current time)
+        """
+        assert not self.__closed, "The completion queue is closed"
+        with self.__lock:
+            self.__raise_if_stopped()
+            self.__completions.put((name, user_name, completed or datetime.now().replace(microsecond=0)))
+
+    def flush(self):
+        """
+        Waits until all queued completions are written, returns right away after close().
+
+        Raise:
+            CompletionQueueError
+                Raised if the writer thread has stopped because of an error, the completions not yet written are lost
+        """
+        with self.__lock:
+            if self.__closed and self.__error is None:
+                return
+            self.__raise_if_stopped()
+            self.__completions.put(self.__FLUSH)
+        self.__completions.join()
+        self.__raise_if_stopped()
+
+    def close(self):
+        """Writes all queued completions and stops the writer thread."""
+        if self.__closed:
+            return
+        self.__closed = True
+        with self.__lock:
+            if not self.__stopped:
+                self.__completions.put(self.__CLOSE)
+        self.__writer.join()
+
+    def __raise_if_stopped(self):
+        # Raises a CompletionQueueError if the writer thread has stopped because of an error.
+        if self.__error is not None:
+            raise CompletionQueueError(f"The writer of the completion queue stopped: {self.__error}") from self.__error
+
+    def __write(self, started):
+        # Runs in the writer thread and writes the queued completions batch by batch until the queue is closed.
+        try:
+            db = get_db(self.name, self.__profile)
+        except Exception as error:
+            self.__error = error
+            self.__stopped = True
+            return
+        finally:
+            started.set()
+        try:
+            closed = False
+            while not closed:
+                # A batch ends when it is full, when the flush interval has passed, or on flush() and close().
+                batch = [self.__completions.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while batch[-1] is not self.__FLUSH and batch[-1] is not self.__CLOSE and len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.__completions.get(timeout=max(deadline - time.monotonic(), 0)))
+                    except queue.Empty:
+                        break
+                closed = batch[-1] is self.__CLOSE
+                try:
+                    self.__write_batch(db, [completion for completion in batch if isinstance(completion, tuple)])
+                finally:
+                    for _ in batch:
+                        self.__completions.task_done()
+        except Exception as error:
+            self.__error = error
+        finally:
+            # Entries queued after the writer stopped are never written, they are dropped so that flush() returns.
+            with self.__lock:
+                self.__stopped = True
+                while True:
+                    try:
+                        self.__completions.get_nowait()
+                    except queue.Empty:
+                        break
+                    self.__completions.task_done()
+            db.close()
+
+    def __write_batch(self, db, completions):
+        # Writes the completions in one transaction, if one fails they are written one by one to isolate it.
+        if not completions:
+            return
+        try:
+            with unit_of_work(db):
+                for name, user_name, completed in completions:
+                    update_streaks(db, name, user_name, completed)
+        except Exception:
+            for name, user_name, completed in completions:
+                try:
+                    update_streaks(db, name, user_name, completed)
+                except Exception as error:
+                    self.errors.append((name, user_name, completed, error))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{self.name}', '{self.flush_interval}', '{self.max_batch}')"
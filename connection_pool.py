@@ -0,0 +1,152 @@
+"""
+Contains the ConnectionPool class, which shares a fixed number of database connections between threads.
+
+The pool keeps a single writer connection and a queue of reader connections, all in write-ahead log
+mode, so reads of many threads run in parallel while writes are serialized without busy waiting.
+The reader connections are opened with "PRAGMA query_only", so every write has to go through write():
+
+    pool = create_connection_pool("main.db", size=8)
+    with pool.read() as db:
+        habits = get_all_habits(db, "test user 1", True)
+    with pool.write() as db:
+        update_streaks(db, "go running", "test user 1")
+
+Class:
+    ConnectionPool
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from db import get_db, PROFILES
+
+
+class ConnectionPool:
+    """
+    Class to share a single writer connection and several reader connections between threads.
+
+    A thread that already checked out a connection gets the same connection again on nested
+    checkouts, a thread holding the writer also reads with it. Reader connections refuse writes.
+    A connection that raised an error is checked with "SELECT 1" and replaced if it is no longer usable.
+
+    Attributes:
+        name: str
+            Name of the database file
+        size: int
+            Number of reader connections
+
+    Methods:
+        read()
+            Context manager that checks out a reader connection for the current thread
+        write()
+            Context manager that checks out the writer connection for the current thread
+        close()
+            Waits until all reader connections are returned and closes all connections of the pool
+    """
+
+    def __init__(self, name: str = "main.db", size: int = 4, profile: str = "throughput"):
+        """
+        Constructor for a ConnectionPool instance.
+
+        Params:
+            name: str
+                Name of the database file, in-memory databases can not be shared between connections
+            size: int
+                Number of reader connections (default 4)
+            profile: str
+                Name of a tuning profile of db.PROFILES with write-ahead log (default "throughput")
+        """
+        assert name != ":memory:", "An in-memory database can not be shared between connections"
+        assert size >= 1, f"Size {size} has to be greater or equal than one"
+        assert PROFILES[profile]["journal_mode"] == "wal", f"Profile {profile} does not use a write-ahead log"
+
+        self.name = name
+        self.size = size
+        self.__profile = profile
+        self.__local = threading.local()
+        self.__writer_lock = threading.RLock()
+        # The writer is opened first, so that the schema is created or upgraded before the readers connect.
+        self.__writer = self.__connect(query_only=False)
+        self.__readers = queue.Queue()
+        for _ in range(size):
+            self.__readers.put(self.__connect(query_only=True))
+
+    @contextmanager
+    def read(self):
+        """
+        Context manager that checks out a reader connection for the current thread.
+
+        Waits until a reader connection is free, nested checkouts of the same thread return the same connection.
+        Writes on the connection raise sqlite3.OperationalError.
+
+        Yield:
+            sqlite3 db
+                Connection that is returned to the pool when the context is left
+        """
+        if getattr(self.__local, "writer_depth", 0) > 0:
+            yield self.__writer
+            return
+        depth = getattr(self.__local, "reader_depth", 0)
+        if depth == 0:
+            self.__local.reader = self.__readers.get()
+        self.__local.reader_depth = depth + 1
+        try:
+            yield self.__local.reader
+        except sqlite3.Error:
+            if depth == 0:
+                self.__local.reader = self.__checked(self.__local.reader, query_only=True)
+            raise
+        finally:
+            self.__local.reader_depth = depth
+            if depth == 0:
+                self.__readers.put(self.__local.reader)
+                self.__local.reader = None
+
+    @contextmanager
+    def write(self):
+        """
+        Context manager that checks out the writer connection for the current thread.
+
+        Waits until no other thread holds the writer, nested checkouts of the same thread return the writer again.
+
+        Yield:
+            sqlite3 db
+                The writer connection
+        """
+        with self.__writer_lock:
+            depth = getattr(self.__local, "writer_depth", 0)
+            self.__local.writer_depth = depth + 1
+            try:
+                yield self.__writer
+            except sqlite3.Error:
+                if depth == 0:
+                    self.__writer = self.__checked(self.__writer, query_only=False)
+                raise
+            finally:
+                self.__local.writer_depth = depth
+
+    def close(self):
+        """Waits until all reader connections are returned and closes all connections of the pool."""
+        with self.__writer_lock:
+            self.__writer.close()
+        for _ in range(self.size):
+            self.__readers.get().close()
+
+    def __checked(self, db, query_only):
+        # Rolls back the connection after an error and returns it if it still answers, otherwise a new one replaces it.
+        try:
+            db.rollback()
+            db.execute("SELECT 1").fetchone()
+            return db
+        except sqlite3.Error:
+            return self.__connect(query_only)
+
+    def __connect(self, query_only):
+        # Opens a connection that may be used by any thread, but only by one at a time.
+        db = get_db(self.name, self.__profile, check_same_thread=False)
+        if query_only:
+            db.execute("PRAGMA query_only = ON")
+        return db
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{self.name}', '{self.size}')"
@@ -6,11 +6,13 @@ Exceptions:
     UserNameIsUnknownError
     HabitNameAlreadyExistsError
     HabitNameIsUnknownError
+    HabitIdIsUnknownError
     HabitSaveError
     HabitDeletionError
     HabitUpdateError
     MissingAuthorizationError
     UpdateActiveStatusError
+    CompletionQueueError
 """
 
 
@@ -38,6 +40,12 @@ class HabitNameIsUnknownError(Exception):
         self.message = message
 
 
+class HabitIdIsUnknownError(Exception):
+
+    def __init__(self, message="This habit ID is unknown!"):
+        self.message = message
+
+
 class HabitSaveError(Exception):
 
     def __init__(self, message="Something went wrong trying to safe the habit!"):
@@ -66,3 +74,9 @@ class UpdateActiveStatusError(Exception):
 
     def __init__(self, message="Something went wrong trying to update the status"):
         self.message = message
+
+
+class CompletionQueueError(Exception):
+
+    def __init__(self, message="The completion queue can not write the completions!"):
+        self.message = message
@@ -1,44 +1,141 @@
 """
 Controls all database functionalities.
 
+The functions that access the database record their calls and SQL statements while the
+instrumentation module is enabled.
+
 Functions:
-    get_db(name="main.db") -> sqlite3 database
+    get_db(name="main.db", profile=None, check_same_thread=True) -> sqlite3 database
         Returns sqlite3 database with the necessary tables.
+    get_read_only_db(name="main.db") -> sqlite3 database
+        Returns a read-only connection to an existing sqlite3 database.
+    get_connection_settings(db) -> dict
+        Returns the tuning settings that are active on a database connection.
+    datetime_to_epoch(value) -> int
+        Converts a naive datetime into integer seconds since the epoch as stored in EPOCH columns.
+    epoch_to_datetime(value) -> datetime
+        Converts integer seconds since the epoch as stored in EPOCH columns into a naive datetime.
+    unit_of_work(db)
+        Context manager that runs all enclosed database operations in a single transaction.
     store_user_item(db, user_name, password, is_admin)
         Inserts a new user item into "users" table or raises an exception if the user item already exists.
+    store_user_items(db, user_items) -> int
+        Stores several user items at once and skips user items whose name is already in the database.
     delete_user_item(db, user_name)
         Deletes a user item from the "users" table or raises an exception if the user item does not exist.
     get_user_item_by_name(db, user_name) -> list
         Returns a user item by username if user exists otherwise None is returned.
     get_all_user_items(db) -> list
         Returns a list with all stored user items.
-    store_habit_item(db, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0)
+    get_user_items_page(db, after, limit, name_prefix=None) -> list
+        Returns the next user items ordered by name together with the number of their active and paused habit items.
+    store_habit_item(db, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0,
+                     current_streak=0)
         Stores a new habit item or raises an exception if a habit item with the same name is already in the database.
-    delete_habit_item(db, name, user_name)
+    delete_habit_item(db, name, user_name) -> str
         Deletes a habit item or raises an exception if the name of the habit does not exist in the database.
-    update_streaks_habit_item(db, name, user_name, deadline, longest)
-        Updates the deadline and streak of a habit item.
+    update_streaks_habit_item(db, name, user_name, deadline)
+        Increases the current streak of a habit item by one and updates its deadline and longest streak.
+    reset_streak_habit_item(db, name, user_name, deadline)
+        Sets the current streak of a habit item to zero and updates its deadline.
     update_active_status_habit_item(db, name, user_name, deadline, is_active)
             Sets the active status of a habit item to active or inactive.
-    get_all_habit_items(db, user_name, is_active) -> list
+    expire_overdue_habit_items(db, now) -> int
+        Resets the current streak of all active habit items past their deadline and moves their deadline ahead.
+    get_all_habit_items_by_active_status(db, user_name, is_active) -> list
         Returns a list with all habit items with a given active status stored for a particular user.
     get_habit_item_by_name(db, name, user_name) -> list
         Returns a list with a habit item if it exists otherwise None is returned.
-    store_task_item(db, created, habit_name)
+    get_habit_items_by_names(db, names, user_name) -> list
+        Returns a list with all habit items of a user whose name is in the given names.
+    search_habit_items(db, user_name, query, limit, fuzzy=False, is_active=None) -> list
+        Returns the habit items of a user whose name starts with, contains, or resembles the query.
+    store_habit_items(db, habit_items) -> int
+        Stores several habit items at once and skips habit items that are already in the database.
+    store_task_item(db, created, habit_id)
         Assigns a random UUID to a new task item and stores it in the "tasks" table.
-    get_tasks_by_habit_name(db, habit_name) -> list
+    store_task_items(db, task_items) -> int
+        Stores several task items at once and skips task items that are already in the database.
+    get_tasks_by_habit_name(db, habit_name, user_name) -> list
         Returns a list with all task items that belong to a given habit item.
-    remove_tasks_by_habit_name(db, habit_name)
-        Removes all stored task items of a given habit item.
+    get_task_items_page(db, habit_name, user_name, after, limit, created_from=None, created_before=None) -> list
+        Returns the next task items of a habit item ordered by creation, optionally within a period of time.
+    iterate_habit_items(db, user_name=None, batch_size=1000) -> generator
+        Yields all habit items, or those of one user, while fetching them in batches.
+    iterate_task_items(db, user_name=None, habit_name=None, batch_size=1000) -> generator
+        Yields all task items, or those of one user or habit item, extended by the name and user of their habit.
+    get_habit_periods_with_task_items_before(db, periods, now) -> list
+        Returns ID and period of all habit items with task items older than the given number of their periods.
+    delete_task_items_before(db, habit_id, before) -> list
+        Deletes all task items of a habit item created before a datetime and returns their creation datetimes.
+    get_task_archive_item(db, habit_id) -> tuple
+        Returns the archived history of a habit item or None if nothing is archived.
+    get_task_archive_item_by_habit_name(db, habit_name, user_name) -> tuple
+        Returns the archived history of a habit item by its name or None if nothing is archived.
+    store_task_archive_item(db, habit_id, task_count, history)
+        Stores the archived history of a habit item, an already stored history is replaced.
+    iterate_task_archive_items(db, user_name=None, habit_name=None) -> generator
+        Yields the archived histories, or those of one user or habit item, with the name and user of their habit.
+    get_completion_bitmap_item(db, habit_id) -> bytes
+        Returns the stored completion bitmap of a habit item or None if no bitmap is stored.
+    get_completion_bitmap_items_by_user(db, user_name) -> dict
+        Returns the stored completion bitmaps of all habit items of a user by habit ID.
+    store_completion_bitmap_item(db, habit_id, bitmap)
+        Stores the completion bitmap of a habit item, an already stored bitmap is replaced.
+    get_daily_completion_items(db, habit_name, user_name, first_day, last_day) -> list
+        Returns the number of task items per day of a habit item for a range of days.
+    get_weekly_completion_items(db, habit_name, user_name, first_week, last_week) -> list
+        Returns the number of task items per week of a habit item for a range of weeks.
+    get_habit_count_item(db, user_name) -> tuple
+        Returns the number of active and paused habit items of a user.
+
+Var:
+    PROFILES: dict
+        Connection tuning profiles by name, each maps PRAGMA names to the values set on connect
 """
 
+import pathlib
 import sqlite3
 import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from custom_exceptions import UserNameAlreadyExistsError, UserNameIsUnknownError, \
-    HabitNameIsUnknownError, HabitNameAlreadyExistsError
-
-
-def get_db(name="main.db"):
+    HabitNameIsUnknownError, HabitNameAlreadyExistsError, HabitIdIsUnknownError
+from instrumentation import instrumented, is_enabled, trace
+
+PROFILES = {
+    # Write-ahead log with a full fsync on every commit, nothing is lost on power failure.
+    "durable": {
+        "journal_mode": "wal",
+        "synchronous": 2,
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": 0,
+        "busy_timeout": 5000
+    },
+    # Write-ahead log that only syncs on checkpoints, the last commits may be lost on power failure.
+    "throughput": {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": 2,
+        "busy_timeout": 5000
+    },
+    # Read-mostly connections with a large page cache and memory-mapped I/O for the analysis queries.
+    "analytics": {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": 2,
+        "busy_timeout": 10000
+    }
+}
+
+
+@instrumented
+def get_db(name="main.db", profile=None, check_same_thread=True):
     """
     Returns sqlite3 database.
 
@@ -47,11 +144,12 @@ def get_db(name="main.db"):
             habit_id TEXT PRIMARY KEY,
             name TEXT,
             user_name TEXT,
-            created DATETIME,
+            created EPOCH INTEGER,
             period INT,
-            deadline DATETIME,
+            deadline EPOCH INTEGER,
             is_active BOOL,
-            longest INT
+            longest INT,
+            current_streak INT
 
         users:
             user_id TEXT,
@@ -61,20 +159,205 @@ def get_db(name="main.db"):
 
         tasks:
             task_id TEXT,
-            created DATETIME,
-            habit_name TEXT
+            created EPOCH INTEGER,
+            habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE
+
+        task_archives:
+            habit_id TEXT PRIMARY KEY REFERENCES habits(habit_id) ON DELETE CASCADE,
+            task_count INT,
+            history BLOB
+
+        completion_bitmaps:
+            habit_id TEXT PRIMARY KEY REFERENCES habits(habit_id) ON DELETE CASCADE,
+            bitmap BLOB
+
+        daily_completions:
+            habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE,
+            day INTEGER,
+            completions INT,
+            PRIMARY KEY (habit_id, day)
+
+        weekly_completions:
+            habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE,
+            week INTEGER,
+            completions INT,
+            PRIMARY KEY (habit_id, week)
+
+        habit_counts:
+            user_name TEXT PRIMARY KEY,
+            active INT,
+            paused INT
+
+    The rollup tables "daily_completions", "weekly_completions", and "habit_counts" are kept up to date by
+    triggers. Days are counted since 1970-01-01, weeks since the Monday before, i.e. week = (day + 3) // 7,
+    so every week starts on a Monday like an ISO week. Archiving task items does not change the rollups.
+
+    The tables are indexed as follows:
+        idx_habits_user_name_name: UNIQUE habits(user_name, name)
+        idx_habits_user_name_name_nocase: habits(user_name, name COLLATE NOCASE)
+        idx_users_user_name: UNIQUE users(user_name)
+        idx_tasks_habit_id_created_task_id: UNIQUE tasks(habit_id, created, task_id)
+        idx_habits_deadline: habits(deadline)
+
+    The names of the habit items are searched with the FTS5 table "habit_search", which uses the trigram
+    tokenizer and the "habits" table as external content. Triggers keep it in sync with the "habits" table.
+
+    Foreign keys are enforced, deleting a habit item deletes all its task items, its archived history,
+    its completion bitmap, and its rollups. Storing a task item discards the completion bitmap of its habit item.
+
+    Columns of type EPOCH store datetimes as integer seconds since 1970-01-01 00:00:00, they are
+    converted from and to naive datetime instances by the sqlite3 module.
+
+    Database files created by an older version are upgraded in place, the applied
+    schema version is tracked with "PRAGMA user_version".
+
+    A tuning profile from PROFILES can be applied to the connection, without a profile
+    the SQLite defaults are kept.
+
+    Params:
+        name (str): Name of the database (Default: main.db)
+        profile (str): Name of the tuning profile (Default: None)
+        check_same_thread (bool): Only the creating thread may use the connection (Default: True),
+            set to False if the connection is handed between threads that never use it at the same time
+
+    Return:
+        db (sqlite3 database): Database with tables "habits", "users", "tasks", "task_archives",
+            "completion_bitmaps", and the rollup tables
+    """
+    assert profile is None or profile in PROFILES, f"Unknown profile {profile}"
+    db = sqlite3.connect(name, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=check_same_thread)
+    if is_enabled():
+        trace(db)
+    if profile is not None:
+        __apply_profile(db, PROFILES[profile])
+    if __is_new_database(db):
+        __create_tables(db)
+    else:
+        __upgrade_tables(db)
+    __create_indexes(db)
+    db.execute("PRAGMA foreign_keys = ON")
+    return db
+
+
+def get_read_only_db(name="main.db"):
+    """
+    Returns a read-only connection to an existing sqlite3 database.
+
+    Unlike get_db, a missing database file is not created and the tables are neither created nor upgraded,
+    so nothing is ever written to the database file.
 
     Param:
         name (str): Name of the database (Default: main.db)
 
+    Raise:
+        sqlite3.OperationalError: Raised if the database file does not exist
+        sqlite3.DatabaseError: Raised if the tables have not been upgraded to the current schema version yet
+
     Return:
-        db (sqlite3 database): Database with tables "habits", "users", and "tasks"
+        db (sqlite3 database): Database connection that refuses to write
     """
-    db = sqlite3.connect(name)
-    __create_tables(db)
+    db = sqlite3.connect(f"{pathlib.Path(name).resolve().as_uri()}?mode=ro", uri=True,
+                         detect_types=sqlite3.PARSE_DECLTYPES)
+    if is_enabled():
+        trace(db)
+    if db.execute("PRAGMA user_version").fetchone()[0] != len(__MIGRATIONS):
+        db.close()
+        raise sqlite3.DatabaseError(f"The database {name} has to be upgraded by the app first!")
     return db
 
 
+@instrumented
+def get_connection_settings(db):
+    """
+    Returns the tuning settings that are active on a database connection.
+
+    The settings are read back from the connection, settings that do not apply to the database
+    (e.g. mmap_size of an in-memory database) are None. "profile" is set to the name of the
+    tuning profile all settings match or None if they match no profile.
+
+    Param:
+        db: Database connection to inspect
+
+    Return:
+        Dictionary with the current value of every PRAGMA used in PROFILES and the matching profile name
+    """
+    cur = db.cursor()
+    settings = {}
+    for pragma in PROFILES["durable"]:
+        cur.execute(f"PRAGMA {pragma}")
+        value = cur.fetchone()
+        settings[pragma] = value[0] if value is not None else None
+    settings["profile"] = next(
+        (name for name, profile in PROFILES.items()
+         if all(settings[pragma] == value for pragma, value in profile.items())),
+        None
+    )
+    return settings
+
+
+def datetime_to_epoch(value):
+    """
+    Converts a naive datetime into integer seconds since the epoch as stored in EPOCH columns.
+
+    Param:
+        value: Naive datetime
+
+    Return:
+        Seconds since 1970-01-01 00:00:00 as integer
+    """
+    return (value - __EPOCH) // __ONE_SECOND
+
+
+def epoch_to_datetime(value):
+    """
+    Converts integer seconds since the epoch as stored in EPOCH columns into a naive datetime.
+
+    Param:
+        value: Seconds since 1970-01-01 00:00:00 as integer, string, or bytes
+
+    Return:
+        Naive datetime
+    """
+    return __EPOCH + timedelta(seconds=int(value))
+
+
+@contextmanager
+def unit_of_work(db):
+    """
+    Context manager that runs all enclosed database operations in a single transaction.
+
+    The functions of this module do not commit on their own while a unit of work is open on their database,
+    instead the transaction is committed once when the outermost unit of work is left. If an exception is raised
+    inside the unit of work, all enclosed operations are rolled back. Nested units of work join the outer one.
+
+    Param:
+        db: Database on which the transaction is opened
+
+    Yield:
+        db: The same database
+    """
+    key = id(db)
+    if key in __open_units_of_work:
+        __open_units_of_work[key] += 1
+        try:
+            yield db
+        finally:
+            __open_units_of_work[key] -= 1
+        return
+    __open_units_of_work[key] = 1
+    try:
+        if not db.in_transaction:
+            db.execute("BEGIN IMMEDIATE")
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        del __open_units_of_work[key]
+
+
+@instrumented
 def store_user_item(db, user_name, password, is_admin):
     """
     Inserts a new user item into "users" table or raises an exception if the user item already exists.
@@ -88,8 +371,8 @@ def store_user_item(db, user_name, password, is_admin):
     Raise:
         UserNameAlreadyExistsError: Raised if the user item is already in the database
     """
-    if not __is_user_item_stored(db, user_name):
-        cur = db.cursor()
+    cur = db.cursor()
+    try:
         cur.execute("INSERT INTO users VALUES (:user_id, :user_name, :password, :is_admin)",
                     {
                         "user_id": str(uuid.uuid4()),
@@ -97,11 +380,31 @@ def store_user_item(db, user_name, password, is_admin):
                         "password": password,
                         "is_admin": is_admin
                     })
-        db.commit()
-    else:
+    except sqlite3.IntegrityError:
         raise UserNameAlreadyExistsError
+    finally:
+        __commit(db)
+
+
+@instrumented
+def store_user_items(db, user_items):
+    """
+    Stores several user items at once and skips user items whose name is already in the database.
+
+    Params:
+        db: Database in which the user items shall be stored
+        user_items: Iterable of user items, each with the columns user_id, user_name, password, and is_admin
+
+    Return:
+        Number of stored user items
+    """
+    cur = db.cursor()
+    cur.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?)", user_items)
+    __commit(db)
+    return cur.rowcount
 
 
+@instrumented
 def delete_user_item(db, user_name):
     """
     Deletes a user item from the "users" table or raises an exception if the user item does not exist.
@@ -113,14 +416,14 @@ def delete_user_item(db, user_name):
     Raise:
         UserNameIsUnknownError: Raised if the user item does not exist in the database
     """
-    if __is_user_item_stored(db, user_name):
-        cur = db.cursor()
-        cur.execute("DELETE FROM users WHERE user_name=:user_name", {"user_name": user_name})
-        db.commit()
-    else:
+    cur = db.cursor()
+    cur.execute("DELETE FROM users WHERE user_name=:user_name", {"user_name": user_name})
+    __commit(db)
+    if cur.rowcount == 0:
         raise UserNameIsUnknownError
 
 
+@instrumented
 def get_user_item_by_name(db, user_name):
     """
     Returns a user item by username if user exists otherwise None is returned.
@@ -132,14 +435,12 @@ def get_user_item_by_name(db, user_name):
     Return:
         User item in a list if user exists otherwise None is returned
     """
-    if __is_user_item_stored(db, user_name):
-        cur = db.cursor()
-        cur.execute("SELECT * FROM users WHERE user_name=:user_name", {"user_name": user_name})
-        return cur.fetchall()
-    else:
-        return None
+    cur = db.cursor()
+    cur.execute("SELECT * FROM users WHERE user_name=:user_name", {"user_name": user_name})
+    return cur.fetchall() or None
 
 
+@instrumented
 def get_all_user_items(db):
     """
     Returns a list with all stored user items.
@@ -155,7 +456,38 @@ def get_all_user_items(db):
     return cur.fetchall()
 
 
-def store_habit_item(db, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0):
+@instrumented
+def get_user_items_page(db, after, limit, name_prefix=None):
+    """
+    Returns the next user items ordered by name together with the number of their active and paused habit items.
+
+    The page starts after the given user name, so every page is a range search on the index of the user names
+    no matter how many pages came before. The numbers of habit items are read from the "habit_counts" table.
+
+    Params:
+        db: Database in which the user items are stored
+        after: Name of the last user item of the previous page, None for the first page
+        limit: Highest number of returned user items
+        name_prefix: Only user items whose name starts with this prefix are returned (default None)
+
+    Return:
+        List with the user items extended by the number of active and paused habit items
+    """
+    conditions = ["users.user_name > :after"] if after is not None else []
+    if name_prefix:
+        conditions.append("users.user_name >= :name_prefix AND users.user_name < :name_prefix || char(1114111)")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cur = db.cursor()
+    cur.execute(f"""SELECT users.*, COALESCE(habit_counts.active, 0), COALESCE(habit_counts.paused, 0)
+        FROM users LEFT JOIN habit_counts ON habit_counts.user_name = users.user_name
+        {where} ORDER BY users.user_name LIMIT :limit""",
+                {"after": after, "name_prefix": name_prefix, "limit": limit})
+    return cur.fetchall()
+
+
+@instrumented
+def store_habit_item(db, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0,
+                     current_streak=0):
     """
     Stores a new habit item or raises an exception if a habit item with the same name is already in the database.
 
@@ -169,14 +501,15 @@ def store_habit_item(db, habit_id, name, user_name, created, period, deadline, i
         deadline: Datetime of the deadline
         is_active: Boolean if the habit is active or paused
         longest: Longest stored streak in days
+        current_streak: Current streak in days
 
     Raise:
         HabitNameAlreadyExistsError: Raised if a habit with the same name already exists
     """
-    if not __is_habit_item_stored(db, name, user_name):
-        cur = db.cursor()
+    cur = db.cursor()
+    try:
         cur.execute("""INSERT INTO habits VALUES (
-            :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)""",
+            :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest, :current_streak)""",
                     {
                         "habit_id": habit_id,
                         "name": name,
@@ -185,59 +518,113 @@ def store_habit_item(db, habit_id, name, user_name, created, period, deadline, i
                         "period": period,
                         "deadline": deadline,
                         "is_active": is_active,
-                        "longest": longest
+                        "longest": longest,
+                        "current_streak": current_streak
                     })
-        db.commit()
-    else:
+    except sqlite3.IntegrityError:
         raise HabitNameAlreadyExistsError
+    finally:
+        __commit(db)
+
+
+@instrumented
+def store_habit_items(db, habit_items):
+    """
+    Stores several habit items at once and skips habit items that are already in the database.
 
+    A habit item is skipped if its ID or its name for the same user is already stored.
 
+    Params:
+        db: Database in which the habit items shall be stored
+        habit_items: Iterable of habit items, each with the columns of the "habits" table in table order
+
+    Return:
+        Number of stored habit items
+    """
+    cur = db.cursor()
+    cur.executemany("INSERT OR IGNORE INTO habits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", habit_items)
+    __commit(db)
+    return cur.rowcount
+
+
+@instrumented
 def delete_habit_item(db, name, user_name):
     """
     Deletes a habit item or raises an exception if the name of the habit does not exist in the database.
 
+    All task items of the habit item are deleted with it.
+
     Params:
         db: Database from which the habit item shall be deleted
         name: Name of the habit item
         user_name: Username to verify the correct user deletes a habit
 
+    Return:
+        ID of the deleted habit item
+
     Raise:
         HabitNameIsUnknownError: Raised if no habit item with the given name is stored
     """
-    if __is_habit_item_stored(db, name, user_name):
-        cur = db.cursor()
-        cur.execute("DELETE FROM habits WHERE name=:name AND user_name=:user_name",
-                    {
-                        "name": name,
-                        "user_name": user_name
-                    })
-        db.commit()
-    else:
+    cur = db.cursor()
+    cur.execute("DELETE FROM habits WHERE name=:name AND user_name=:user_name RETURNING habit_id",
+                {
+                    "name": name,
+                    "user_name": user_name
+                })
+    deleted_item = cur.fetchone()
+    __commit(db)
+    if deleted_item is None:
         raise HabitNameIsUnknownError
+    return deleted_item[0]
 
 
-def update_streaks_habit_item(db, name, user_name, deadline, longest):
+@instrumented
+def update_streaks_habit_item(db, name, user_name, deadline):
     """
-    Updates the deadline and streak of a habit item.
+    Increases the current streak of a habit item by one and updates its deadline and longest streak.
+
+    The streaks are updated within the UPDATE statement, so concurrent updates can not overwrite each other.
 
     Params:
         db: Database in which the habit item is stored
         name: Name of the habit item
         user_name: Username to verify the correct user updates a habit item
         deadline: Datetime of the new deadline
-        longest: Longest streak of the habit item
     """
     cur = db.cursor()
-    cur.execute("UPDATE habits SET deadline=:deadline, longest=:longest WHERE name=:name AND user_name=:user_name",
+    cur.execute("""UPDATE habits SET deadline=:deadline, current_streak=current_streak + 1,
+            longest=MAX(longest, current_streak + 1)
+        WHERE name=:name AND user_name=:user_name""",
                 {
                     "name": name,
                     "user_name": user_name,
-                    "deadline": deadline,
-                    "longest": longest
+                    "deadline": deadline
                 })
-    db.commit()
+    __commit(db)
+
+
+@instrumented
+def reset_streak_habit_item(db, name, user_name, deadline):
+    """
+    Sets the current streak of a habit item to zero and updates its deadline.
+
+    Params:
+        db: Database in which the habit item is stored
+        name: Name of the habit item
+        user_name: Username to verify the correct user updates a habit item
+        deadline: Datetime of the new deadline
+    """
+    cur = db.cursor()
+    cur.execute("UPDATE habits SET deadline=:deadline, current_streak=0 WHERE name=:name AND user_name=:user_name",
+                {
+                    "name": name,
+                    "user_name": user_name,
+                    "deadline": deadline
+                })
+    __commit(db)
 
 
+@instrumented
 def update_active_status_habit_item(db, name, user_name, deadline, is_active):
     """
     Sets the active status of a habit item to active or inactive.
@@ -257,9 +644,33 @@ def update_active_status_habit_item(db, name, user_name, deadline, is_active):
                     "deadline": deadline,
                     "is_active": is_active
                 })
-    db.commit()
+    __commit(db)
+
 
+@instrumented
+def expire_overdue_habit_items(db, now):
+    """
+    Resets the current streak of all active habit items past their deadline and moves their deadline ahead.
 
+    The deadline is moved by as many whole periods as needed to lie after now. The overdue habit items are
+    found with a range scan of the deadline index and updated with a single statement.
+
+    Params:
+        db: Database in which the habit items are stored
+        now: Datetime against which the deadlines are checked
+
+    Return:
+        Number of expired habit items
+    """
+    cur = db.cursor()
+    cur.execute("""UPDATE habits SET current_streak=0,
+            deadline=deadline + period * 86400 * ((:now - deadline) / (period * 86400) + 1)
+        WHERE deadline < :now AND is_active=1""", {"now": now})
+    __commit(db)
+    return cur.rowcount
+
+
+@instrumented
 def get_all_habit_items_by_active_status(db, user_name, is_active):
     """
     Returns a list with all habit items with a given active status stored for a particular user.
@@ -281,6 +692,7 @@ def get_all_habit_items_by_active_status(db, user_name, is_active):
     return cur.fetchall()
 
 
+@instrumented
 def get_habit_item_by_name(db, name, user_name):
     """
     Returns a list with a habit item if it exists otherwise None is returned.
@@ -293,64 +705,585 @@ def get_habit_item_by_name(db, name, user_name):
     Return:
         List with habit item or None if name of habit item does not exist
     """
-    if __is_habit_item_stored(db, name, user_name):
-        cur = db.cursor()
-        cur.execute("SELECT * FROM habits WHERE name=:name AND user_name=:user_name",
-                    {
-                        "name": name,
-                        "user_name": user_name
-                    })
+    cur = db.cursor()
+    cur.execute("SELECT * FROM habits WHERE name=:name AND user_name=:user_name",
+                {
+                    "name": name,
+                    "user_name": user_name
+                })
+    return cur.fetchall() or None
+
+
+@instrumented
+def get_habit_items_by_names(db, names, user_name):
+    """
+    Returns a list with all habit items of a user whose name is in the given names.
+
+    The names are looked up in chunks of at most 500 per query, unknown names are skipped.
+
+    Params:
+        db: Database in which the habit items are stored
+        names: Names of the habit items
+        user_name: Only the habit items of this user are regarded
+
+    Return:
+        List with the found habit items
+    """
+    names = list(dict.fromkeys(names))
+    cur = db.cursor()
+    habit_items = []
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        cur.execute(f"SELECT * FROM habits WHERE user_name=? AND name IN ({placeholders})",
+                    [user_name, *chunk])
+        habit_items += cur.fetchall()
+    return habit_items
+
+
+@instrumented
+def search_habit_items(db, user_name, query, limit, fuzzy=False, is_active=None):
+    """
+    Returns the habit items of a user whose name starts with, contains, or resembles the query.
+
+    Queries shorter than three characters can not be searched by trigrams, they are matched as prefix
+    of the name with the index on user name and name with the NOCASE collation and returned by name.
+    The NOCASE collation only ignores the case of ASCII letters, so "är" does not match "Ärger" while
+    "ÄR" does.
+    Longer queries are matched anywhere in the name, ignoring the case of all letters, with the FTS5 table
+    "habit_search" and returned in the order the habit items were stored, so that the search stops at the limit.
+    A fuzzy search matches names that share at least one trigram with the query, only the first 20 times limit
+    matches are ranked. With an active status only the habit items with that status are regarded, so the limit
+    counts only matches with that status.
+
+    Params:
+        db: Database in which the habit items are stored
+        user_name: Only the habit items of this user are regarded
+        query: Searched part of the name
+        limit: Highest number of returned habit items
+        fuzzy: Names only have to resemble the query (default False)
+        is_active: Only habit items with this active status are regarded, None regards all (default None)
+
+    Return:
+        List with the found habit items
+    """
+    cur = db.cursor()
+    if len(query) < 3:
+        cur.execute("""SELECT * FROM habits
+            WHERE user_name=:user_name AND name >= :query COLLATE NOCASE
+                AND name < :query || char(1114111) COLLATE NOCASE
+                AND (:is_active IS NULL OR is_active=:is_active)
+            ORDER BY name COLLATE NOCASE LIMIT :limit""",
+                    {"user_name": user_name, "query": query, "is_active": is_active, "limit": limit})
         return cur.fetchall()
-    else:
-        return None
+    # The cross join makes SQLite read the search table first, otherwise it may probe it for every habit item.
+    if not fuzzy:
+        cur.execute("""SELECT habits.* FROM habit_search CROSS JOIN habits ON habits.rowid = habit_search.rowid
+            WHERE habit_search MATCH :match AND habits.user_name=:user_name
+                AND (:is_active IS NULL OR habits.is_active=:is_active)
+            LIMIT :limit""",
+                    {"match": __quote_phrase(query), "user_name": user_name, "is_active": is_active, "limit": limit})
+        return cur.fetchall()
+    # Ranking costs time for every match, so only a bounded number of candidates is ranked.
+    trigrams = dict.fromkeys(query[start:start + 3] for start in range(len(query) - 2))
+    cur.execute("""SELECT habits.* FROM (
+            SELECT habits.rowid AS habit_rowid, habit_search.rank AS match_rank
+            FROM habit_search CROSS JOIN habits ON habits.rowid = habit_search.rowid
+            WHERE habit_search MATCH :match AND habits.user_name=:user_name
+                AND (:is_active IS NULL OR habits.is_active=:is_active)
+            LIMIT :candidates
+        ) AS matches CROSS JOIN habits ON habits.rowid = matches.habit_rowid
+        ORDER BY matches.match_rank LIMIT :limit""",
+                {
+                    "match": " OR ".join(__quote_phrase(trigram) for trigram in trigrams),
+                    "user_name": user_name,
+                    "is_active": is_active,
+                    "candidates": limit * 20,
+                    "limit": limit
+                })
+    return cur.fetchall()
 
 
-def store_task_item(db, created, habit_name):
+@instrumented
+def store_task_item(db, created, habit_id):
     """
     Assigns a random UUID to a new task item and stores it in the "tasks" table.
 
     Params:
         db: Database in which the task item is stored
         created: Datetime of the creation
-        habit_name: The name of the habit item to which the task belongs
+        habit_id: The ID of the habit item to which the task belongs
+
+    Raise:
+        HabitIdIsUnknownError: Raised if no habit item with the ID is stored
     """
     cur = db.cursor()
-    cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_name)",
+    try:
+        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_id)",
+                    {
+                        "task_id": str(uuid.uuid4()),
+                        "created": created,
+                        "habit_id": habit_id
+                    })
+    except sqlite3.IntegrityError:
+        __rollback(db)
+        raise HabitIdIsUnknownError
+    __commit(db)
+
+
+@instrumented
+def store_task_items(db, task_items):
+    """
+    Stores several task items at once and skips task items that are already in the database.
+
+    A task item is skipped if a task item with the same ID, creation, and habit item is already stored.
+
+    Params:
+        db: Database in which the task items shall be stored
+        task_items: Iterable of task items, each with the columns task_id, created, and habit_id
+
+    Return:
+        Number of stored task items
+
+    Raise:
+        HabitIdIsUnknownError: Raised if a task item belongs to no stored habit item, none of the task items is stored
+    """
+    cur = db.cursor()
+    try:
+        cur.executemany("INSERT OR IGNORE INTO tasks VALUES (?, ?, ?)", task_items)
+    except sqlite3.IntegrityError:
+        __rollback(db)
+        raise HabitIdIsUnknownError
+    __commit(db)
+    return cur.rowcount
+
+
+@instrumented
+def get_tasks_by_habit_name(db, habit_name, user_name):
+    """
+    Returns a list with all task items that belong to a given habit item.
+
+    Params:
+        db: Database in which the task items are stored
+        habit_name: Name of the habit item from which the tasks shall be retrieved
+        user_name: Only the habit item of this user is regarded
+
+    Return:
+        List with all task items of the given habit item, ordered by creation
+    """
+    cur = db.cursor()
+    cur.execute("""SELECT tasks.* FROM habits JOIN tasks ON tasks.habit_id = habits.habit_id
+        WHERE habits.name=:habit_name AND habits.user_name=:user_name ORDER BY tasks.created""",
                 {
-                    "task_id": str(uuid.uuid4()),
-                    "created": created,
-                    "habit_name": habit_name
+                    "habit_name": habit_name,
+                    "user_name": user_name
                 })
-    db.commit()
+    return cur.fetchall()
 
 
-def get_tasks_by_habit_name(db, habit_name):
+@instrumented
+def get_task_items_page(db, habit_name, user_name, after, limit, created_from=None, created_before=None):
     """
-    Returns a list with all task items that belong to a given habit item.
+    Returns the next task items of a habit item ordered by creation, optionally within a period of time.
+
+    The page starts after the given task item, so every page is a range search on the index of the tasks
+    by habit item, creation, and task_id no matter how many pages came before.
 
     Params:
         db: Database in which the task items are stored
         habit_name: Name of the habit item from which the tasks shall be retrieved
+        user_name: Only the habit item of this user is regarded
+        after: Tuple of creation and task_id of the last task item of the previous page, None for the first page
+        limit: Highest number of returned task items
+        created_from: Only task items created at or after this datetime are returned (default None)
+        created_before: Only task items created before this datetime are returned (default None)
 
     Return:
-        List with all task items of the given habit item
+        List with task items ordered by creation and task_id
     """
+    conditions = ["habits.name=:habit_name", "habits.user_name=:user_name"]
+    if after is not None:
+        conditions.append("(tasks.created, tasks.task_id) > (:after_created, :after_task_id)")
+    if created_from is not None:
+        conditions.append("tasks.created >= :created_from")
+    if created_before is not None:
+        conditions.append("tasks.created < :created_before")
     cur = db.cursor()
-    cur.execute("SELECT * FROM tasks WHERE habit_name=:habit_name", {"habit_name": habit_name})
+    cur.execute(f"""SELECT tasks.* FROM habits JOIN tasks ON tasks.habit_id = habits.habit_id
+        WHERE {" AND ".join(conditions)} ORDER BY tasks.created, tasks.task_id LIMIT :limit""",
+                {
+                    "habit_name": habit_name,
+                    "user_name": user_name,
+                    "after_created": after[0] if after is not None else None,
+                    "after_task_id": after[1] if after is not None else None,
+                    "created_from": created_from,
+                    "created_before": created_before,
+                    "limit": limit
+                })
     return cur.fetchall()
 
 
-def remove_tasks_by_habit_name(db, habit_name):
+@instrumented
+def iterate_habit_items(db, user_name=None, batch_size=1000):
+    """
+    Yields all habit items, or those of one user, while fetching them in batches.
+
+    At most one batch of habit items is held in memory at a time.
+
+    Params:
+        db: Database in which the habit items are stored
+        user_name: Only the habit items of this user are yielded (default None yields all habit items)
+        batch_size: Number of habit items fetched at once
+
+    Yield:
+        Habit items ordered by user and name
+    """
+    cur = db.cursor()
+    if user_name is None:
+        cur.execute("SELECT * FROM habits ORDER BY user_name, name")
+    else:
+        cur.execute("SELECT * FROM habits WHERE user_name=:user_name ORDER BY name", {"user_name": user_name})
+    yield from __fetch_in_batches(cur, batch_size)
+
+
+@instrumented
+def iterate_task_items(db, user_name=None, habit_name=None, batch_size=1000):
     """
-    Removes all stored task items of a given habit item.
+    Yields all task items, or those of one user or habit item, extended by the name and user of their habit.
+
+    At most one batch of task items is held in memory at a time.
 
     Params:
         db: Database in which the task items are stored
-        habit_name: Name of the habit item from which the task items hall be removed
+        user_name: Only the task items of this user are yielded (default None yields all task items)
+        habit_name: Only the task items of the habit item with this name are yielded, requires user_name
+        batch_size: Number of task items fetched at once
+
+    Yield:
+        Task items with the columns task_id, created, habit_id, habit_name, and user_name,
+        ordered by habit item and creation
     """
+    assert habit_name is None or user_name is not None, "A habit name requires a user name"
+    conditions = []
+    if user_name is not None:
+        conditions.append("habits.user_name=:user_name")
+    if habit_name is not None:
+        conditions.append("habits.name=:habit_name")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     cur = db.cursor()
-    cur.execute("DELETE FROM tasks WHERE habit_name=:habit_name", {"habit_name": habit_name})
-    db.commit()
+    cur.execute(f"""SELECT tasks.task_id, tasks.created, habits.habit_id, habits.name, habits.user_name
+        FROM habits JOIN tasks ON tasks.habit_id = habits.habit_id {where}
+        ORDER BY habits.user_name, habits.name, tasks.created""",
+                {
+                    "user_name": user_name,
+                    "habit_name": habit_name
+                })
+    yield from __fetch_in_batches(cur, batch_size)
+
+
+@instrumented
+def get_habit_periods_with_task_items_before(db, periods, now):
+    """
+    Returns ID and period of all habit items with task items older than the given number of their periods.
+
+    Params:
+        db: Database in which the habit items are stored
+        periods: Number of periods of a habit item after which its task items count as old
+        now: Datetime from which the periods are counted back
+
+    Return:
+        List with tuples of habit ID and period
+    """
+    cur = db.cursor()
+    cur.execute("""SELECT habit_id, period FROM habits WHERE EXISTS (
+            SELECT 1 FROM tasks WHERE tasks.habit_id = habits.habit_id
+                AND tasks.created < :now - habits.period * 86400 * :periods)""",
+                {
+                    "now": now,
+                    "periods": periods
+                })
+    return cur.fetchall()
+
+
+@instrumented
+def delete_task_items_before(db, habit_id, before):
+    """
+    Deletes all task items of a habit item created before a datetime and returns their creation datetimes.
+
+    Params:
+        db: Database in which the task items are stored
+        habit_id: ID of the habit item
+        before: Only task items created before this datetime are deleted
+
+    Return:
+        List with the creation datetimes of the deleted task items in ascending order
+    """
+    cur = db.cursor()
+    cur.execute("DELETE FROM tasks WHERE habit_id=:habit_id AND created < :before RETURNING created",
+                {
+                    "habit_id": habit_id,
+                    "before": before
+                })
+    deleted_items = cur.fetchall()
+    __commit(db)
+    return sorted(task_item[0] for task_item in deleted_items)
+
+
+@instrumented
+def get_task_archive_item(db, habit_id):
+    """
+    Returns the archived history of a habit item or None if nothing is archived.
+
+    Params:
+        db: Database in which the archived history is stored
+        habit_id: ID of the habit item
+
+    Return:
+        Archive item with the columns habit_id, task_count, and history or None
+    """
+    cur = db.cursor()
+    cur.execute("SELECT * FROM task_archives WHERE habit_id=:habit_id", {"habit_id": habit_id})
+    return cur.fetchone()
+
+
+@instrumented
+def get_task_archive_item_by_habit_name(db, habit_name, user_name):
+    """
+    Returns the archived history of a habit item by its name or None if nothing is archived.
+
+    Params:
+        db: Database in which the archived history is stored
+        habit_name: Name of the habit item
+        user_name: Only the habit item of this user is regarded
+
+    Return:
+        Archive item with the columns habit_id, task_count, and history or None
+    """
+    cur = db.cursor()
+    cur.execute("""SELECT task_archives.* FROM habits JOIN task_archives ON task_archives.habit_id = habits.habit_id
+        WHERE habits.name=:habit_name AND habits.user_name=:user_name""",
+                {
+                    "habit_name": habit_name,
+                    "user_name": user_name
+                })
+    return cur.fetchone()
+
+
+@instrumented
+def store_task_archive_item(db, habit_id, task_count, history):
+    """
+    Stores the archived history of a habit item, an already stored history is replaced.
+
+    Params:
+        db: Database in which the archived history shall be stored
+        habit_id: ID of the habit item
+        task_count: Number of task items in the history
+        history: The compressed history
+    """
+    cur = db.cursor()
+    cur.execute("INSERT OR REPLACE INTO task_archives VALUES (:habit_id, :task_count, :history)",
+                {
+                    "habit_id": habit_id,
+                    "task_count": task_count,
+                    "history": history
+                })
+    __commit(db)
+
+
+@instrumented
+def iterate_task_archive_items(db, user_name=None, habit_name=None):
+    """
+    Yields the archived histories, or those of one user or habit item, with the name and user of their habit.
+
+    Params:
+        db: Database in which the archived histories are stored
+        user_name: Only the histories of this user are yielded (default None yields all histories)
+        habit_name: Only the history of the habit item with this name is yielded, requires user_name
+
+    Yield:
+        Archive items with the columns habit_id, habit_name, user_name, task_count, and history,
+        ordered by user and habit name
+    """
+    assert habit_name is None or user_name is not None, "A habit name requires a user name"
+    conditions = []
+    if user_name is not None:
+        conditions.append("habits.user_name=:user_name")
+    if habit_name is not None:
+        conditions.append("habits.name=:habit_name")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cur = db.cursor()
+    cur.execute(f"""SELECT habits.habit_id, habits.name, habits.user_name, task_archives.task_count,
+            task_archives.history
+        FROM habits JOIN task_archives ON task_archives.habit_id = habits.habit_id {where}
+        ORDER BY habits.user_name, habits.name""",
+                {
+                    "user_name": user_name,
+                    "habit_name": habit_name
+                })
+    yield from __fetch_in_batches(cur, 1)
+
+
+@instrumented
+def get_completion_bitmap_item(db, habit_id):
+    """
+    Returns the stored completion bitmap of a habit item or None if no bitmap is stored.
+
+    Storing a task item discards the bitmap of its habit item, so a stored bitmap always covers all task items.
+
+    Params:
+        db: Database in which the completion bitmap is stored
+        habit_id: ID of the habit item
+
+    Return:
+        Bitmap as bytes or None
+    """
+    cur = db.cursor()
+    cur.execute("SELECT bitmap FROM completion_bitmaps WHERE habit_id=:habit_id", {"habit_id": habit_id})
+    bitmap_item = cur.fetchone()
+    return bitmap_item[0] if bitmap_item is not None else None
+
+
+@instrumented
+def get_completion_bitmap_items_by_user(db, user_name):
+    """
+    Returns the stored completion bitmaps of all habit items of a user by habit ID.
+
+    Params:
+        db: Database in which the completion bitmaps are stored
+        user_name: Only the bitmaps of the habit items of this user are returned
+
+    Return:
+        Dictionary with habit IDs as keys and bitmaps as bytes as values, habit items without bitmap are missing
+    """
+    cur = db.cursor()
+    cur.execute("""SELECT completion_bitmaps.habit_id, completion_bitmaps.bitmap
+        FROM habits JOIN completion_bitmaps ON completion_bitmaps.habit_id = habits.habit_id
+        WHERE habits.user_name=:user_name""", {"user_name": user_name})
+    return dict(cur.fetchall())
+
+
+@instrumented
+def store_completion_bitmap_item(db, habit_id, bitmap):
+    """
+    Stores the completion bitmap of a habit item, an already stored bitmap is replaced.
+
+    Params:
+        db: Database in which the completion bitmap shall be stored
+        habit_id: ID of the habit item
+        bitmap: Bitmap as bytes
+    """
+    cur = db.cursor()
+    cur.execute("INSERT OR REPLACE INTO completion_bitmaps VALUES (:habit_id, :bitmap)",
+                {
+                    "habit_id": habit_id,
+                    "bitmap": bitmap
+                })
+    __commit(db)
+
+
+@instrumented
+def get_daily_completion_items(db, habit_name, user_name, first_day, last_day):
+    """
+    Returns the number of task items per day of a habit item for a range of days.
+
+    Params:
+        db: Database in which the rollups are stored
+        habit_name: Name of the habit item
+        user_name: Only the habit item of this user is regarded
+        first_day: First day of the range as days since 1970-01-01
+        last_day: Last day of the range as days since 1970-01-01
+
+    Return:
+        List with tuples of day and number of task items, days without task items are missing
+    """
+    cur = db.cursor()
+    cur.execute("""SELECT daily_completions.day, daily_completions.completions
+        FROM habits JOIN daily_completions ON daily_completions.habit_id = habits.habit_id
+        WHERE habits.name=:habit_name AND habits.user_name=:user_name
+            AND daily_completions.day BETWEEN :first_day AND :last_day
+        ORDER BY daily_completions.day""",
+                {
+                    "habit_name": habit_name,
+                    "user_name": user_name,
+                    "first_day": first_day,
+                    "last_day": last_day
+                })
+    return cur.fetchall()
+
+
+@instrumented
+def get_weekly_completion_items(db, habit_name, user_name, first_week, last_week):
+    """
+    Returns the number of task items per week of a habit item for a range of weeks.
+
+    Params:
+        db: Database in which the rollups are stored
+        habit_name: Name of the habit item
+        user_name: Only the habit item of this user is regarded
+        first_week: First week of the range as weeks since the Monday before 1970-01-01
+        last_week: Last week of the range as weeks since the Monday before 1970-01-01
+
+    Return:
+        List with tuples of week and number of task items, weeks without task items are missing
+    """
+    cur = db.cursor()
+    cur.execute("""SELECT weekly_completions.week, weekly_completions.completions
+        FROM habits JOIN weekly_completions ON weekly_completions.habit_id = habits.habit_id
+        WHERE habits.name=:habit_name AND habits.user_name=:user_name
+            AND weekly_completions.week BETWEEN :first_week AND :last_week
+        ORDER BY weekly_completions.week""",
+                {
+                    "habit_name": habit_name,
+                    "user_name": user_name,
+                    "first_week": first_week,
+                    "last_week": last_week
+                })
+    return cur.fetchall()
+
+
+@instrumented
+def get_habit_count_item(db, user_name):
+    """
+    Returns the number of active and paused habit items of a user.
+
+    Params:
+        db: Database in which the rollups are stored
+        user_name: Name of the user
+
+    Return:
+        Tuple with the columns user_name, active, and paused or None if the user never stored a habit item
+    """
+    cur = db.cursor()
+    cur.execute("SELECT * FROM habit_counts WHERE user_name=:user_name", {"user_name": user_name})
+    return cur.fetchone()
+
+
+def __fetch_in_batches(cur, batch_size):
+    # Yields the result rows of an executed cursor while fetching them in batches.
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def __commit(db):
+    # Commits the database unless the current operation is part of a unit of work.
+    if id(db) not in __open_units_of_work:
+        db.commit()
+
+
+def __rollback(db):
+    # Rolls the database back unless the current operation is part of a unit of work, which rolls back on its own.
+    if id(db) not in __open_units_of_work:
+        db.rollback()
+
+
+def __apply_profile(db, profile):
+    # Sets all PRAGMA values of a tuning profile on the database connection.
+    cur = db.cursor()
+    for pragma, value in profile.items():
+        cur.execute(f"PRAGMA {pragma} = {value}")
 
 
 def __create_tables(db):
@@ -360,44 +1293,326 @@ def __create_tables(db):
         habit_id TEXT PRIMARY KEY,
         name TEXT,
         user_name TEXT,
-        created DATETIME,
+        created EPOCH INTEGER,
         period INT,
-        deadline DATETIME,
+        deadline EPOCH INTEGER,
         is_active BOOL,
-        longest INT
+        longest INT,
+        current_streak INT DEFAULT 0
     )""")
     cur.execute("""CREATE TABLE IF NOT EXISTS users (
         user_id TEXT,
         user_name TEXT,
         password TEXT,
-        is_admin BOOL,
-        FOREIGN KEY (user_name) REFERENCES habits(user_name)
+        is_admin BOOL
     )""")
     cur.execute("""CREATE TABLE IF NOT EXISTS tasks (
         task_id TEXT,
-        created DATETIME,
+        created EPOCH INTEGER,
+        habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS task_archives (
+        habit_id TEXT PRIMARY KEY REFERENCES habits(habit_id) ON DELETE CASCADE,
+        task_count INT,
+        history BLOB
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS completion_bitmaps (
+        habit_id TEXT PRIMARY KEY REFERENCES habits(habit_id) ON DELETE CASCADE,
+        bitmap BLOB
+    )""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_tasks_discard_completion_bitmap AFTER INSERT ON tasks BEGIN
+        DELETE FROM completion_bitmaps WHERE habit_id = NEW.habit_id;
+    END""")
+    __create_rollup_tables(db)
+    __create_habit_search_table(db)
+    cur.execute(f"PRAGMA user_version = {len(__MIGRATIONS)}")
+    db.commit()
+
+
+def __create_indexes(db):
+    # Creates the indexes used by the lookups in this module, existing indexes are left untouched.
+    cur = db.cursor()
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_habits_user_name_name ON habits(user_name, name)")
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_habits_user_name_name_nocase
+        ON habits(user_name, name COLLATE NOCASE)""")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_user_name ON users(user_name)")
+    cur.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_habit_id_created_task_id
+        ON tasks(habit_id, created, task_id)""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_deadline ON habits(deadline)")
+    db.commit()
+
+
+def __is_new_database(db):
+    # Checks if the database does not contain any tables yet.
+    cur = db.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='habits'")
+    return cur.fetchone() is None
+
+
+def __upgrade_tables(db):
+    # Applies all migrations the database has not seen yet and stores the new schema version.
+    # Large tables are first copied in batches that are committed one by one, so that other connections
+    # are only blocked for a short time, the migration then finishes the copy in a single transaction.
+    cur = db.cursor()
+    cur.execute("PRAGMA user_version")
+    version = cur.fetchone()[0]
+    for migration in __MIGRATIONS[version:]:
+        if migration in __BATCHED_COPIES:
+            __BATCHED_COPIES[migration](db)
+        with unit_of_work(db):
+            migration(db)
+            version += 1
+            cur.execute(f"PRAGMA user_version = {version}")
+
+
+def __remove_duplicate_items(db):
+    # Keeps only the first stored user and habit item per name, so that the unique indexes can be created.
+    cur = db.cursor()
+    cur.execute("DELETE FROM users WHERE rowid NOT IN (SELECT MIN(rowid) FROM users GROUP BY user_name)")
+    cur.execute("DELETE FROM habits WHERE rowid NOT IN (SELECT MIN(rowid) FROM habits GROUP BY user_name, name)")
+
+
+def __add_current_streak_column(db):
+    # Adds the current streak to the habit items, initialised with the number of stored task items.
+    cur = db.cursor()
+    cur.execute("ALTER TABLE habits ADD COLUMN current_streak INT DEFAULT 0")
+    cur.execute("UPDATE habits SET current_streak = (SELECT COUNT(*) FROM tasks WHERE tasks.habit_name = habits.name)")
+
+
+def __store_datetimes_as_epoch(db):
+    # Rebuilds the habits and tasks tables with integer epoch seconds instead of datetime strings.
+    cur = db.cursor()
+    cur.execute("""CREATE TABLE habits_new (
+        habit_id TEXT PRIMARY KEY,
+        name TEXT,
+        user_name TEXT,
+        created EPOCH INTEGER,
+        period INT,
+        deadline EPOCH INTEGER,
+        is_active BOOL,
+        longest INT,
+        current_streak INT DEFAULT 0
+    )""")
+    cur.execute("""INSERT INTO habits_new SELECT habit_id, name, user_name, CAST(strftime('%s', created) AS INTEGER),
+        period, CAST(strftime('%s', deadline) AS INTEGER), is_active, longest, current_streak FROM habits""")
+    cur.execute("DROP TABLE habits")
+    cur.execute("ALTER TABLE habits_new RENAME TO habits")
+    cur.execute("""CREATE TABLE tasks_new (
+        task_id TEXT,
+        created EPOCH INTEGER,
         habit_name TEXT,
         FOREIGN KEY (habit_name) REFERENCES habits(name)
     )""")
-    db.commit()
+    cur.execute("INSERT INTO tasks_new SELECT task_id, CAST(strftime('%s', created) AS INTEGER), habit_name FROM tasks")
+    cur.execute("DROP TABLE tasks")
+    cur.execute("ALTER TABLE tasks_new RENAME TO tasks")
 
 
-def __is_user_item_stored(db, user_name):
-    # Checks if the username is present in the database.
+def __key_tasks_by_habit_id(db):
+    # Replaces the habit name of the task items by the habit ID with a cascading foreign key and
+    # removes the foreign key of the users table, which pointed to the non-unique habits(user_name).
+    # The current streaks were counted by habit name across all users, they are counted again by habit ID.
     cur = db.cursor()
-    cur.execute("SELECT * FROM users WHERE user_name=:user_name", {"user_name": user_name})
-    return len(cur.fetchall()) != 0
+    __copy_tasks_by_habit_id(db, batch_size=None)
+    cur.execute("DROP TABLE tasks")
+    cur.execute("ALTER TABLE tasks_new RENAME TO tasks")
+    cur.execute("DROP INDEX idx_habits_name_created")
+    cur.execute("UPDATE habits SET current_streak = (SELECT COUNT(*) FROM tasks WHERE habit_id = habits.habit_id)")
+    cur.execute("""CREATE TABLE users_new (
+        user_id TEXT,
+        user_name TEXT,
+        password TEXT,
+        is_admin BOOL
+    )""")
+    cur.execute("INSERT INTO users_new SELECT * FROM users")
+    cur.execute("DROP TABLE users")
+    cur.execute("ALTER TABLE users_new RENAME TO users")
 
 
-def __is_habit_item_stored(db, name, user_name):
-    # Checks if the habit name is present in the database.
+def __copy_tasks_by_habit_id(db, batch_size=10000):
+    # Copies the task items that are not yet copied into "tasks_new" and commits after every batch,
+    # without a batch size all remaining task items are copied at once. A task item is assigned to the habit
+    # item with its name that was created last before the task, task items without a habit item are dropped.
     cur = db.cursor()
-    cur.execute("SELECT * FROM habits WHERE name=:name AND user_name=:user_name",
-                {
-                    "name": name,
-                    "user_name": user_name
-                })
-    return len(cur.fetchall()) != 0
+    cur.execute("""CREATE TABLE IF NOT EXISTS tasks_new (
+        task_id TEXT,
+        created EPOCH INTEGER,
+        habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_name_created ON habits(name, created)")
+    cur.execute("SELECT COALESCE(MAX(rowid), 0) FROM tasks_new")
+    last_rowid = cur.fetchone()[0]
+    while True:
+        cur.execute("""SELECT MAX(rowid) FROM (
+            SELECT rowid FROM tasks WHERE rowid > :last_rowid ORDER BY rowid LIMIT :limit)""",
+                    {
+                        "last_rowid": last_rowid,
+                        "limit": batch_size or -1
+                    })
+        batch_rowid = cur.fetchone()[0]
+        if batch_rowid is None:
+            break
+        cur.execute("""INSERT INTO tasks_new (rowid, task_id, created, habit_id)
+            SELECT * FROM (SELECT rowid, task_id, created, COALESCE(
+                (SELECT habit_id FROM habits WHERE name = tasks.habit_name AND created <= tasks.created
+                    ORDER BY created DESC LIMIT 1),
+                (SELECT habit_id FROM habits WHERE name = tasks.habit_name ORDER BY created LIMIT 1)
+            ) AS habit_id FROM tasks WHERE rowid > :last_rowid AND rowid <= :batch_rowid)
+            WHERE habit_id IS NOT NULL""",
+                    {
+                        "last_rowid": last_rowid,
+                        "batch_rowid": batch_rowid
+                    })
+        __commit(db)
+        last_rowid = batch_rowid
+
+
+def __remove_duplicate_task_items(db):
+    # Keeps only the first stored of identical task items, so that the unique task index can be created.
+    cur = db.cursor()
+    cur.execute("""DELETE FROM tasks WHERE rowid NOT IN (
+        SELECT MIN(rowid) FROM tasks GROUP BY habit_id, created, task_id)""")
+    cur.execute("DROP INDEX IF EXISTS idx_tasks_habit_id_created")
+
+
+def __add_task_archives_table(db):
+    # Adds the table for the compacted history of archived task items.
+    cur = db.cursor()
+    cur.execute("""CREATE TABLE task_archives (
+        habit_id TEXT PRIMARY KEY REFERENCES habits(habit_id) ON DELETE CASCADE,
+        task_count INT,
+        history BLOB
+    )""")
+
+
+def __add_completion_bitmaps_table(db):
+    # Adds the table for the completion bitmaps, which are discarded whenever a task item of their habit is stored.
+    cur = db.cursor()
+    cur.execute("""CREATE TABLE completion_bitmaps (
+        habit_id TEXT PRIMARY KEY REFERENCES habits(habit_id) ON DELETE CASCADE,
+        bitmap BLOB
+    )""")
+    cur.execute("""CREATE TRIGGER trg_tasks_discard_completion_bitmap AFTER INSERT ON tasks BEGIN
+        DELETE FROM completion_bitmaps WHERE habit_id = NEW.habit_id;
+    END""")
+
+
+def __add_rollup_tables(db):
+    # Adds the rollup tables and fills them from the stored habit items and the live and archived task items.
+    # The archive module itself depends on this module, so it can only be imported once this module is loaded.
+    from archive import decompress_history
+    __create_rollup_tables(db)
+    cur = db.cursor()
+    cur.execute("""INSERT INTO daily_completions
+        SELECT habit_id, created / 86400, COUNT(*) FROM tasks GROUP BY habit_id, created / 86400""")
+    cur.execute("SELECT habit_id, history FROM task_archives")
+    for habit_id, history in cur.fetchall():
+        cur.executemany("""INSERT INTO daily_completions VALUES (?, ?, 1)
+            ON CONFLICT (habit_id, day) DO UPDATE SET completions = completions + 1""",
+                        [(habit_id, datetime_to_epoch(created) // 86400) for created in decompress_history(history)])
+    cur.execute("""INSERT INTO weekly_completions
+        SELECT habit_id, (day + 3) / 7, SUM(completions) FROM daily_completions GROUP BY habit_id, (day + 3) / 7""")
+    cur.execute("""INSERT INTO habit_counts
+        SELECT user_name, SUM(is_active = 1), SUM(is_active <> 1) FROM habits GROUP BY user_name""")
+
+
+def __create_rollup_tables(db):
+    # Creates the rollup tables and the triggers that keep them up to date.
+    cur = db.cursor()
+    cur.execute("""CREATE TABLE IF NOT EXISTS daily_completions (
+        habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE,
+        day INTEGER,
+        completions INT,
+        PRIMARY KEY (habit_id, day)
+    ) WITHOUT ROWID""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS weekly_completions (
+        habit_id TEXT REFERENCES habits(habit_id) ON DELETE CASCADE,
+        week INTEGER,
+        completions INT,
+        PRIMARY KEY (habit_id, week)
+    ) WITHOUT ROWID""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS habit_counts (
+        user_name TEXT PRIMARY KEY,
+        active INT,
+        paused INT
+    ) WITHOUT ROWID""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_tasks_count_completions AFTER INSERT ON tasks BEGIN
+        INSERT INTO daily_completions VALUES (NEW.habit_id, NEW.created / 86400, 1)
+            ON CONFLICT (habit_id, day) DO UPDATE SET completions = completions + 1;
+        INSERT INTO weekly_completions VALUES (NEW.habit_id, (NEW.created / 86400 + 3) / 7, 1)
+            ON CONFLICT (habit_id, week) DO UPDATE SET completions = completions + 1;
+    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_habits_count_insert AFTER INSERT ON habits BEGIN
+        INSERT INTO habit_counts VALUES (NEW.user_name, NEW.is_active = 1, NEW.is_active <> 1)
+            ON CONFLICT (user_name) DO UPDATE SET active = active + excluded.active, paused = paused + excluded.paused;
+    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_habits_count_delete AFTER DELETE ON habits BEGIN
+        UPDATE habit_counts SET active = active - (OLD.is_active = 1), paused = paused - (OLD.is_active <> 1)
+            WHERE user_name = OLD.user_name;
+    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_habits_count_update AFTER UPDATE OF is_active ON habits
+        WHEN OLD.is_active IS NOT NEW.is_active BEGIN
+        UPDATE habit_counts SET active = active + (NEW.is_active = 1) - (OLD.is_active = 1),
+            paused = paused + (NEW.is_active <> 1) - (OLD.is_active <> 1)
+            WHERE user_name = NEW.user_name;
+    END""")
+
+
+def __add_habit_search_table(db):
+    # Adds the search table and indexes the names of the stored habit items.
+    __create_habit_search_table(db)
+    db.execute("INSERT INTO habit_search(habit_search) VALUES ('rebuild')")
+
+
+def __create_habit_search_table(db):
+    # Creates the search table and the triggers that keep it in sync with the "habits" table.
+    # The search table refers to the rowid of the habit items, so a migration that copies the "habits" table
+    # has to rebuild it afterwards.
+    cur = db.cursor()
+    cur.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS habit_search
+        USING fts5(name, content='habits', content_rowid='rowid', tokenize='trigram')""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_habits_search_insert AFTER INSERT ON habits BEGIN
+        INSERT INTO habit_search(rowid, name) VALUES (NEW.rowid, NEW.name);
+    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_habits_search_delete AFTER DELETE ON habits BEGIN
+        INSERT INTO habit_search(habit_search, rowid, name) VALUES ('delete', OLD.rowid, OLD.name);
+    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS trg_habits_search_update AFTER UPDATE OF name ON habits BEGIN
+        INSERT INTO habit_search(habit_search, rowid, name) VALUES ('delete', OLD.rowid, OLD.name);
+        INSERT INTO habit_search(rowid, name) VALUES (NEW.rowid, NEW.name);
+    END""")
+
+
+def __quote_phrase(text):
+    # Quotes a text as FTS5 phrase, so that it is searched literally.
+    return '"' + text.replace('"', '""') + '"'
+
+
+__EPOCH = datetime(1970, 1, 1)
+__ONE_SECOND = timedelta(seconds=1)
+sqlite3.register_adapter(datetime, datetime_to_epoch)
+sqlite3.register_converter("EPOCH", epoch_to_datetime)
+
+# Nesting depth of the open units of work per database connection, keyed by the id of the connection.
+__open_units_of_work = {}
+
+# Schema migrations in the order they were introduced, the position in the list is the schema version.
+__MIGRATIONS = [
+    __remove_duplicate_items,
+    __add_current_streak_column,
+    __store_datetimes_as_epoch,
+    __key_tasks_by_habit_id,
+    __remove_duplicate_task_items,
+    __add_task_archives_table,
+    __add_completion_bitmaps_table,
+    __add_rollup_tables,
+    __add_habit_search_table
+]
+
+# Batched copies that are run before their migration is applied.
+__BATCHED_COPIES = {
+    __key_tasks_by_habit_id: __copy_tasks_by_habit_id
+}
 
 
 # debug_db = get_db(":memory:n")
@@ -1,47 +1,117 @@
 """
 Contains the logic to access all database functionalities related to habit and task management.
 
+The db argument of the functions is a sqlite3 connection or any storage of the storage module,
+e.g. storage.MemoryStorage.
+
 Functions:
-    connect_to_db(name="main.db")
+    connect_to_db(name="main.db", profile=None, instrumentation=None)
         Connects to a sqlite3 database.
-    get_habit_by_name(db, name: str, user_name: str) -> Habit
+    create_connection_pool(name="main.db", size=4, profile="throughput") -> ConnectionPool
+        Creates a pool of connections to a sqlite3 database that can be shared between threads.
+    get_habit_by_name(db, name: str, user_name: str, streaks_from_bitmap: bool = False) -> Habit
         Receives the habit item from the database by name and returns it as a Habit instance.
-    get_all_habits(db, user_name: str, is_active: bool) -> list
+    get_habits_by_names(db, names: list, user_name: str) -> list
+        Receives all habit items of a user with one of the given names and returns them as Habit instances.
+    search_habits(db, user_name: str, query: str, limit: int = 10, is_active: bool = None) -> list
+        Searches the habits of a user by name and returns the best matches as Habit instances.
+    get_all_habits(db, user_name: str, is_active: bool, streaks_from_bitmap: bool = False) -> list
         Receives all habit items stored for a particular user with a given active status
         and returns them in a list of Habit instances.
+    get_completion_bitmap(db, habit: Habit, user_name: str) -> CompletionBitmap
+        Returns the completion bitmap of a habit, a missing bitmap is built from the tasks without storing it.
+    build_missing_completion_bitmaps(db, user_name: str) -> int
+        Builds and stores the completion bitmaps of all habits of a user that have none.
     add_habit(db, habit: Habit, user_name: str)
         Takes a Habit instance and stores it as a habit item in a database.
     remove_habit(db, name: str, user_name: str)
         Removes a single habit item by name and all tasks associated to this habit.
-    get_all_tasks(db, habit_name: str)
-        Receives all tasks stored for a given habit and returns them in a list of Task instances.
-    update_streaks(db, name: str, user_name: str)
+    get_all_tasks(db, habit_name: str, user_name: str) -> list
+        Receives all live and archived tasks stored for a given habit and returns them in a list of Task instances.
+    iterate_completed_tasks(db, habit_name: str, user_name: str, first_day: date = None, last_day: date = None,
+                            page_size: int = 500) -> generator
+        Yields the live and archived tasks of a habit ordered by creation while reading them page by page.
+    archive_tasks(db, periods: int = 52, now: datetime = None) -> int
+        Moves all tasks older than a number of periods of their habit into the compressed history of the habit.
+    update_streaks(db, name: str, user_name: str, completed: datetime = None)
         Updates the stored streak of a habit according to the deadline.
     update_active_status(db, name: str, user_name: str, new_active_status: bool)
+        Sets the active status of a habit to active or inactive and stores the new status in the database.
+    expire_overdue_habits(db, now: datetime = None) -> int
+        Resets the current streak of all active habits that missed their deadline.
+    get_daily_completions(db, habit_name: str, user_name: str, first_day: date, last_day: date) -> dict
+        Returns the number of tasks of a habit per day from the precomputed rollup.
+    get_weekly_completions(db, habit_name: str, user_name: str, first_day: date, last_day: date) -> dict
+        Returns the number of tasks of a habit per ISO week from the precomputed rollup.
+    get_habit_counts(db, user_name: str) -> dict
+        Returns the number of active and paused habits of a user from the precomputed rollup.
+    import_habits(db, habits, user_name: str = None, chunk_size: int = 10000) -> dict
+        Stores many habits at once and reports the achieved throughput.
+    import_tasks(db, tasks, habit_id: str = None, chunk_size: int = 10000) -> dict
+        Stores many tasks at once and reports the achieved throughput.
 """
-from db import store_habit_item, delete_habit_item, get_habit_item_by_name, \
-    update_streaks_habit_item, get_db, get_all_habit_items_by_active_status, store_task_item, get_tasks_by_habit_name, \
-    remove_tasks_by_habit_name, update_active_status_habit_item
+from db import get_db
+from storage import as_storage
+from archive import decompress_history, merge_histories
+from completion_bitmap import CompletionBitmap
+from connection_pool import ConnectionPool
 from habit import Habit
 from task import Task
-from datetime import datetime
+import instrumentation as sql_instrumentation
+from datetime import date, datetime, timedelta
+from heapq import merge
+from itertools import islice
+import os
+import time
 
 
-def connect_to_db(name="main.db"):
+def connect_to_db(name="main.db", profile=None, instrumentation=None):
     """
     Connects to a sqlite3 database.
 
-    Param:
+    The active tuning settings can be verified with db.get_connection_settings.
+
+    Params:
         name: str
             Sets the name of the database (default is "main.db")
+        profile: str
+            Name of a tuning profile from db.PROFILES, e.g. "durable", "throughput" or "analytics"
+            (default is None, which keeps the SQLite defaults)
+        instrumentation: str
+            Report format "json" or "text" to record the SQL statements and latencies of the db functions
+            until the program exits, see the instrumentation module (default is None, which records nothing
+            unless the environment variable HABIT_TRACKER_INSTRUMENTATION is set)
 
     Return:
         sqlite3 db
     """
-    return get_db(name)
+    if instrumentation is not None:
+        sql_instrumentation.enable(instrumentation, os.environ.get(sql_instrumentation.FILE_ENVIRONMENT_VARIABLE))
+    return get_db(name, profile)
+
+
+def create_connection_pool(name="main.db", size=4, profile="throughput") -> ConnectionPool:
+    """
+    Creates a pool of connections to a sqlite3 database that can be shared between threads.
 
+    The connections checked out of the pool are passed to the other functions of this module like
+    the connection returned by connect_to_db. Writing functions have to use pool.write(), all others pool.read().
 
-def get_habit_by_name(db, name: str, user_name: str) -> Habit or None:
+    Params:
+        name: str
+            Name of the database file (default "main.db")
+        size: int
+            Number of reader connections (default 4)
+        profile: str
+            Name of a tuning profile with write-ahead log (default "throughput")
+
+    Return:
+        ConnectionPool
+    """
+    return ConnectionPool(name, size, profile)
+
+
+def get_habit_by_name(db, name: str, user_name: str, streaks_from_bitmap: bool = False) -> Habit or None:
     """
     Receives the habit item from the database by name and returns it as a Habit instance.
 
@@ -52,28 +122,78 @@ def get_habit_by_name(db, name: str, user_name: str) -> Habit or None:
             Name of the habit
         user_name: str
             Name of the user who has stored the habit
+        streaks_from_bitmap: bool
+            Takes the streaks from the stored completion bitmap instead of the stored streaks, a habit without
+            bitmap keeps its stored streaks (default False)
 
     Return:
         Habit instance if habit item is stored, otherwise None
     """
-    if get_habit_item_by_name(db, name, user_name) is None:
+    storage = as_storage(db)
+    habit_items = storage.get_habit_item_by_name(name, user_name)
+    if habit_items is None:
         return None
-    else:
-        habit_item = get_habit_item_by_name(db, name, user_name)[0]
-        return Habit(
-            habit_id=habit_item[0],
-            name=habit_item[1],
-            created=habit_item[3],
-            period=habit_item[4],
-            deadline=datetime.strptime(habit_item[5], "%Y-%m-%d %H:%M:%S"),
-            is_active=habit_item[6] == 1,
-            current_streak=len(get_tasks_by_habit_name(db, habit_item[1])),
-
-            longest_streak=habit_item[7]
-        )
+    habit = __create_habit(habit_items[0])
+    if streaks_from_bitmap:
+        bitmap = storage.get_completion_bitmap_item(habit.habit_id)
+        if bitmap is not None:
+            __set_streaks(habit, CompletionBitmap(habit.created, habit.period, bitmap))
+    return habit
 
 
-def get_all_habits(db, user_name: str, is_active: bool) -> list:
+def get_habits_by_names(db, names: list, user_name: str) -> list:
+    """
+    Receives all habit items of a user with one of the given names and returns them as Habit instances.
+
+    Params:
+        db: str
+            Name of the database where the habits are stored
+        names: list
+            Names of the habits, unknown names are skipped
+        user_name: str
+            Name of the user who has stored the habits
+
+    Return:
+        list
+            A list containing the received Habit instances, can be empty
+    """
+    return [__create_habit(habit_item) for habit_item in as_storage(db).get_habit_items_by_names(names, user_name)]
+
+
+def search_habits(db, user_name: str, query: str, limit: int = 10, is_active: bool = None) -> list:
+    """
+    Searches the habits of a user by name and returns the best matches as Habit instances.
+
+    Queries with less than three characters are matched as prefix of the name, ignoring only the case of ASCII
+    letters. Longer queries are matched anywhere in the name, ignoring the case of all letters, if fewer than
+    limit habits match, the list is filled up with the habits whose names resemble the query most.
+
+    Params:
+        db: str
+            Name of the database in which the habits are stored
+        user_name: str
+            Name of the user whose habits are searched
+        query: str
+            Searched part of the habit name
+        limit: int
+            Highest number of returned habits (default 10)
+        is_active: bool
+            Only habits with this active status are searched, None searches all habits (default None)
+
+    Return:
+        list
+            Habit instances, names containing the query before similar names
+    """
+    storage = as_storage(db)
+    habit_items = storage.search_habit_items(user_name, query, limit, is_active=is_active)
+    if len(habit_items) < limit and len(query) >= 3:
+        found = {habit_item[0] for habit_item in habit_items}
+        similar_items = storage.search_habit_items(user_name, query, limit, fuzzy=True, is_active=is_active)
+        habit_items += [habit_item for habit_item in similar_items if habit_item[0] not in found]
+    return [__create_habit(habit_item) for habit_item in habit_items[:limit]]
+
+
+def get_all_habits(db, user_name: str, is_active: bool, streaks_from_bitmap: bool = False) -> list:
     """
     Receives all habit items stored for a particular user with a given active status
     and returns them in a list of Habit instances.
@@ -85,27 +205,84 @@ def get_all_habits(db, user_name: str, is_active: bool) -> list:
             Name of the user for which the habits shall be retrieved
         is_active: bool
             Filters only active or inactive habits
+        streaks_from_bitmap: bool
+            Takes the streaks from the stored completion bitmaps instead of the stored streaks, habits without
+            bitmap keep their stored streaks (default False)
 
     Return:
         all_habits: list
             A list containing all received Habit instances, can be empty
     """
-    all_habits = []
-    for habit_item in get_all_habit_items_by_active_status(db, user_name, is_active):
-        habit = Habit(
-            habit_id=habit_item[0],
-            name=habit_item[1],
-            created=habit_item[3],
-            period=habit_item[4],
-            deadline=datetime.strptime(habit_item[5], "%Y-%m-%d %H:%M:%S"),
-            is_active=habit_item[6] == 1,
-            current_streak=len(get_tasks_by_habit_name(db, habit_item[1])),
-            longest_streak=habit_item[7]
-        )
-        all_habits.append(habit)
+    storage = as_storage(db)
+    all_habits = [
+        __create_habit(habit_item)
+        for habit_item in storage.get_all_habit_items_by_active_status(user_name, is_active)
+    ]
+    if streaks_from_bitmap:
+        bitmaps = storage.get_completion_bitmap_items_by_user(user_name)
+        for habit in all_habits:
+            if habit.habit_id in bitmaps:
+                __set_streaks(habit, CompletionBitmap(habit.created, habit.period, bitmaps[habit.habit_id]))
     return all_habits
 
 
+def get_completion_bitmap(db, habit: Habit, user_name: str) -> CompletionBitmap:
+    """
+    Returns the completion bitmap of a habit, a missing bitmap is built from the tasks without storing it.
+
+    The streaks of a bitmap count the completed periods since the creation of the habit, while the stored streaks
+    count the completions within the deadline of the previous completion. Both can differ for the same tasks.
+
+    Params:
+        db: str
+            Name of the database in which the habit is stored
+        habit: Habit
+            The habit whose completions are returned
+        user_name: str
+            Name of the user to which the habit belongs
+
+    Return:
+        CompletionBitmap
+            One bit per period since the creation of the habit, live and archived tasks are included
+    """
+    bitmap = as_storage(db).get_completion_bitmap_item(habit.habit_id)
+    if bitmap is not None:
+        return CompletionBitmap(habit.created, habit.period, bitmap)
+    return __build_completion_bitmap(db, habit, user_name)
+
+
+def build_missing_completion_bitmaps(db, user_name: str) -> int:
+    """
+    Builds and stores the completion bitmaps of all habits of a user that have none.
+
+    Completing a task with update_streaks keeps a stored bitmap of its habit up to date, but storing tasks in
+    another way, e.g. with import_tasks, discards it and update_streaks does not build it again. This maintenance
+    call builds the missing bitmaps from the tasks in a single transaction.
+
+    Params:
+        db: str
+            Name of the database in which the habits are stored
+        user_name: str
+            Name of the user whose habits are regarded
+
+    Return:
+        int
+            Number of built bitmaps
+    """
+    storage = as_storage(db)
+    bitmaps = storage.get_completion_bitmap_items_by_user(user_name)
+    habits = [
+        habit for is_active in [True, False] for habit in get_all_habits(db, user_name, is_active)
+        if habit.habit_id not in bitmaps
+    ]
+    with storage.unit_of_work():
+        for habit in habits:
+            storage.store_completion_bitmap_item(
+                habit.habit_id, __build_completion_bitmap(db, habit, user_name).to_bytes()
+            )
+    return len(habits)
+
+
 def add_habit(db, habit: Habit, user_name: str):
     """
     Takes a Habit instance and stores it as a habit item in a database.
@@ -119,13 +296,15 @@ def add_habit(db, habit: Habit, user_name: str):
             Name of the user who stores the habit
     """
     created = datetime.now().replace(microsecond=0)
-    store_habit_item(db, habit.habit_id, habit.name, user_name, created, habit.period, habit.deadline)
+    as_storage(db).store_habit_item(habit.habit_id, habit.name, user_name, created, habit.period, habit.deadline)
 
 
 def remove_habit(db, name: str, user_name: str):
     """
     Removes a single habit item by name and all tasks associated to this habit.
 
+    The tasks are deleted by the database together with the habit.
+
     Params:
         db: str
             Name of the database in which the habit is stored
@@ -134,26 +313,32 @@ def remove_habit(db, name: str, user_name: str):
         user_name: str
             Name of the user to verify the correct habit is removed
     """
-    delete_habit_item(db, name, user_name)
-    remove_tasks_by_habit_name(db, name)
+    as_storage(db).delete_habit_item(name, user_name)
 
 
-def get_all_tasks(db, habit_name: str) -> list:
+def get_all_tasks(db, habit_name: str, user_name: str) -> list:
     """
-    Receives all tasks stored for a given habit and returns them in a list of Task instances.
+    Receives all live and archived tasks stored for a given habit and returns them in a list of Task instances.
+
+    Archived tasks have no task_id anymore, only their creation is kept.
 
     Params:
         db: str
             Name of the database in which the tasks are stored
         habit_name: str
             Name of the habit to which the tasks are associated
+        user_name: str
+            Name of the user to which the habit belongs
 
     Return:
         all_tasks: list
-            A list with Task instances, can be empty
+            A list with Task instances ordered by creation, can be empty
     """
-    all_tasks = []
-    for task_item in get_tasks_by_habit_name(db, habit_name):
+    storage = as_storage(db)
+    archive_item = storage.get_task_archive_item_by_habit_name(habit_name, user_name)
+    all_tasks = [Task(task_id=None, created=created) for created in decompress_history(archive_item[2])] \
+        if archive_item is not None else []
+    for task_item in storage.get_tasks_by_habit_name(habit_name, user_name):
         task = Task(
             task_id=task_item[0],
             created=task_item[1]
@@ -162,13 +347,93 @@ def get_all_tasks(db, habit_name: str) -> list:
     return all_tasks
 
 
-def update_streaks(db, name: str, user_name: str):
+def iterate_completed_tasks(db, habit_name: str, user_name: str, first_day: date = None, last_day: date = None,
+                            page_size: int = 500):
+    """
+    Yields the live and archived tasks of a habit ordered by creation while reading them page by page.
+
+    Only one page of live tasks is held in memory at a time, archived tasks are taken from the
+    compressed history of the habit. Archived tasks have no task_id anymore.
+
+    Params:
+        db: str
+            Name of the database in which the tasks are stored
+        habit_name: str
+            Name of the habit to which the tasks are associated
+        user_name: str
+            Name of the user to which the habit belongs
+        first_day: date
+            Only tasks completed on or after this day are yielded (default None yields all earlier tasks)
+        last_day: date
+            Only tasks completed on or before this day are yielded (default None yields all later tasks)
+        page_size: int
+            Number of live tasks read at once (default 500)
+
+    Yield:
+        Task
+            The tasks ordered by creation
+    """
+    assert page_size >= 1, f"Page size {page_size} has to be greater or equal than one"
+
+    created_from = datetime.combine(first_day, datetime.min.time()) if first_day is not None else None
+    created_before = datetime.combine(last_day + timedelta(days=1), datetime.min.time()) \
+        if last_day is not None else None
+    storage = as_storage(db)
+    archive_item = storage.get_task_archive_item_by_habit_name(habit_name, user_name)
+    archived_tasks = (
+        Task(task_id=None, created=created) for created in decompress_history(archive_item[2])
+        if (created_from is None or created >= created_from) and (created_before is None or created < created_before)
+    ) if archive_item is not None else iter([])
+    yield from merge(archived_tasks,
+                     __iterate_live_tasks(storage, habit_name, user_name, created_from, created_before, page_size),
+                     key=lambda task: task.created)
+
+
+def archive_tasks(db, periods: int = 52, now: datetime = None) -> int:
+    """
+    Moves all tasks older than a number of periods of their habit into the compressed history of the habit.
+
+    Each habit is archived in its own transaction, so an interrupted run leaves no task in both places.
+
+    Params:
+        db: str
+            Name of the database in which the tasks are stored
+        periods: int
+            Tasks created more than this number of periods of their habit ago are archived (default 52)
+        now: datetime
+            Moment from which the periods are counted back (default None uses the current time)
+
+    Return:
+        int
+            Number of archived tasks
+    """
+    assert periods > 0, "The number of periods must be positive"
+    storage = as_storage(db)
+    now = now or datetime.now().replace(microsecond=0)
+    archived = 0
+    for habit_id, period in storage.get_habit_periods_with_task_items_before(periods, now):
+        with storage.unit_of_work():
+            created_datetimes = storage.delete_task_items_before(habit_id, now - timedelta(days=period * periods))
+            archive_item = storage.get_task_archive_item(habit_id)
+            task_count = archive_item[1] if archive_item is not None else 0
+            history = archive_item[2] if archive_item is not None else None
+            storage.store_task_archive_item(
+                habit_id, task_count + len(created_datetimes), merge_histories(history, created_datetimes)
+            )
+            archived += len(created_datetimes)
+    return archived
+
+
+def update_streaks(db, name: str, user_name: str, completed: datetime = None):
     """
     Updates the stored streak of a habit according to the deadline.
 
     If the task was completed within the deadline,
     the current streak is increased by one and the task will be stored in the database. If not,
-    the current streak is set to zero and all associated tasks are deleted.
+    the current streak is set to zero and the deadline is moved by one period.
+    The streaks are updated by the database itself and all changes are committed in a single transaction.
+    A stored completion bitmap of the habit is kept up to date, a missing one is left to
+    build_missing_completion_bitmaps, so that completing a task does not read the whole history.
 
     Params:
     db: str
@@ -177,14 +442,25 @@ def update_streaks(db, name: str, user_name: str):
         Name of the habit that shall be updated
     user_name: str
         Name of the user to which the habit belongs
+    completed: datetime
+        Date and time the task was completed (default None uses the current time)
     """
-    habit_entity = get_habit_by_name(db, name, user_name)
-    habit_entity.complete_task()
-    if habit_entity.current_streak == 0:
-        remove_tasks_by_habit_name(db, habit_entity.habit_id)
-    else:
-        update_streaks_habit_item(db, habit_entity.name, user_name, habit_entity.deadline, habit_entity.longest_streak)
-        store_task_item(db, datetime.now().replace(microsecond=0), habit_entity.name)
+    completed = completed or datetime.now().replace(microsecond=0)
+    storage = as_storage(db)
+    with storage.unit_of_work():
+        habit_entity = get_habit_by_name(db, name, user_name)
+        habit_entity.complete_task(completed)
+        if habit_entity.current_streak == 0:
+            storage.reset_streak_habit_item(habit_entity.name, user_name, habit_entity.deadline)
+        else:
+            bitmap = storage.get_completion_bitmap_item(habit_entity.habit_id)
+            storage.update_streaks_habit_item(habit_entity.name, user_name, habit_entity.deadline)
+            storage.store_task_item(completed, habit_entity.habit_id)
+            if bitmap is not None:
+                completion_bitmap = CompletionBitmap(habit_entity.created, habit_entity.period, bitmap)
+                if completed >= habit_entity.created:
+                    completion_bitmap.mark(completed)
+                storage.store_completion_bitmap_item(habit_entity.habit_id, completion_bitmap.to_bytes())
 
 
 def update_active_status(db, name: str, user_name: str, new_active_status: bool):
@@ -199,6 +475,252 @@ def update_active_status(db, name: str, user_name: str, new_active_status: bool)
         user_name: str
             Name of the user to which the habit belongs
     """
-    habit_entity = get_habit_by_name(db, name, user_name)
-    habit_entity.set_active_status(new_active_status)
-    update_active_status_habit_item(db, habit_entity.name, user_name, habit_entity.deadline, habit_entity.is_active)
+    storage = as_storage(db)
+    with storage.unit_of_work():
+        habit_entity = get_habit_by_name(db, name, user_name)
+        habit_entity.set_active_status(new_active_status)
+        storage.update_active_status_habit_item(
+            habit_entity.name, user_name, habit_entity.deadline, habit_entity.is_active
+        )
+
+
+def expire_overdue_habits(db, now: datetime = None) -> int:
+    """
+    Resets the current streak of all active habits that missed their deadline.
+
+    The deadlines are moved ahead by whole periods, so the next deadline of each habit lies in the future.
+    Without this, a missed deadline is only noticed when the next task of the habit is completed.
+
+    Params:
+        db: str
+            Name of the database in which the habits are stored
+        now: datetime
+            Moment against which the deadlines are checked (default None uses the current time)
+
+    Return:
+        int
+            Number of expired habits
+    """
+    return as_storage(db).expire_overdue_habit_items(now or datetime.now().replace(microsecond=0))
+
+
+def get_daily_completions(db, habit_name: str, user_name: str, first_day: date, last_day: date) -> dict:
+    """
+    Returns the number of tasks of a habit per day from the precomputed rollup.
+
+    The rollup also counts archived tasks, so no task has to be read or decompressed.
+
+    Params:
+        db: str
+            Name of the database in which the habit is stored
+        habit_name: str
+            Name of the habit whose tasks are counted
+        user_name: str
+            Name of the user to which the habit belongs
+        first_day: date
+            First day that is counted
+        last_day: date
+            Last day that is counted
+
+    Return:
+        dict
+            Number of tasks by date, days without tasks are missing
+    """
+    rows = as_storage(db).get_daily_completion_items(habit_name, user_name, __day_number(first_day),
+                                                     __day_number(last_day))
+    return {__EPOCH_DAY + timedelta(days=day): completions for day, completions in rows}
+
+
+def get_weekly_completions(db, habit_name: str, user_name: str, first_day: date, last_day: date) -> dict:
+    """
+    Returns the number of tasks of a habit per ISO week from the precomputed rollup.
+
+    The weeks start on Monday, every week that contains a day of the range is counted completely.
+
+    Params:
+        db: str
+            Name of the database in which the habit is stored
+        habit_name: str
+            Name of the habit whose tasks are counted
+        user_name: str
+            Name of the user to which the habit belongs
+        first_day: date
+            A day of the first week that is counted
+        last_day: date
+            A day of the last week that is counted
+
+    Return:
+        dict
+            Number of tasks by tuple of ISO year and ISO week number, weeks without tasks are missing
+    """
+    rows = as_storage(db).get_weekly_completion_items(habit_name, user_name, __week_number(first_day),
+                                                      __week_number(last_day))
+    return {
+        tuple((__EPOCH_DAY + timedelta(days=week * 7 - 3)).isocalendar()[:2]): completions
+        for week, completions in rows
+    }
+
+
+def get_habit_counts(db, user_name: str) -> dict:
+    """
+    Returns the number of active and paused habits of a user from the precomputed rollup.
+
+    Params:
+        db: str
+            Name of the database in which the habits are stored
+        user_name: str
+            Name of the user whose habits are counted
+
+    Return:
+        dict
+            Number of habits with the keys "active" and "paused"
+    """
+    habit_count_item = as_storage(db).get_habit_count_item(user_name)
+    if habit_count_item is None:
+        return {"active": 0, "paused": 0}
+    return {"active": habit_count_item[1], "paused": habit_count_item[2]}
+
+
+def import_habits(db, habits, user_name: str = None, chunk_size: int = 10000) -> dict:
+    """
+    Stores many habits at once and reports the achieved throughput.
+
+    The habits are stored in chunks, each chunk is inserted with a single statement and committed in its own
+    transaction. Habits whose ID or name is already stored for the same user are skipped.
+
+    Params:
+        db: str
+            Name of the database in which the habits shall be stored
+        habits: iterable
+            Habit instances or habit rows with the columns of the "habits" table in table order
+        user_name: str
+            Name of the user who stores the Habit instances, not needed for habit rows
+        chunk_size: int
+            Number of habits stored per transaction (default 10000)
+
+    Return:
+        dict
+            "rows": number of received habits, "inserted": number of stored habits,
+            "seconds": duration of the import, "rows_per_second": received habits per second
+    """
+    storage = as_storage(db)
+    habit_items = (
+        (habit.habit_id, habit.name, user_name, habit.created, habit.period, habit.deadline, habit.is_active,
+         habit.longest_streak, habit.current_streak) if isinstance(habit, Habit) else habit
+        for habit in habits
+    )
+    return __import_in_chunks(storage, habit_items, storage.store_habit_items, chunk_size)
+
+
+def import_tasks(db, tasks, habit_id: str = None, chunk_size: int = 10000) -> dict:
+    """
+    Stores many tasks at once and reports the achieved throughput.
+
+    The tasks are stored in chunks, each chunk is inserted with a single statement and committed in its own
+    transaction. Tasks that are already stored with the same ID and creation for the same habit are skipped.
+    The completion bitmaps of the habits are discarded, build_missing_completion_bitmaps builds them again.
+    The stored streaks and deadlines of the habits are not changed, the caller has to import habits whose
+    streaks are consistent with their tasks, e.g. with import_habits.
+
+    Params:
+        db: str
+            Name of the database in which the tasks shall be stored
+        tasks: iterable
+            Task instances or task rows with the columns task_id, created, and habit_id
+        habit_id: str
+            ID of the habit to which the Task instances belong, not needed for task rows
+        chunk_size: int
+            Number of tasks stored per transaction (default 10000)
+
+    Return:
+        dict
+            "rows": number of received tasks, "inserted": number of stored tasks,
+            "seconds": duration of the import, "rows_per_second": received tasks per second
+
+    Raise:
+        HabitIdIsUnknownError
+            Raised if a task belongs to an unknown habit, no task of its chunk is stored, earlier chunks stay stored
+    """
+    storage = as_storage(db)
+    task_items = (
+        (task.task_id, task.created, habit_id) if isinstance(task, Task) else task
+        for task in tasks
+    )
+    return __import_in_chunks(storage, task_items, storage.store_task_items, chunk_size)
+
+
+def __import_in_chunks(storage, items, store_items, chunk_size: int) -> dict:
+    # Stores the items chunk by chunk with one transaction per chunk and measures the throughput.
+    rows = 0
+    inserted = 0
+    start = time.perf_counter()
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        with storage.unit_of_work():
+            inserted += store_items(chunk)
+        rows += len(chunk)
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "inserted": inserted,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0
+    }
+
+
+def __iterate_live_tasks(storage, habit_name: str, user_name: str, created_from: datetime, created_before: datetime,
+                         page_size: int):
+    # Yields the live tasks of a habit ordered by creation, each page continues after the last task of the one before.
+    after = None
+    while True:
+        task_items = storage.get_task_items_page(habit_name, user_name, after, page_size, created_from,
+                                                 created_before)
+        for task_item in task_items:
+            yield Task(task_id=task_item[0], created=task_item[1])
+        if len(task_items) < page_size:
+            return
+        after = (task_items[-1][1], task_items[-1][0])
+
+
+def __day_number(day: date) -> int:
+    # Returns the number of days since 1970-01-01 as used by the rollup tables.
+    return (day - __EPOCH_DAY).days
+
+
+def __week_number(day: date) -> int:
+    # Returns the number of weeks since the Monday before 1970-01-01 as used by the rollup tables.
+    return (__day_number(day) + 3) // 7
+
+
+def __build_completion_bitmap(db, habit: Habit, user_name: str) -> CompletionBitmap:
+    # Builds the completion bitmap of a habit from its live and archived tasks.
+    completion_bitmap = CompletionBitmap(habit.created, habit.period)
+    for task in get_all_tasks(db, habit.name, user_name):
+        if task.created >= habit.created:
+            completion_bitmap.mark(task.created)
+    return completion_bitmap
+
+
+def __set_streaks(habit: Habit, completion_bitmap: CompletionBitmap):
+    # Replaces the stored streaks of a Habit instance with the streaks of its completion bitmap.
+    habit.current_streak = completion_bitmap.current_streak()
+    habit.longest_streak = completion_bitmap.longest_streak()
+
+
+def __create_habit(habit_item) -> Habit:
+    # Creates a Habit instance from a habit item.
+    return Habit(
+        habit_id=habit_item[0],
+        name=habit_item[1],
+        created=habit_item[3],
+        period=habit_item[4],
+        deadline=habit_item[5],
+        is_active=habit_item[6] == 1,
+        current_streak=habit_item[8],
+        longest_streak=habit_item[7]
+    )
+
+
+__EPOCH_DAY = date(1970, 1, 1)
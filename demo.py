@@ -31,14 +31,17 @@ import questionary
 import hashlib
 import uuid
 from setup import setup_demo_db, teardown_db
-from db_logic import add_habit, remove_habit, \
-    update_streaks, get_habit_by_name, get_all_habits, update_active_status, get_all_tasks
-from user_logic import add_user, get_user_by_name, validate_password, get_all_users, remove_user
+from prompt_toolkit.completion import Completer, Completion
+from db_logic import add_habit, remove_habit, search_habits, \
+    update_streaks, get_habit_by_name, get_all_habits, update_active_status, iterate_completed_tasks, \
+    get_weekly_completions
+from user_logic import add_user, get_user_by_name, validate_password, get_users_page, remove_user
 from analysis import analyse_habits
 from custom_exceptions import HabitSaveError, HabitUpdateError, HabitDeletionError
 from habit import Habit
 from user import User
 from datetime import datetime, timedelta
+from itertools import islice
 
 feedback_style = "bold fg:cyan"
 custom_style = questionary.Style([
@@ -255,9 +258,8 @@ def __add_a_new_habit(db, user_name: str):
 
 def __complete_a_task(db, user_name: str):
     # The current streak of the selected habit is increased by one after user confirmation.
-    habit_to_update = questionary.select("Select a habit you want to complete a task for:",
-                                         choices=[habit.name for habit in all_active_habits]
-                                         ).ask()
+    habit_to_update = __select_habit(db, user_name, "Select a habit you want to complete a task for:",
+                                     all_active_habits)
     update = questionary.confirm(
         f"Complete task for '{habit_to_update}'?", style=custom_style, auto_enter=False
     ).ask()
@@ -300,9 +302,7 @@ def __pause_reactivate_habit(db, user_name: str):
                                       choices=[choices["pause"], choices["reactivate"], choices["return"]]).ask()
         if task == choices["pause"]:
             new_status = False
-            habit = questionary.select("Select a habit you want to pause:",
-                                       choices=[habit.name for habit in all_active_habits]
-                                       ).ask()
+            habit = __select_habit(db, user_name, "Select a habit you want to pause:", all_active_habits)
             pause = questionary.confirm(f"Pause {habit}?", style=custom_style, auto_enter=False).ask()
             if pause:
                 update_active_status(db, habit, user_name, new_status)
@@ -311,9 +311,7 @@ def __pause_reactivate_habit(db, user_name: str):
                 questionary.print("Habit has not been paused.", style=feedback_style)
         elif task == choices["reactivate"]:
             new_status = True
-            habit = questionary.select("Select a habit you want to reactivate:",
-                                       choices=[habit.name for habit in all_inactive_habits]
-                                       ).ask()
+            habit = __select_habit(db, user_name, "Select a habit you want to reactivate:", all_inactive_habits)
             reactivate = questionary.confirm(f"Reactivate {habit}?", style=custom_style, auto_enter=False).ask()
             if reactivate:
                 update_active_status(db, habit, user_name, new_status)
@@ -326,9 +324,7 @@ def __pause_reactivate_habit(db, user_name: str):
 
 def __remove_habit(db, user_name: str):
     # Removes a habit after user confirmation and gives feedback from database.
-    old_habit = questionary.select("Select a habit you want to remove:",
-                                   choices=[habit.name for habit in all_active_habits]
-                                   ).ask()
+    old_habit = __select_habit(db, user_name, "Select a habit you want to remove:", all_active_habits)
     delete = questionary.confirm(f"Delete {old_habit}?", style=custom_style, auto_enter=False).ask()
     if delete:
         remove_habit(db, old_habit, user_name)
@@ -337,6 +333,32 @@ def __remove_habit(db, user_name: str):
         questionary.print("Habit has not been deleted.", style=feedback_style)
 
 
+def __select_habit(db, user_name: str, message: str, habits: list) -> str:
+    # Lets the user select one of the habits, which share their active status, long lists are searched by name
+    # while typing instead.
+    names = [habit.name for habit in habits]
+    if len(names) <= 20:
+        return questionary.select(message, choices=names).ask()
+    known_names = set(names)
+    return questionary.autocomplete(
+        message, choices=names, completer=__HabitCompleter(db, user_name, habits[0].is_active), style=custom_style,
+        validate=lambda name: True if name in known_names else "Please enter the name of one of your habits!"
+    ).ask()
+
+
+class __HabitCompleter(Completer):
+    # Completes the entered text with the names of the matching habits that have the given active status.
+
+    def __init__(self, db, user_name: str, is_active: bool):
+        self.__db = db
+        self.__user_name = user_name
+        self.__is_active = is_active
+
+    def get_completions(self, document, complete_event):
+        for habit in search_habits(self.__db, self.__user_name, document.text, 20, self.__is_active):
+            yield Completion(habit.name, start_position=-len(document.text))
+
+
 def __analyse_all_my_habits(db):
     # Shows analysis options to user and receives requested data from analysis module.
     in_analysis = True
@@ -348,6 +370,7 @@ def __analyse_all_my_habits(db):
             "all": "All habits with same period.",
             "longest": "Habit with longest streak.",
             "completed": "Completed tasks.",
+            "weekly": "Completions per week.",
             "return": "Return to home screen."
         }
         if all_active_habits and all_inactive_habits:
@@ -357,6 +380,7 @@ def __analyse_all_my_habits(db):
                                                choices["all"],
                                                choices["longest"],
                                                choices["completed"],
+                                               choices["weekly"],
                                                choices["return"]]
                                       ).ask()
         elif all_active_habits and not all_inactive_habits:
@@ -365,6 +389,7 @@ def __analyse_all_my_habits(db):
                                                choices["all"],
                                                choices["longest"],
                                                choices["completed"],
+                                               choices["weekly"],
                                                choices["return"]]
                                       ).ask()
         else:
@@ -394,10 +419,27 @@ def __analyse_all_my_habits(db):
             __print_result(analyse_habits(task, active_habits=all_active_habits))
 
         elif task == choices["completed"]:
-            habit_name = questionary.select("Select a habit you want to see the completed tasks for:",
-                                            choices=[habit.name for habit in all_active_habits]).ask()
-            output = analyse_habits(task, completed_tasks=get_all_tasks(db, habit_name))
-            __print_result(output)
+            habit_name = __select_habit(db, logged_in_as, "Select a habit you want to see the completed tasks for:",
+                                        all_active_habits)
+            first_day = questionary.text("Enter the first day (YYYY-MM-DD) or leave empty:",
+                                         validate=__validate_day, style=custom_style).ask()
+            last_day = questionary.text("Enter the last day (YYYY-MM-DD) or leave empty:",
+                                        validate=__validate_day, style=custom_style).ask()
+            completed_tasks = iterate_completed_tasks(db, habit_name, logged_in_as, __parse_day(first_day),
+                                                      __parse_day(last_day))
+            __page_through_completed_tasks(task, completed_tasks)
+        elif task == choices["weekly"]:
+            habit_name = __select_habit(db, logged_in_as,
+                                        "Select a habit you want to see the completions per week for:",
+                                        all_active_habits)
+            today = datetime.now().date()
+            weekly_completions = get_weekly_completions(db, habit_name, logged_in_as, today - timedelta(weeks=11),
+                                                        today)
+            output = analyse_habits(task, weekly_completions=weekly_completions)
+            if output:
+                __print_result(output)
+            else:
+                questionary.print("No tasks were completed in the last twelve weeks.", style=feedback_style)
         else:
             in_analysis = False
 
@@ -413,19 +455,40 @@ def __exit_program():
 
 
 def __admin_tasks(db, active_user: str):
-    # Controls the administrator functionalities.
+    # Controls the administrator functionalities, the users are shown page by page.
     in_admin_tasks = True
+    page_size = 20
+    previous_pages = []
+    after = None
+    name_prefix = None
     while in_admin_tasks:
-        all_users = get_all_users(db)
-        for user in all_users:
-            questionary.print(f"{user.user_name}. Is admin: {user.is_admin}", style=feedback_style)
-        task = questionary.select("What do you want to do?", choices=["Delete user", "Exit"], style=custom_style).ask()
+        users_page = get_users_page(db, after, page_size, name_prefix)
+        for user, habit_counts in users_page:
+            questionary.print(f"{user.user_name}. Is admin: {user.is_admin}. Active habits: {habit_counts['active']}. "
+                              f"Paused habits: {habit_counts['paused']}", style=feedback_style)
+        choices = ["Delete user"] if users_page else []
+        if len(users_page) == page_size:
+            choices.append("Next page")
+        if previous_pages:
+            choices.append("Previous page")
+        task = questionary.select("What do you want to do?", choices=choices + ["Search users", "Exit"],
+                                  style=custom_style).ask()
         if task == "Delete user":
             user_name = questionary.select("Select user you want to delete:",
-                                           choices=[user.user_name for user in all_users]
+                                           choices=[user.user_name for user, _ in users_page]
                                            ).ask()
             if questionary.confirm(f"Are you sure you want to delete {user_name}?", auto_enter=False).ask():
                 remove_user(db, active_user, user_name)
+        elif task == "Next page":
+            previous_pages.append(after)
+            after = users_page[-1][0].user_name
+        elif task == "Previous page":
+            after = previous_pages.pop()
+        elif task == "Search users":
+            name_prefix = questionary.text("Enter the beginning of the user names (empty for all users):",
+                                           style=custom_style).ask()
+            previous_pages = []
+            after = None
         else:
             in_admin_tasks = False
             global enter
@@ -464,6 +527,35 @@ def __check_deleted_successfully(db, habit_name: str, user_name: str):
         raise HabitDeletionError
 
 
+def __page_through_completed_tasks(choice: str, completed_tasks):
+    # Prints the completed tasks 20 at a time, the next tasks are only read if the user asks for them.
+    number = 1
+    while True:
+        page = list(islice(completed_tasks, 20))
+        if not page:
+            if number == 1:
+                questionary.print("No tasks were completed in this period.", style=feedback_style)
+            return
+        __print_result(analyse_habits(choice, completed_tasks=page, first_number=number))
+        number += len(page)
+        if len(page) < 20 or not questionary.confirm("Show more tasks?", style=custom_style).ask():
+            return
+
+
+def __validate_day(text: str) -> bool or str:
+    # Checks if the entered text is empty or a day in the format YYYY-MM-DD.
+    try:
+        __parse_day(text)
+        return True
+    except ValueError:
+        return "Please enter a day like 2022-04-21 or leave empty!"
+
+
+def __parse_day(text: str):
+    # Returns the entered day as date or None if nothing was entered.
+    return datetime.strptime(text, "%Y-%m-%d").date() if text else None
+
+
 def __print_result(result):
     # Prints output from the analysis module.
     for habit in result:
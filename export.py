@@ -0,0 +1,177 @@
+"""
+Exports stored habits and tasks as CSV or JSONL without loading the whole database into memory.
+
+The items are streamed from the database in batches and written line by line, so the memory usage
+does not depend on the number of stored items. The module can also be run from the command line:
+
+    python export.py tasks --db main.db --user "test user 1" --habit "go running" --format jsonl
+
+Functions:
+    export_habits(db, file, file_format="csv", user_name=None, batch_size=1000) -> int
+        Writes all habits, or those of one user, to a file and returns the number of written habits.
+    export_tasks(db, file, file_format="csv", user_name=None, habit_name=None, batch_size=1000) -> int
+        Writes all live and archived tasks, or those of one user or habit, to a file and returns their number.
+    main(args=None)
+        Exports habits or tasks as requested by the command line arguments.
+
+Vars:
+    HABIT_COLUMNS: list
+        Names of the exported habit columns
+    TASK_COLUMNS: list
+        Names of the exported task columns
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import chain
+from archive import decompress_history
+from db import iterate_habit_items, iterate_task_items, iterate_task_archive_items, get_read_only_db, PROFILES
+
+HABIT_COLUMNS = ["habit_id", "name", "user_name", "created", "period", "deadline", "is_active", "longest",
+                 "current_streak"]
+TASK_COLUMNS = ["task_id", "created", "habit_id", "habit_name", "user_name"]
+
+
+def export_habits(db, file, file_format: str = "csv", user_name: str = None, batch_size: int = 1000) -> int:
+    """
+    Writes all habits, or those of one user, to a file and returns the number of written habits.
+
+    Params:
+        db: str
+            Name of the database in which the habits are stored
+        file: text file
+            Opened file the habits are written to
+        file_format: str
+            "csv" or "jsonl" (default "csv")
+        user_name: str
+            Only the habits of this user are written (default None writes all habits)
+        batch_size: int
+            Number of habits fetched from the database at once (default 1000)
+
+    Return:
+        int
+            Number of written habits
+    """
+    habit_items = iterate_habit_items(db, user_name, batch_size)
+    return __write_items(file, file_format, HABIT_COLUMNS, habit_items)
+
+
+def export_tasks(db, file, file_format: str = "csv", user_name: str = None, habit_name: str = None,
+                 batch_size: int = 1000) -> int:
+    """
+    Writes all live and archived tasks, or those of one user or habit, to a file and returns their number.
+
+    Archived tasks are written first and without task_id, the history of one habit is decompressed at a time.
+
+    Params:
+        db: str
+            Name of the database in which the tasks are stored
+        file: text file
+            Opened file the tasks are written to
+        file_format: str
+            "csv" or "jsonl" (default "csv")
+        user_name: str
+            Only the tasks of this user are written (default None writes all tasks)
+        habit_name: str
+            Only the tasks of the habit with this name are written, requires user_name (default None)
+        batch_size: int
+            Number of tasks fetched from the database at once (default 1000)
+
+    Return:
+        int
+            Number of written tasks
+    """
+    task_items = chain(
+        __iterate_archived_task_items(db, user_name, habit_name),
+        iterate_task_items(db, user_name, habit_name, batch_size)
+    )
+    return __write_items(file, file_format, TASK_COLUMNS, task_items)
+
+
+def main(args=None):
+    """
+    Exports habits or tasks as requested by the command line arguments.
+
+    The database is opened read-only, so a missing database is not created and nothing is written to it.
+    It is read with the cache and memory-map settings of the "analytics" profile, but its journal mode is kept,
+    as it is stored in the database file.
+
+    Param:
+        args: list
+            Command line arguments (default None reads them from sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Export habits or tasks as CSV or JSONL.")
+    parser.add_argument("items", choices=["habits", "tasks"], help="items to export")
+    parser.add_argument("--db", default="main.db", help="name of the database (default main.db)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="output format (default csv)")
+    parser.add_argument("--user", help="only export the items of this user")
+    parser.add_argument("--habit", help="only export the tasks of this habit, requires --user")
+    parser.add_argument("--output", help="output file (default stdout)")
+    arguments = parser.parse_args(args)
+    if arguments.habit is not None and (arguments.items != "tasks" or arguments.user is None):
+        parser.error("--habit can only be used to export tasks together with --user")
+
+    if not os.path.isfile(arguments.db):
+        parser.error(f"the database {arguments.db} does not exist")
+    try:
+        db = get_read_only_db(arguments.db)
+    except sqlite3.DatabaseError as error:
+        parser.error(str(error))
+    __apply_read_settings(db)
+    file = open(arguments.output, "w", newline="", encoding="utf-8") if arguments.output else sys.stdout
+    try:
+        if arguments.items == "habits":
+            export_habits(db, file, arguments.format, arguments.user)
+        else:
+            export_tasks(db, file, arguments.format, arguments.user, arguments.habit)
+    finally:
+        if file is not sys.stdout:
+            file.close()
+        db.close()
+
+
+def __apply_read_settings(db):
+    # Sets the per-connection settings of the "analytics" profile, the persistent ones are left unchanged.
+    for pragma in __READ_SETTINGS:
+        db.execute(f"PRAGMA {pragma} = {PROFILES['analytics'][pragma]}")
+
+
+def __write_items(file, file_format: str, columns: list, items) -> int:
+    # Writes the items one by one in the given format and returns the number of written items.
+    assert file_format in ["csv", "jsonl"], f"Unknown format {file_format}"
+    count = 0
+    if file_format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for item in items:
+            writer.writerow([__to_text(value) for value in item])
+            count += 1
+    else:
+        for item in items:
+            file.write(json.dumps(dict(zip(columns, [__to_text(value) for value in item]))))
+            file.write("\n")
+            count += 1
+    return count
+
+
+def __iterate_archived_task_items(db, user_name: str, habit_name: str):
+    # Yields the archived tasks in the same columns as the live tasks, with None as task_id.
+    for habit_id, name, habit_user_name, _, history in iterate_task_archive_items(db, user_name, habit_name):
+        for created in decompress_history(history):
+            yield None, created, habit_id, name, habit_user_name
+
+
+def __to_text(value):
+    # Converts datetime values to their text representation, all other values are returned unchanged.
+    return str(value) if isinstance(value, datetime) else value
+
+
+__READ_SETTINGS = ["cache_size", "mmap_size", "temp_store", "busy_timeout"]
+
+
+if __name__ == "__main__":
+    main()
@@ -27,7 +27,7 @@ class Habit:
             Length of the longest streak in days (default 0)
 
     Methods:
-        complete_task()
+        complete_task(completed: datetime = None)
             Updates deadline and streaks according to deadline
         set_active_status(is_active: bool)
             Updates the active status and sets the deadline accordingly
@@ -68,11 +68,18 @@ class Habit:
         self.current_streak = current_streak
         self.longest_streak = longest_streak
 
-    def complete_task(self):
-        """Updates deadline and streaks according to deadline."""
-        if self.__is_within_deadline():
+    def complete_task(self, completed: datetime = None):
+        """
+        Updates deadline and streaks according to deadline.
+
+        Param:
+            completed: datetime
+                Date and time the task was completed (default None uses the current time)
+        """
+        completed = completed or datetime.now().replace(microsecond=0)
+        if self.__is_within_deadline(completed):
             self.current_streak += 1
-            self.deadline = datetime.now().replace(microsecond=0) + timedelta(days=self.period)
+            self.deadline = completed + timedelta(days=self.period)
             if self.current_streak > self.longest_streak:
                 self.longest_streak = self.current_streak
         else:
@@ -101,9 +108,9 @@ class Habit:
         else:
             raise UpdateActiveStatusError
 
-    def __is_within_deadline(self):
-        # Returns True if deadline has not passed already.
-        return datetime.now() <= self.deadline
+    def __is_within_deadline(self, completed):
+        # Returns True if deadline has not passed at the moment of completion.
+        return completed <= self.deadline
 
     def __repr__(self):
         return f"{self.__class__.__name__}" \
@@ -0,0 +1,370 @@
+"""
+Records which SQL statements the db module runs, how long they and its functions take, and who calls them.
+
+The instrumentation is off by default, then it only adds a wrapper call and a flag check to every
+db function. It is switched on with the environment variable HABIT_TRACKER_INSTRUMENTATION set to
+"json" or "text", or with the instrumentation argument of db_logic.connect_to_db. The report is
+written when the program exits, to the file named by HABIT_TRACKER_INSTRUMENTATION_FILE or to stderr:
+
+    HABIT_TRACKER_INSTRUMENTATION=text python3 main.py
+
+For every db function the report contains the number of calls, the returned rows, the p50/p95/p99
+latencies, and the db_logic or user_logic functions it was called from. For every SQL statement it
+contains how often it ran, the changed rows, the p50/p95/p99 latencies, and from which db functions.
+Literals are replaced by "?" in the statements, so that the same statement with different values is
+counted once. SQLite reports every statement run by a trigger with the text of the statement that fired
+the trigger, so those statements are counted there and their time and changed rows belong to it. The
+statements of the full-text index are reported as comments, their time belongs to the running statement.
+
+A statement is timed from its start until the next statement starts or its db function returns, so
+reading its rows is part of its latency, statements outside of db functions are not timed. SQLite does
+not report the rows a query returns to the trace callback, so returned rows are only counted per db
+function.
+
+Functions:
+    instrumented(function) -> function
+        Decorator that records the calls of a db function while the instrumentation is enabled.
+    enable(report_format="json", output=None)
+        Starts recording and writes the report when the program exits.
+    disable()
+        Stops recording, the recorded data is kept until reset.
+    is_enabled() -> bool
+        Returns if the instrumentation is recording.
+    trace(db)
+        Records the SQL statements run on a connection while the instrumentation is enabled.
+    get_report() -> dict
+        Returns the recorded data with the latency percentiles of every db function and SQL statement.
+    reset()
+        Discards all recorded data.
+    dump(file, report_format="json")
+        Writes the report as JSON or as text table to a file object.
+
+Vars:
+    ENVIRONMENT_VARIABLE: str
+        Name of the environment variable that enables the instrumentation with a report format
+    FILE_ENVIRONMENT_VARIABLE: str
+        Name of the environment variable with the file the report is written to
+"""
+import atexit
+import functools
+import inspect
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+ENVIRONMENT_VARIABLE = "HABIT_TRACKER_INSTRUMENTATION"
+FILE_ENVIRONMENT_VARIABLE = "HABIT_TRACKER_INSTRUMENTATION_FILE"
+
+
+def instrumented(function):
+    """
+    Decorator that records the calls of a db function while the instrumentation is enabled.
+
+    Generators are timed while they produce items, the rows are counted when they are exhausted or closed.
+
+    Param:
+        function: function
+            Function of the db module
+
+    Return:
+        function
+            Wrapper with the same signature
+    """
+    name = f"{function.__module__}.{function.__name__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not __enabled:
+            return function(*args, **kwargs)
+        caller = __find_caller()
+        __local.functions = getattr(__local, "functions", []) + [name]
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            __finish_statement()
+            __local.functions = __local.functions[:-1]
+        if inspect.isgenerator(result):
+            return __instrumented_generator(result, name, caller, seconds)
+        __record_call(name, caller, seconds, __count_rows(result))
+        return result
+
+    return wrapper
+
+
+def enable(report_format: str = "json", output: str = None):
+    """
+    Starts recording and writes the report when the program exits.
+
+    Params:
+        report_format: str
+            "json" or "text" (default "json")
+        output: str
+            Name of the file the report is written to (default None writes to stderr)
+    """
+    assert report_format in __FORMATTERS, f"Unknown report format {report_format}"
+
+    global __enabled, __report_format, __output
+    with __lock:
+        __report_format = report_format
+        __output = output
+        if not __exit_handler_registered:
+            __register_exit_handler()
+        __enabled = True
+
+
+def disable():
+    """Stops recording, the recorded data is kept until reset."""
+    global __enabled
+    __enabled = False
+
+
+def is_enabled() -> bool:
+    """
+    Returns if the instrumentation is recording.
+
+    Return:
+        bool
+    """
+    return __enabled
+
+
+def trace(db):
+    """
+    Records the SQL statements run on a connection while the instrumentation is enabled.
+
+    Param:
+        db: sqlite3 db
+            Connection whose statements are recorded
+    """
+    db.set_trace_callback(functools.partial(__record_statement, db))
+
+
+def get_report() -> dict:
+    """
+    Returns the recorded data with the latency percentiles of every db function and SQL statement.
+
+    Return:
+        dict
+            "functions" with calls, rows, p50_ms, p95_ms, p99_ms, and callers by db function,
+            "statements" with count, changed_rows, p50_ms, p95_ms, p99_ms, and functions by SQL statement
+    """
+    with __lock:
+        return {
+            "functions": {
+                name: {
+                    "calls": record["calls"],
+                    "rows": record["rows"],
+                    "p50_ms": __percentile(record["latencies"], record["calls"], 0.50),
+                    "p95_ms": __percentile(record["latencies"], record["calls"], 0.95),
+                    "p99_ms": __percentile(record["latencies"], record["calls"], 0.99),
+                    "callers": dict(record["callers"].most_common())
+                }
+                for name, record in sorted(__functions.items())
+            },
+            "statements": {
+                statement: {
+                    "count": record["count"],
+                    "changed_rows": record["changed_rows"],
+                    "p50_ms": __percentile(record["latencies"], record["timed"], 0.50),
+                    "p95_ms": __percentile(record["latencies"], record["timed"], 0.95),
+                    "p99_ms": __percentile(record["latencies"], record["timed"], 0.99),
+                    "functions": dict(record["functions"].most_common())
+                }
+                for statement, record in sorted(__statements.items(), key=lambda item: -item[1]["count"])
+            }
+        }
+
+
+def reset():
+    """Discards all recorded data."""
+    with __lock:
+        __functions.clear()
+        __statements.clear()
+
+
+def dump(file, report_format: str = "json"):
+    """
+    Writes the report as JSON or as text table to a file object.
+
+    Params:
+        file: file object
+            Opened text file or stream
+        report_format: str
+            "json" or "text" (default "json")
+    """
+    assert report_format in __FORMATTERS, f"Unknown report format {report_format}"
+
+    file.write(__FORMATTERS[report_format](get_report()))
+
+
+def __instrumented_generator(generator, name, caller, seconds):
+    # Yields the items of a generator, measures the time spent producing them, and records the call at the end.
+    rows = 0
+    try:
+        while True:
+            __local.functions = getattr(__local, "functions", []) + [name]
+            start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - start
+                __finish_statement()
+                __local.functions = __local.functions[:-1]
+            rows += 1
+            yield item
+    finally:
+        generator.close()
+        __record_call(name, caller, seconds, rows)
+
+
+def __record_call(name, caller, seconds, rows):
+    # Adds a call of a db function to the recorded data.
+    with __lock:
+        record = __functions[name]
+        record["calls"] += 1
+        record["rows"] += rows
+        record["latencies"][__latency_bucket(seconds)] += 1
+        record["callers"][caller] += 1
+
+
+def __record_statement(db, statement):
+    # Adds a SQL statement to the recorded data, called by sqlite3 for every statement of a traced connection.
+    # A statement with the text of the running one is run by a trigger, a comment is run by the full-text index,
+    # neither ends the running statement.
+    if not __enabled:
+        return
+    functions = getattr(__local, "functions", [])
+    function = functions[-1] if functions else "untracked"
+    normalized = __normalize(statement)
+    running = getattr(__local, "statement", None)
+    if not statement.startswith("--") and (running is None or running[0] != statement):
+        __finish_statement()
+        if functions:
+            __local.statement = (statement, normalized, db, time.perf_counter(), db.total_changes)
+    with __lock:
+        record = __statements[normalized]
+        record["count"] += 1
+        record["functions"][function] += 1
+
+
+def __finish_statement():
+    # Records the latency and the changed rows of the statement running on this thread, if there is one.
+    running = getattr(__local, "statement", None)
+    if running is None:
+        return
+    __local.statement = None
+    _, normalized, db, start, total_changes = running
+    seconds = time.perf_counter() - start
+    with __lock:
+        record = __statements[normalized]
+        record["timed"] += 1
+        record["changed_rows"] += db.total_changes - total_changes
+        record["latencies"][__latency_bucket(seconds)] += 1
+
+
+def __find_caller():
+    # Returns the innermost db_logic or user_logic function on the call stack.
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__")
+        if module in __CALLER_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "untracked"
+
+
+def __count_rows(result):
+    # Returns the number of rows in the result of a db function, counts and flags are no rows.
+    if isinstance(result, (list, dict)):
+        return len(result)
+    if isinstance(result, (tuple, bytes)):
+        return 1
+    return 0
+
+
+def __normalize(statement):
+    # Replaces the literals of a statement by "?" and collapses its whitespace.
+    statement = __LITERALS.sub("?", statement)
+    return " ".join(statement.split())
+
+
+def __latency_bucket(seconds):
+    # Returns the histogram bucket of a latency, the buckets grow by a factor of 2 ** 0.25 starting at 1 µs.
+    return max(0, math.ceil(math.log2(max(seconds, 1e-9) * 1e6) * 4))
+
+
+def __percentile(latencies, calls, share):
+    # Returns the upper bound of the histogram bucket that contains the given share of the calls in milliseconds.
+    rank = math.ceil(calls * share)
+    seen = 0
+    for bucket in sorted(latencies):
+        seen += latencies[bucket]
+        if seen >= rank:
+            return round(2 ** (bucket / 4) / 1000, 4)
+    return 0.0
+
+
+def __format_json(report):
+    # Formats the report as JSON.
+    return json.dumps(report, indent=4) + "\n"
+
+
+def __format_text(report):
+    # Formats the report as two text tables, one for the db functions and one for the SQL statements.
+    lines = [f"{'function':<50} {'calls':>8} {'rows':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  top caller"]
+    for name, record in report["functions"].items():
+        top_caller = next(iter(record["callers"]), "")
+        lines.append(f"{name:<50} {record['calls']:>8} {record['rows']:>10} {record['p50_ms']:>9} "
+                     f"{record['p95_ms']:>9} {record['p99_ms']:>9}  {top_caller}")
+    lines += ["", f"{'count':>8} {'changed':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  {'function':<40} statement"]
+    for statement, record in report["statements"].items():
+        top_function = next(iter(record["functions"]), "")
+        lines.append(f"{record['count']:>8} {record['changed_rows']:>10} {record['p50_ms']:>9} {record['p95_ms']:>9} "
+                     f"{record['p99_ms']:>9}  {top_function:<40} {statement}")
+    return "\n".join(lines) + "\n"
+
+
+def __write_report():
+    # Writes the report when the program exits, called by atexit.
+    if not __functions and not __statements:
+        return
+    if __output is None:
+        dump(sys.stderr, __report_format)
+        return
+    with open(__output, "w") as file:
+        dump(file, __report_format)
+
+
+def __register_exit_handler():
+    # Registers the report for the exit of the program, once.
+    global __exit_handler_registered
+    atexit.register(__write_report)
+    __exit_handler_registered = True
+
+
+__CALLER_MODULES = {"db_logic", "user_logic"}
+__FORMATTERS = {"json": __format_json, "text": __format_text}
+# String literals, including doubled quotes, and numbers that are not part of a name.
+__LITERALS = re.compile(r"'(?:[^']|'')*'|x'[0-9a-fA-F]*'|(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+__lock = threading.Lock()
+__local = threading.local()
+__functions = defaultdict(lambda: {"calls": 0, "rows": 0, "latencies": Counter(), "callers": Counter()})
+__statements = defaultdict(
+    lambda: {"count": 0, "timed": 0, "changed_rows": 0, "latencies": Counter(), "functions": Counter()}
+)
+__enabled = False
+__report_format = "json"
+__output = None
+__exit_handler_registered = False
+
+if os.environ.get(ENVIRONMENT_VARIABLE):
+    enable(os.environ[ENVIRONMENT_VARIABLE], os.environ.get(FILE_ENVIRONMENT_VARIABLE))
@@ -1,9 +1,12 @@
 """
-Contains functions to set up and teardown a test database.
+Contains functions to set up and teardown a test database and to generate synthetic datasets.
 
 Functions:
     setup_demo_db()
         Connects to a sqlite3 database and stores various habits, tasks, and users in it.
+    generate_dataset(db, users=1000, mean_habits_per_user=10.0, periods=(1, 1, 1, 7, 30), completion_probability=0.8,
+                     history_days=90, paused_share=0.1, seed=42, now=None) -> dict
+        Stores synthetic users with habits and their completed tasks in a database through the bulk import.
     teardown_db()
         Deletes the test database file.
 
@@ -14,8 +17,10 @@ Var:
 import uuid
 import hashlib
 import os
+import random
 from datetime import datetime, timedelta
-from db import get_db
+from db import get_db, store_user_items, store_habit_items, store_task_items, unit_of_work
+from db_logic import import_habits, import_tasks
 
 db_name = "demo.db"
 
@@ -24,138 +29,137 @@ def setup_demo_db():
     """
     Connects to a sqlite3 database and stores various habits, tasks, and users in it.
 
+    All items are stored with the bulk functions of the db module in a single transaction.
+
     Return:
         db: sqlite3 db
     """
     db = get_db(db_name)
-    for user in ["test user 1", "test user 2"]:
-        __store_user(db, user, user)
-
-    __store_admin(db)
-
-    __store_habit(
-        db=db,
-        habit_name="sleep eight hours",
-        user_name="test user 1",
-        created=datetime.now().replace(microsecond=0) - timedelta(days=28),
-        period=1,
-        deadline=datetime.now().replace(microsecond=0) + timedelta(days=1),
-        is_active=True,
-        longest=12
-    )
-    days_since_completed = reversed(list(range(8)))
-    for value in days_since_completed:
-        __store_task(db, value, "sleep eight hours")
-
-    __store_habit(
-        db=db,
-        habit_name="go running",
-        user_name="test user 1",
-        created=datetime.now().replace(microsecond=0) - timedelta(days=17),
-        period=3,
-        deadline=datetime.now().replace(microsecond=0) + timedelta(days=2),
-        is_active=True,
-        longest=5
-    )
-    days_since_completed = [8, 7, 4, 2]
-    for value in days_since_completed:
-        __store_task(db, value, "go running")
-
-    __store_habit(
-        db=db,
-        habit_name="see the dentist",
-        user_name="test user 1",
-        created=datetime.now().replace(microsecond=0) - timedelta(days=400),
-        period=180,
-        deadline=datetime.now().replace(microsecond=0) + timedelta(days=50),
-        is_active=True,
-        longest=2
-    )
-    days_since_completed = [280, 130]
-    for value in days_since_completed:
-        __store_task(db, value, "see the dentist")
-
-    __store_habit(
-        db=db,
-        habit_name="learn statistics",
-        user_name="test user 1",
-        created=datetime.now().replace(microsecond=0) - timedelta(days=50),
-        period=7,
-        deadline=datetime.now().replace(microsecond=0) + timedelta(days=4),
-        is_active=True,
-        longest=8
-    )
-    days_since_completed = [35, 30, 26, 21, 18, 12, 8, 3]
-    for value in days_since_completed:
-        __store_task(db, value, "learn statistics")
-
+    now = datetime.now().replace(microsecond=0)
+    user_items = [__user_item(user, user, "False") for user in ["test user 1", "test user 2"]]
+    user_items.append(__user_item("Admin", "Admin", "True"))
+    habit_items = []
+    task_items = []
+    for habit_name, created_days_ago, period, deadline_in_days, longest, current_streak, days_since_completed in [
+        ("sleep eight hours", 28, 1, 1, 12, 8, reversed(list(range(8)))),
+        ("go running", 17, 3, 2, 5, 4, [8, 7, 4, 2]),
+        ("see the dentist", 400, 180, 50, 2, 2, [280, 130]),
+        ("learn statistics", 50, 7, 4, 8, 8, [35, 30, 26, 21, 18, 12, 8, 3])
+    ]:
+        habit_id = str(uuid.uuid4())
+        habit_items.append((habit_id, habit_name, "test user 1", now - timedelta(days=created_days_ago), period,
+                            now + timedelta(days=deadline_in_days), True, longest, current_streak))
+        task_items += [(str(uuid.uuid4()), now - timedelta(days=days), habit_id) for days in days_since_completed]
+    with unit_of_work(db):
+        store_user_items(db, user_items)
+        store_habit_items(db, habit_items)
+        store_task_items(db, task_items)
     return db
 
 
+def generate_dataset(db, users: int = 1000, mean_habits_per_user: float = 10.0, periods: tuple = (1, 1, 1, 7, 30),
+                     completion_probability: float = 0.8, history_days: int = 90, paused_share: float = 0.1,
+                     seed: int = 42, now: datetime = None) -> dict:
+    """
+    Stores synthetic users with habits and their completed tasks in a database through the bulk import.
+
+    The number of habits per user is exponentially distributed, so most users have a few habits and some
+    have many. Every habit is completed in each of its past periods with the given probability, the
+    streaks and deadlines are computed from these completions. The users are named "user <number>"
+    with their name as password, their habits "habit <number>". The same seed generates the same dataset.
+
+    Params:
+        db: sqlite3 db
+            Database in which the dataset is stored
+        users: int
+            Number of users (default 1000)
+        mean_habits_per_user: float
+            Mean number of habits per user, every user has at least one habit (default 10.0)
+        periods: tuple
+            Periods in days the periods of the habits are drawn from, repeat a period to draw it more often
+            (default (1, 1, 1, 7, 30))
+        completion_probability: float
+            Probability that a habit is completed in one of its periods (default 0.8)
+        history_days: int
+            Number of days since the habits were created (default 90)
+        paused_share: float
+            Share of the habits that are paused (default 0.1)
+        seed: int
+            Seed of the random numbers (default 42)
+        now: datetime
+            End of the history (default None uses the current time)
+
+    Return:
+        dict
+            Number of "users", "habits", and "tasks" that were stored and the "seconds" it took
+    """
+    assert users >= 1, f"Users {users} has to be greater or equal than one"
+    assert 0 <= completion_probability <= 1, f"Completion probability {completion_probability} is no probability"
+    assert history_days >= max(periods), f"History of {history_days} days is shorter than the longest period"
+
+    random_numbers = random.Random(seed)
+    now = (now or datetime.now()).replace(microsecond=0)
+    result = {"users": 0, "habits": 0, "tasks": 0, "seconds": 0.0}
+    for first_user in range(0, users, __USERS_PER_CHUNK):
+        user_items = []
+        habit_items = []
+        task_items = []
+        for user_number in range(first_user, min(first_user + __USERS_PER_CHUNK, users)):
+            user_name = f"user {user_number}"
+            user_items.append(__user_item(user_name, user_name, "False"))
+            habit_count = max(1, round(random_numbers.expovariate(1 / mean_habits_per_user)))
+            for habit_number in range(habit_count):
+                habit_item, habit_task_items = __generate_habit(
+                    random_numbers, user_name, f"habit {habit_number}", random_numbers.choice(periods),
+                    completion_probability, history_days, random_numbers.random() < paused_share, now
+                )
+                habit_items.append(habit_item)
+                task_items += habit_task_items
+        with unit_of_work(db):
+            result["users"] += store_user_items(db, user_items)
+        for key, rows in [("habits", habit_items), ("tasks", task_items)]:
+            imported = (import_habits if key == "habits" else import_tasks)(db, rows, chunk_size=50000)
+            result[key] += imported["inserted"]
+            result["seconds"] += imported["seconds"]
+    return result
+
+
 def teardown_db():
     """Deletes the test database file."""
     os.remove(db_name)
 
 
-def __store_user(db, user_name, password):
-    # Stores a user item in the given database.
-    cur = db.cursor()
-    cur.execute(
-        "INSERT INTO users VALUES (:user_id, :user_name, :password, :is_admin)",
-        {
-            "user_id": str(uuid.uuid4()),
-            "user_name": user_name,
-            "password": hashlib.sha3_256(password.encode()).hexdigest(),
-            "is_admin": "False"
-        }
-    )
-    db.commit()
-
-
-def __store_admin(db):
-    # Stores an admin item in the given database.
-    cur = db.cursor()
-    cur.execute(
-        "INSERT INTO users VALUES (:user_id, :user_name, :password, :is_admin)",
-        {
-            "user_id": str(uuid.uuid4()),
-            "user_name": "Admin",
-            "password": hashlib.sha3_256("Admin".encode()).hexdigest(),
-            "is_admin": "True"
-        }
-    )
-    db.commit()
-
-
-def __store_habit(db, habit_name, user_name, created, period, deadline, is_active, longest):
-    # Stores a habit item in the given database.
-    cur = db.cursor()
-    cur.execute(
-        "INSERT INTO habits VALUES (:habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)",
-        {
-            "habit_id": str(uuid.uuid4()),
-            "name": habit_name,
-            "user_name": user_name,
-            "created": created,
-            "period": period,
-            "deadline": deadline,
-            "is_active": is_active,
-            "longest": longest
-        }
-    )
-    db.commit()
-
-
-def __store_task(db, days_since_completed, habit_name):
-    # Stores a task item in the given database.
-    created = datetime.now().replace(microsecond=0) - timedelta(days=days_since_completed)
-    cur = db.cursor()
-    cur.execute(
-        "INSERT INTO tasks VALUES (:task_id, :created, :habit_name)",
-        {
-            "task_id": str(uuid.uuid4()),
-            "created": created,
-            "habit_name": habit_name
-        }
-    )
-    db.commit()
+def __user_item(user_name, password, is_admin):
+    # Returns a user item with a new ID and the hash of the password.
+    return str(uuid.uuid4()), user_name, hashlib.sha3_256(password.encode()).hexdigest(), is_admin
+
+
+def __generate_habit(random_numbers, user_name, habit_name, period, completion_probability, history_days, is_paused,
+                     now):
+    # Returns a habit item and its task items, the habit is completed in each past period with the given probability.
+    habit_id = f"{random_numbers.getrandbits(128):032x}"
+    period_count = history_days // period
+    created = now - timedelta(days=period_count * period)
+    task_items = []
+    current_streak = 0
+    longest = 0
+    for period_number in range(period_count):
+        if random_numbers.random() < completion_probability:
+            completed = created + timedelta(days=period_number * period, seconds=random_numbers.randrange(
+                period * 86400))
+            task_items.append((f"{random_numbers.getrandbits(128):032x}", completed, habit_id))
+            current_streak += 1
+            longest = max(longest, current_streak)
+        else:
+            current_streak = 0
+    if is_paused:
+        deadline = datetime.max - timedelta(microseconds=999999)
+    elif current_streak > 0:
+        deadline = task_items[-1][1] + timedelta(days=period)
+    else:
+        deadline = now + timedelta(days=period)
+    habit_item = (habit_id, habit_name, user_name, created, period, deadline, not is_paused, longest, current_streak)
+    return habit_item, task_items
+
+
+__USERS_PER_CHUNK = 1000
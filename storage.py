@@ -0,0 +1,599 @@
+"""
+Contains the storage protocol used by db_logic and user_logic and its two implementations.
+
+SqliteStorage runs the operations on a sqlite3 connection with the functions of the db module.
+MemoryStorage keeps all items in dictionaries of the running process, which makes it suitable for tests,
+benchmarks, and as a cache in front of a database. The logic functions accept a sqlite3 connection or a
+storage and convert connections with as_storage.
+
+Functions:
+    as_storage(db) -> Storage
+        Returns the storage for a sqlite3 connection, a storage is returned unchanged.
+
+Classes:
+    Storage
+    SqliteStorage
+    MemoryStorage
+"""
+import sqlite3
+import string
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+from typing import Protocol
+import db as sqlite_db
+from custom_exceptions import UserNameAlreadyExistsError, UserNameIsUnknownError, HabitNameIsUnknownError, \
+    HabitNameAlreadyExistsError, HabitIdIsUnknownError
+
+
+def as_storage(db):
+    """
+    Returns the storage for a sqlite3 connection, a storage is returned unchanged.
+
+    Param:
+        db: sqlite3 connection or Storage
+
+    Return:
+        Storage
+    """
+    return SqliteStorage(db) if isinstance(db, sqlite3.Connection) else db
+
+
+class Storage(Protocol):
+    """
+    Protocol of the operations db_logic and user_logic need from a storage.
+
+    The operations take the arguments of the db function with the same name except the database,
+    return the items in the same form, and raise the same exceptions.
+    """
+
+    def unit_of_work(self):
+        """Context manager that applies all enclosed operations together or not at all."""
+
+    def store_user_item(self, user_name, password, is_admin):
+        """Stores a new user item, see db.store_user_item."""
+
+    def delete_user_item(self, user_name):
+        """Deletes a user item, see db.delete_user_item."""
+
+    def get_user_item_by_name(self, user_name):
+        """Returns a user item in a list or None, see db.get_user_item_by_name."""
+
+    def get_all_user_items(self):
+        """Returns all user items, see db.get_all_user_items."""
+
+    def get_user_items_page(self, after, limit, name_prefix=None):
+        """Returns the next user items with their number of habit items, see db.get_user_items_page."""
+
+    def store_habit_item(self, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0,
+                         current_streak=0):
+        """Stores a new habit item, see db.store_habit_item."""
+
+    def store_habit_items(self, habit_items):
+        """Stores several habit items and returns their number, see db.store_habit_items."""
+
+    def delete_habit_item(self, name, user_name):
+        """Deletes a habit item with its tasks and returns its ID, see db.delete_habit_item."""
+
+    def update_streaks_habit_item(self, name, user_name, deadline):
+        """Increases the current streak of a habit item, see db.update_streaks_habit_item."""
+
+    def reset_streak_habit_item(self, name, user_name, deadline):
+        """Sets the current streak of a habit item to zero, see db.reset_streak_habit_item."""
+
+    def update_active_status_habit_item(self, name, user_name, deadline, is_active):
+        """Sets the active status of a habit item, see db.update_active_status_habit_item."""
+
+    def expire_overdue_habit_items(self, now):
+        """Resets the streaks of overdue habit items and returns their number, see db.expire_overdue_habit_items."""
+
+    def get_all_habit_items_by_active_status(self, user_name, is_active):
+        """Returns the habit items of a user with an active status, see db.get_all_habit_items_by_active_status."""
+
+    def get_habit_item_by_name(self, name, user_name):
+        """Returns a habit item in a list or None, see db.get_habit_item_by_name."""
+
+    def get_habit_items_by_names(self, names, user_name):
+        """Returns the habit items of a user with the given names, see db.get_habit_items_by_names."""
+
+    def search_habit_items(self, user_name, query, limit, fuzzy=False, is_active=None):
+        """Returns the habit items of a user whose name matches the query, see db.search_habit_items."""
+
+    def store_task_item(self, created, habit_id):
+        """Stores a new task item, see db.store_task_item."""
+
+    def store_task_items(self, task_items):
+        """Stores several task items and returns their number, see db.store_task_items."""
+
+    def get_tasks_by_habit_name(self, habit_name, user_name):
+        """Returns the task items of a habit item ordered by creation, see db.get_tasks_by_habit_name."""
+
+    def get_task_items_page(self, habit_name, user_name, after, limit, created_from=None, created_before=None):
+        """Returns the next task items of a habit item ordered by creation, see db.get_task_items_page."""
+
+    def get_habit_periods_with_task_items_before(self, periods, now):
+        """Returns ID and period of habit items with old task items, see db.get_habit_periods_with_task_items_before."""
+
+    def delete_task_items_before(self, habit_id, before):
+        """Deletes old task items and returns their creation, see db.delete_task_items_before."""
+
+    def get_task_archive_item(self, habit_id):
+        """Returns the archived history of a habit item or None, see db.get_task_archive_item."""
+
+    def get_task_archive_item_by_habit_name(self, habit_name, user_name):
+        """Returns the archived history of a habit item or None, see db.get_task_archive_item_by_habit_name."""
+
+    def store_task_archive_item(self, habit_id, task_count, history):
+        """Stores the archived history of a habit item, see db.store_task_archive_item."""
+
+    def get_completion_bitmap_item(self, habit_id):
+        """Returns the completion bitmap of a habit item or None, see db.get_completion_bitmap_item."""
+
+    def get_completion_bitmap_items_by_user(self, user_name):
+        """Returns the completion bitmaps of a user by habit ID, see db.get_completion_bitmap_items_by_user."""
+
+    def store_completion_bitmap_item(self, habit_id, bitmap):
+        """Stores the completion bitmap of a habit item, see db.store_completion_bitmap_item."""
+
+    def get_daily_completion_items(self, habit_name, user_name, first_day, last_day):
+        """Returns the number of task items per day of a habit item, see db.get_daily_completion_items."""
+
+    def get_weekly_completion_items(self, habit_name, user_name, first_week, last_week):
+        """Returns the number of task items per week of a habit item, see db.get_weekly_completion_items."""
+
+    def get_habit_count_item(self, user_name):
+        """Returns the number of active and paused habit items of a user or None, see db.get_habit_count_item."""
+
+
+class SqliteStorage:
+    """
+    Class to run the storage operations on a sqlite3 connection with the functions of the db module.
+
+    Attributes:
+        db: sqlite3 db
+            Connection on which the operations run
+    """
+
+    def __init__(self, db):
+        """
+        Constructor for a SqliteStorage instance.
+
+        Param:
+            db: sqlite3 db
+                Connection as returned by db.get_db
+        """
+        self.db = db
+
+    def unit_of_work(self):
+        return sqlite_db.unit_of_work(self.db)
+
+    def store_user_item(self, user_name, password, is_admin):
+        sqlite_db.store_user_item(self.db, user_name, password, is_admin)
+
+    def delete_user_item(self, user_name):
+        sqlite_db.delete_user_item(self.db, user_name)
+
+    def get_user_item_by_name(self, user_name):
+        return sqlite_db.get_user_item_by_name(self.db, user_name)
+
+    def get_all_user_items(self):
+        return sqlite_db.get_all_user_items(self.db)
+
+    def get_user_items_page(self, after, limit, name_prefix=None):
+        return sqlite_db.get_user_items_page(self.db, after, limit, name_prefix)
+
+    def store_habit_item(self, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0,
+                         current_streak=0):
+        sqlite_db.store_habit_item(self.db, habit_id, name, user_name, created, period, deadline, is_active, longest,
+                                   current_streak)
+
+    def store_habit_items(self, habit_items):
+        return sqlite_db.store_habit_items(self.db, habit_items)
+
+    def delete_habit_item(self, name, user_name):
+        return sqlite_db.delete_habit_item(self.db, name, user_name)
+
+    def update_streaks_habit_item(self, name, user_name, deadline):
+        sqlite_db.update_streaks_habit_item(self.db, name, user_name, deadline)
+
+    def reset_streak_habit_item(self, name, user_name, deadline):
+        sqlite_db.reset_streak_habit_item(self.db, name, user_name, deadline)
+
+    def update_active_status_habit_item(self, name, user_name, deadline, is_active):
+        sqlite_db.update_active_status_habit_item(self.db, name, user_name, deadline, is_active)
+
+    def expire_overdue_habit_items(self, now):
+        return sqlite_db.expire_overdue_habit_items(self.db, now)
+
+    def get_all_habit_items_by_active_status(self, user_name, is_active):
+        return sqlite_db.get_all_habit_items_by_active_status(self.db, user_name, is_active)
+
+    def get_habit_item_by_name(self, name, user_name):
+        return sqlite_db.get_habit_item_by_name(self.db, name, user_name)
+
+    def get_habit_items_by_names(self, names, user_name):
+        return sqlite_db.get_habit_items_by_names(self.db, names, user_name)
+
+    def search_habit_items(self, user_name, query, limit, fuzzy=False, is_active=None):
+        return sqlite_db.search_habit_items(self.db, user_name, query, limit, fuzzy, is_active)
+
+    def store_task_item(self, created, habit_id):
+        sqlite_db.store_task_item(self.db, created, habit_id)
+
+    def store_task_items(self, task_items):
+        return sqlite_db.store_task_items(self.db, task_items)
+
+    def get_tasks_by_habit_name(self, habit_name, user_name):
+        return sqlite_db.get_tasks_by_habit_name(self.db, habit_name, user_name)
+
+    def get_task_items_page(self, habit_name, user_name, after, limit, created_from=None, created_before=None):
+        return sqlite_db.get_task_items_page(self.db, habit_name, user_name, after, limit, created_from,
+                                             created_before)
+
+    def get_habit_periods_with_task_items_before(self, periods, now):
+        return sqlite_db.get_habit_periods_with_task_items_before(self.db, periods, now)
+
+    def delete_task_items_before(self, habit_id, before):
+        return sqlite_db.delete_task_items_before(self.db, habit_id, before)
+
+    def get_task_archive_item(self, habit_id):
+        return sqlite_db.get_task_archive_item(self.db, habit_id)
+
+    def get_task_archive_item_by_habit_name(self, habit_name, user_name):
+        return sqlite_db.get_task_archive_item_by_habit_name(self.db, habit_name, user_name)
+
+    def store_task_archive_item(self, habit_id, task_count, history):
+        sqlite_db.store_task_archive_item(self.db, habit_id, task_count, history)
+
+    def get_completion_bitmap_item(self, habit_id):
+        return sqlite_db.get_completion_bitmap_item(self.db, habit_id)
+
+    def get_completion_bitmap_items_by_user(self, user_name):
+        return sqlite_db.get_completion_bitmap_items_by_user(self.db, user_name)
+
+    def store_completion_bitmap_item(self, habit_id, bitmap):
+        sqlite_db.store_completion_bitmap_item(self.db, habit_id, bitmap)
+
+    def get_daily_completion_items(self, habit_name, user_name, first_day, last_day):
+        return sqlite_db.get_daily_completion_items(self.db, habit_name, user_name, first_day, last_day)
+
+    def get_weekly_completion_items(self, habit_name, user_name, first_week, last_week):
+        return sqlite_db.get_weekly_completion_items(self.db, habit_name, user_name, first_week, last_week)
+
+    def get_habit_count_item(self, user_name):
+        return sqlite_db.get_habit_count_item(self.db, user_name)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{self.db}')"
+
+
+class MemoryStorage:
+    """
+    Class to keep all items in dictionaries of the running process.
+
+    Habit items are indexed by habit_id and by user_name and name, task items by habit_id and by
+    creation and task_id. Like the rollup tables of the db module, the number of task items per day and
+    per week and the number of active and paused habit items per user are kept up to date on every
+    change. The items have the same columns as the rows of the db module. All operations
+    are serialized by a lock, a unit of work holds the lock until it is left and undoes its changes
+    if an exception is raised. Nothing is persisted.
+    """
+
+    __MISSING = object()
+    __ASCII_LOWER_CASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+    def __init__(self):
+        """Constructor for an empty MemoryStorage instance."""
+        self.__lock = threading.RLock()
+        self.__undo_log = None
+        self.__users = {}
+        self.__habits = {}
+        self.__habit_ids = {}
+        self.__tasks = {}
+        self.__task_archives = {}
+        self.__completion_bitmaps = {}
+        self.__daily_completions = {}
+        self.__weekly_completions = {}
+        self.__habit_counts = {}
+
+    @contextmanager
+    def unit_of_work(self):
+        with self.__lock:
+            if self.__undo_log is not None:
+                yield self
+                return
+            self.__undo_log = []
+            try:
+                yield self
+            except BaseException:
+                for undo in reversed(self.__undo_log):
+                    undo()
+                raise
+            finally:
+                self.__undo_log = None
+
+    def store_user_item(self, user_name, password, is_admin):
+        with self.__lock:
+            if user_name in self.__users:
+                raise UserNameAlreadyExistsError
+            self.__set(self.__users, user_name, (str(uuid.uuid4()), user_name, password, is_admin))
+
+    def delete_user_item(self, user_name):
+        with self.__lock:
+            if user_name not in self.__users:
+                raise UserNameIsUnknownError
+            self.__pop(self.__users, user_name)
+
+    def get_user_item_by_name(self, user_name):
+        with self.__lock:
+            return [self.__users[user_name]] if user_name in self.__users else None
+
+    def get_all_user_items(self):
+        with self.__lock:
+            return list(self.__users.values())
+
+    def get_user_items_page(self, after, limit, name_prefix=None):
+        with self.__lock:
+            user_names = sorted(
+                user_name for user_name in self.__users
+                if (after is None or user_name > after) and user_name.startswith(name_prefix or "")
+            )
+            return [
+                self.__users[user_name] + self.__habit_counts.get(user_name, (0, 0))
+                for user_name in user_names[:limit]
+            ]
+
+    def store_habit_item(self, habit_id, name, user_name, created, period, deadline, is_active=True, longest=0,
+                         current_streak=0):
+        with self.__lock:
+            if not self.__insert_habit((habit_id, name, user_name, created, period, deadline, is_active, longest,
+                                        current_streak)):
+                raise HabitNameAlreadyExistsError
+
+    def store_habit_items(self, habit_items):
+        with self.__lock:
+            return sum(self.__insert_habit(tuple(habit_item)) for habit_item in habit_items)
+
+    def delete_habit_item(self, name, user_name):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(name)
+            if habit_id is None:
+                raise HabitNameIsUnknownError
+            self.__pop(self.__habit_ids[user_name], name)
+            self.__count_habit(self.__habits[habit_id], -1)
+            self.__pop(self.__habits, habit_id)
+            for items in [self.__tasks, self.__task_archives, self.__completion_bitmaps, self.__daily_completions,
+                          self.__weekly_completions]:
+                if habit_id in items:
+                    self.__pop(items, habit_id)
+            return habit_id
+
+    def update_streaks_habit_item(self, name, user_name, deadline):
+        with self.__lock:
+            self.__update_habit(name, user_name, lambda habit_item: habit_item[:5] + (
+                deadline, habit_item[6], max(habit_item[7], habit_item[8] + 1), habit_item[8] + 1))
+
+    def reset_streak_habit_item(self, name, user_name, deadline):
+        with self.__lock:
+            self.__update_habit(name, user_name, lambda habit_item: habit_item[:5] + (deadline,) + habit_item[6:8] +
+                                (0,))
+
+    def update_active_status_habit_item(self, name, user_name, deadline, is_active):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(name)
+            if habit_id is not None:
+                self.__count_habit(self.__habits[habit_id], -1)
+            self.__update_habit(name, user_name, lambda habit_item: habit_item[:5] + (deadline, is_active) +
+                                habit_item[7:])
+            if habit_id is not None:
+                self.__count_habit(self.__habits[habit_id], 1)
+
+    def expire_overdue_habit_items(self, now):
+        with self.__lock:
+            overdue_items = [
+                habit_item for habit_item in self.__habits.values() if habit_item[5] < now and habit_item[6] == 1
+            ]
+            for habit_item in overdue_items:
+                period = timedelta(days=habit_item[4])
+                deadline = habit_item[5] + period * ((now - habit_item[5]) // period + 1)
+                self.__set(self.__habits, habit_item[0], habit_item[:5] + (deadline,) + habit_item[6:8] + (0,))
+            return len(overdue_items)
+
+    def get_all_habit_items_by_active_status(self, user_name, is_active):
+        with self.__lock:
+            habit_ids = self.__habit_ids.get(user_name, {})
+            habit_items = [self.__habits[habit_ids[name]] for name in sorted(habit_ids)]
+            return [habit_item for habit_item in habit_items if habit_item[6] == is_active]
+
+    def get_habit_item_by_name(self, name, user_name):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(name)
+            return [self.__habits[habit_id]] if habit_id is not None else None
+
+    def get_habit_items_by_names(self, names, user_name):
+        with self.__lock:
+            habit_ids = self.__habit_ids.get(user_name, {})
+            return [self.__habits[habit_ids[name]] for name in dict.fromkeys(names) if name in habit_ids]
+
+    def search_habit_items(self, user_name, query, limit, fuzzy=False, is_active=None):
+        with self.__lock:
+            names = {
+                name: habit_id for name, habit_id in self.__habit_ids.get(user_name, {}).items()
+                if is_active is None or self.__habits[habit_id][6] == is_active
+            }
+            if len(query) < 3:
+                # Like the NOCASE collation of the database, only the case of ASCII letters is ignored.
+                folded = {name: name.translate(self.__ASCII_LOWER_CASE) for name in names}
+                prefix = query.translate(self.__ASCII_LOWER_CASE)
+                found = sorted((name for name in names if folded[name].startswith(prefix)), key=folded.get)
+            elif not fuzzy:
+                found = [name for name in names if query.casefold() in name.casefold()]
+            else:
+                trigrams = {query.casefold()[start:start + 3] for start in range(len(query) - 2)}
+                shared = {name: sum(trigram in name.casefold() for trigram in trigrams) for name in names}
+                found = sorted((name for name in names if shared[name] > 0),
+                               key=lambda name: (-shared[name], len(name), name))
+            return [self.__habits[names[name]] for name in found[:limit]]
+
+    def store_task_item(self, created, habit_id):
+        with self.__lock:
+            self.__insert_task((str(uuid.uuid4()), created, habit_id))
+
+    def store_task_items(self, task_items):
+        with self.__lock:
+            task_items = [tuple(task_item) for task_item in task_items]
+            # Like the database, no task item is stored if one of them belongs to an unknown habit item.
+            if any(task_item[2] not in self.__habits for task_item in task_items):
+                raise HabitIdIsUnknownError
+            return sum(self.__insert_task(task_item) for task_item in task_items)
+
+    def get_tasks_by_habit_name(self, habit_name, user_name):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(habit_name)
+            tasks = self.__tasks.get(habit_id, {})
+            return [tasks[key] for key in sorted(tasks)]
+
+    def get_task_items_page(self, habit_name, user_name, after, limit, created_from=None, created_before=None):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(habit_name)
+            tasks = self.__tasks.get(habit_id, {})
+            keys = [
+                key for key in sorted(tasks)
+                if (after is None or key > tuple(after)) and (created_from is None or key[0] >= created_from)
+                and (created_before is None or key[0] < created_before)
+            ]
+            return [tasks[key] for key in keys[:limit]]
+
+    def get_habit_periods_with_task_items_before(self, periods, now):
+        with self.__lock:
+            return [
+                (habit_id, self.__habits[habit_id][4]) for habit_id, tasks in self.__tasks.items()
+                if any(created < now - timedelta(days=self.__habits[habit_id][4] * periods) for created, _ in tasks)
+            ]
+
+    def delete_task_items_before(self, habit_id, before):
+        with self.__lock:
+            tasks = self.__tasks.get(habit_id, {})
+            keys = sorted(key for key in tasks if key[0] < before)
+            for key in keys:
+                self.__pop(tasks, key)
+            return [created for created, _ in keys]
+
+    def get_task_archive_item(self, habit_id):
+        with self.__lock:
+            return self.__task_archives.get(habit_id)
+
+    def get_task_archive_item_by_habit_name(self, habit_name, user_name):
+        with self.__lock:
+            return self.__task_archives.get(self.__habit_ids.get(user_name, {}).get(habit_name))
+
+    def store_task_archive_item(self, habit_id, task_count, history):
+        with self.__lock:
+            self.__set(self.__task_archives, habit_id, (habit_id, task_count, history))
+
+    def get_completion_bitmap_item(self, habit_id):
+        with self.__lock:
+            return self.__completion_bitmaps.get(habit_id)
+
+    def get_completion_bitmap_items_by_user(self, user_name):
+        with self.__lock:
+            habit_ids = self.__habit_ids.get(user_name, {}).values()
+            return {
+                habit_id: self.__completion_bitmaps[habit_id] for habit_id in habit_ids
+                if habit_id in self.__completion_bitmaps
+            }
+
+    def store_completion_bitmap_item(self, habit_id, bitmap):
+        with self.__lock:
+            self.__set(self.__completion_bitmaps, habit_id, bitmap)
+
+    def get_daily_completion_items(self, habit_name, user_name, first_day, last_day):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(habit_name)
+            days = self.__daily_completions.get(habit_id, {})
+            return [(day, days[day]) for day in sorted(days) if first_day <= day <= last_day]
+
+    def get_weekly_completion_items(self, habit_name, user_name, first_week, last_week):
+        with self.__lock:
+            habit_id = self.__habit_ids.get(user_name, {}).get(habit_name)
+            weeks = self.__weekly_completions.get(habit_id, {})
+            return [(week, weeks[week]) for week in sorted(weeks) if first_week <= week <= last_week]
+
+    def get_habit_count_item(self, user_name):
+        with self.__lock:
+            return (user_name,) + self.__habit_counts[user_name] if user_name in self.__habit_counts else None
+
+    def __insert_habit(self, habit_item):
+        # Stores a habit item unless its ID or its name for the same user is taken and returns if it was stored.
+        habit_id, name, user_name = habit_item[:3]
+        if habit_id in self.__habits or name in self.__habit_ids.get(user_name, {}):
+            return False
+        if user_name not in self.__habit_ids:
+            self.__set(self.__habit_ids, user_name, {})
+        self.__set(self.__habit_ids[user_name], name, habit_id)
+        self.__set(self.__habits, habit_id, habit_item)
+        self.__count_habit(habit_item, 1)
+        return True
+
+    def __update_habit(self, name, user_name, update):
+        # Replaces a habit item with the result of the update function, unknown habit items are ignored.
+        habit_id = self.__habit_ids.get(user_name, {}).get(name)
+        if habit_id is not None:
+            self.__set(self.__habits, habit_id, update(self.__habits[habit_id]))
+
+    def __insert_task(self, task_item):
+        # Stores a task item unless it is already stored and returns if it was stored.
+        # Like the trigger on the "tasks" table, storing a task item discards the completion bitmap of its habit.
+        task_id, created, habit_id = task_item
+        if habit_id not in self.__habits:
+            raise HabitIdIsUnknownError
+        if habit_id not in self.__tasks:
+            self.__set(self.__tasks, habit_id, {})
+        if (created, task_id) in self.__tasks[habit_id]:
+            return False
+        self.__set(self.__tasks[habit_id], (created, task_id), task_item)
+        if habit_id in self.__completion_bitmaps:
+            self.__pop(self.__completion_bitmaps, habit_id)
+        day = sqlite_db.datetime_to_epoch(created) // 86400
+        self.__count_completion(self.__daily_completions, habit_id, day)
+        self.__count_completion(self.__weekly_completions, habit_id, (day + 3) // 7)
+        return True
+
+    def __count_completion(self, completions, habit_id, key):
+        # Increases the number of task items of a habit item on a day or in a week, like the trigger on "tasks".
+        if habit_id not in completions:
+            self.__set(completions, habit_id, {})
+        self.__set(completions[habit_id], key, completions[habit_id].get(key, 0) + 1)
+
+    def __count_habit(self, habit_item, change):
+        # Adds or removes a habit item to or from the number of active or paused habit items of its user.
+        active, paused = self.__habit_counts.get(habit_item[2], (0, 0))
+        if habit_item[6] == 1:
+            active += change
+        else:
+            paused += change
+        self.__set(self.__habit_counts, habit_item[2], (active, paused))
+
+    def __set(self, items, key, value):
+        # Sets a key and remembers its previous value while a unit of work is open.
+        if self.__undo_log is not None:
+            self.__undo_log.append(partial(self.__restore, items, key, items.get(key, self.__MISSING)))
+        items[key] = value
+
+    def __pop(self, items, key):
+        # Removes a key and remembers its previous value while a unit of work is open.
+        if self.__undo_log is not None:
+            self.__undo_log.append(partial(self.__restore, items, key, items[key]))
+        del items[key]
+
+    def __restore(self, items, key, value):
+        # Restores the value a key had before it was changed.
+        if value is self.__MISSING:
+            items.pop(key, None)
+        else:
+            items[key] = value
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{len(self.__users)}', '{len(self.__habits)}')"
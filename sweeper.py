@@ -0,0 +1,123 @@
+"""
+Expires the streaks of all habits that missed their deadline, once or periodically.
+
+Without the sweeper a missed deadline is only noticed when the next task of a habit is completed,
+until then the current streak of the habit is shown as if it was still running. The module can be
+run from the command line, once or every given number of seconds, on an existing database:
+
+    python sweeper.py --db main.db
+    python sweeper.py --db main.db --interval 60
+
+Functions:
+    main(args=None)
+        Expires the overdue habits as requested by the command line arguments.
+
+Class:
+    DeadlineSweeper
+"""
+import argparse
+import os
+import threading
+import time
+from db_logic import connect_to_db, expire_overdue_habits
+
+
+class DeadlineSweeper:
+    """
+    Class to expire the overdue habits periodically with a background thread.
+
+    Attributes:
+        name: str
+            Name of the database file
+        interval: float
+            Seconds between two sweeps
+        expired: int
+            Number of habits expired since the sweeper was started
+
+    Methods:
+        start()
+            Starts the background thread, the first sweep runs right away
+        stop()
+            Stops the background thread after the running sweep
+    """
+
+    def __init__(self, name: str = "main.db", interval: float = 60.0, profile: str = None):
+        """
+        Constructor for a DeadlineSweeper instance.
+
+        Params:
+            name: str
+                Name of the database file (default "main.db")
+            interval: float
+                Seconds between two sweeps (default 60.0)
+            profile: str
+                Name of the tuning profile of the sweeper connection (default None)
+        """
+        assert interval > 0, f"Interval {interval} has to be greater than zero"
+
+        self.name = name
+        self.interval = interval
+        self.expired = 0
+        self.__profile = profile
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__sweep, name="deadline-sweeper", daemon=True)
+
+    def start(self):
+        """Starts the background thread, the first sweep runs right away."""
+        self.__thread.start()
+
+    def stop(self):
+        """Stops the background thread after the running sweep."""
+        self.__stopped.set()
+        self.__thread.join()
+
+    def __sweep(self):
+        # Runs in the background thread and sweeps until the sweeper is stopped.
+        db = connect_to_db(self.name, self.__profile)
+        try:
+            while True:
+                self.expired += expire_overdue_habits(db)
+                if self.__stopped.wait(self.interval):
+                    break
+        finally:
+            db.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} ('{self.name}', '{self.interval}', '{self.expired}')"
+
+
+def main(args=None):
+    """
+    Expires the overdue habits as requested by the command line arguments.
+
+    Param:
+        args: list
+            Command line arguments (default None reads them from sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Reset the streaks of all habits that missed their deadline.")
+    parser.add_argument("--db", default="main.db", help="name of the database (default main.db)")
+    parser.add_argument("--interval", type=float, help="sweep every given number of seconds until interrupted")
+    parser.add_argument("--profile", help="tuning profile of the connection (default none)")
+    arguments = parser.parse_args(args)
+    if not os.path.isfile(arguments.db):
+        parser.error(f"the database {arguments.db} does not exist")
+
+    if arguments.interval is None:
+        db = connect_to_db(arguments.db, arguments.profile)
+        try:
+            print(f"Expired habits: {expire_overdue_habits(db)}")
+        finally:
+            db.close()
+        return
+    sweeper = DeadlineSweeper(arguments.db, arguments.interval, arguments.profile)
+    sweeper.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sweeper.stop()
+        print(f"Expired habits: {sweeper.expired}")
+
+
+if __name__ == "__main__":
+    main()
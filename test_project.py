@@ -3,22 +3,96 @@ Contains all unit tests for the entire project with pytest as testing library.
 
 Class:
     TestHabits
+
+Function:
+    count_statements(db)
+        Collects the SQL statements executed on a connection within a with block.
 """
 import sqlite3
+import sys
 import os
+import io
+import json
+import hashlib
+import asyncio
+import inspect
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import pytest
 
 from habit import Habit
 from user import User
-from user_logic import get_user_by_name, add_user, remove_user, get_all_users, validate_password
+from task import Task
+from user_logic import get_user_by_name, add_user, remove_user, get_all_users, validate_password, get_users_page
 from db_logic import connect_to_db, add_habit, remove_habit, update_streaks, get_habit_by_name, get_all_habits, \
-    update_active_status, get_all_tasks
+    update_active_status, get_all_tasks, get_habits_by_names, import_habits, import_tasks, archive_tasks, \
+    get_completion_bitmap, create_connection_pool, expire_overdue_habits, get_daily_completions, \
+    get_weekly_completions, get_habit_counts, search_habits, iterate_completed_tasks, build_missing_completion_bitmaps
 from analysis import analyse_habits
-from custom_exceptions import HabitNameAlreadyExistsError, MissingAuthorizationError, HabitNameIsUnknownError
+from db import unit_of_work, get_connection_settings, get_completion_bitmap_item
+from export import export_habits, export_tasks, main as export_main
+from archive import compress_history, decompress_history
+from completion_bitmap import CompletionBitmap
+from async_db import AsyncDatabase
+from storage import MemoryStorage
+from completion_queue import CompletionQueue
+from sweeper import DeadlineSweeper, main as sweeper_main
+import instrumentation
+import db as db_module
+import db_logic
+import user_logic
+from setup import generate_dataset
+from custom_exceptions import HabitNameAlreadyExistsError, MissingAuthorizationError, HabitNameIsUnknownError, \
+    UserNameAlreadyExistsError, UserNameIsUnknownError, HabitIdIsUnknownError
 from datetime import datetime, timedelta
 
 
+@contextmanager
+def count_statements(db):
+    """
+    Collects the SQL statements executed on a connection within a with block.
+
+    SQLite reports every statement run by a trigger again with the text of the statement that fired the trigger,
+    and the statements of the full-text index as comments. Each call of a cursor or connection method starts a
+    new statement, so a repeated text is only dropped as a trigger echo while it stays within the call that fired
+    it. A query that is executed twice in a row is collected twice.
+
+    Param:
+        db: sqlite3 db
+            Connection whose statements are collected
+
+    Yield:
+        list
+            The executed statements with their parameters filled in, the list is filled while the block runs
+    """
+    statements = []
+    calls = [0]
+    collected_call = [None]
+    previous_profile = sys.getprofile()
+
+    def count_calls(frame, event, arg):
+        if event == "c_call" and isinstance(getattr(arg, "__self__", None), (sqlite3.Cursor, sqlite3.Connection)):
+            calls[0] += 1
+
+    def collect(statement):
+        if statement.startswith("--"):
+            return
+        if collected_call[0] == calls[0] and statements and statement == statements[-1]:
+            return
+        collected_call[0] = calls[0]
+        statements.append(statement)
+
+    sys.setprofile(count_calls)
+    db.set_trace_callback(collect)
+    try:
+        yield statements
+    finally:
+        db.set_trace_callback(None)
+        sys.setprofile(previous_profile)
+
+
 class TestHabits:
     """
     Pytest testing class for all unit tests.
@@ -34,6 +108,46 @@ class TestHabits:
             Tests functionalities of the db_logic module.
         test_analysis()
             Tests functionalities of the analysis module.
+        test_unit_of_work()
+            Tests that composite operations are committed in a single transaction.
+        test_connection_profiles()
+            Tests that the tuning profiles are applied to new connections.
+        test_query_counts()
+            Tests the number of SQL statements issued by the db_logic and user_logic functions.
+        test_bulk_import()
+            Tests that habits and tasks are imported in bulk without duplicates.
+        test_export()
+            Tests functionalities of the export module.
+        test_archive()
+            Tests that old tasks are archived and still read together with the live tasks.
+        test_completion_bitmap()
+            Tests the streaks computed from completion bitmaps.
+        test_async_database()
+            Tests functionalities of the AsyncDatabase class with concurrent coroutines.
+        test_connection_pool()
+            Tests functionalities of the ConnectionPool class with concurrent threads.
+        test_memory_storage()
+            Tests the db_logic and user_logic functions on the in-memory storage.
+        test_completion_queue()
+            Tests that queued completions are written in batches by the CompletionQueue class.
+        test_sweeper()
+            Tests that overdue habits are expired in bulk.
+        test_rollups()
+            Tests that the completion and habit count rollups are kept up to date.
+        test_search_habits()
+            Tests that habits are searched by prefix, by part of their name, and by similar names.
+        test_users_page()
+            Tests that the users are paged by name together with the number of their habits.
+        test_iterate_completed_tasks()
+            Tests that live and archived tasks are read page by page and filtered by day.
+        test_instrumentation()
+            Tests that the calls of the db functions and their SQL statements are recorded.
+        test_generate_dataset()
+            Tests that synthetic datasets are reproducible and consistent with the streak computation.
+        test_query_plans()
+            Tests that the SQL statements of the db module search habits, tasks, and users through an index.
+        test_migrations()
+            Tests that a database created with the first schema version is upgraded with correct streaks.
         teardown_method()
             Removes the test database file from the system.
     """
@@ -63,7 +177,8 @@ class TestHabits:
                     })
 
         cur.execute("""INSERT INTO habits VALUES (
-                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)""",
+                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest,
+                    :current_streak)""",
                     {
                         "habit_id": "some id",
                         "name": "first habit",
@@ -72,10 +187,12 @@ class TestHabits:
                         "period": 2,
                         "deadline": self.deadline,
                         "is_active": True,
-                        "longest": 7
+                        "longest": 7,
+                        "current_streak": 2
                     })
         cur.execute("""INSERT INTO habits VALUES (
-                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)""",
+                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest,
+                    :current_streak)""",
                     {
                         "habit_id": "some other id",
                         "name": "second habit",
@@ -84,10 +201,12 @@ class TestHabits:
                         "period": 5,
                         "deadline": self.deadline,
                         "is_active": True,
-                        "longest": 9
+                        "longest": 9,
+                        "current_streak": 1
                     })
         cur.execute("""INSERT INTO habits VALUES (
-                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)""",
+                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest,
+                    :current_streak)""",
                     {
                         "habit_id": "another id",
                         "name": "third habit",
@@ -96,10 +215,12 @@ class TestHabits:
                         "period": 2,
                         "deadline": self.deadline,
                         "is_active": True,
-                        "longest": 0
+                        "longest": 0,
+                        "current_streak": 0
                     })
         cur.execute("""INSERT INTO habits VALUES (
-                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)""",
+                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest,
+                    :current_streak)""",
                     {
                         "habit_id": "different user id",
                         "name": "different user habit",
@@ -108,10 +229,12 @@ class TestHabits:
                         "period": 1,
                         "deadline": self.deadline,
                         "is_active": True,
-                        "longest": 0
+                        "longest": 0,
+                        "current_streak": 0
                     })
         cur.execute("""INSERT INTO habits VALUES (
-                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest)""",
+                    :habit_id, :name, :user_name, :created, :period, :deadline, :is_active, :longest,
+                    :current_streak)""",
                     {
                         "habit_id": "inactive id",
                         "name": "inactive habit",
@@ -120,25 +243,26 @@ class TestHabits:
                         "period": 2,
                         "deadline": self.deadline,
                         "is_active": False,
-                        "longest": 83
+                        "longest": 83,
+                        "current_streak": 0
                     })
-        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_name)",
+        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_id)",
                     {
                         "task_id": "1",
                         "created": self.created,
-                        "habit_name": "first habit"
+                        "habit_id": "some id"
                     })
-        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_name)",
+        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_id)",
                     {
                         "task_id": "2",
                         "created": self.created,
-                        "habit_name": "first habit"
+                        "habit_id": "some id"
                     })
-        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_name)",
+        cur.execute("INSERT INTO tasks VALUES (:task_id, :created, :habit_id)",
                     {
                         "task_id": "1",
                         "created": self.created,
-                        "habit_name": "second habit"
+                        "habit_id": "some other id"
                     })
         self.db.commit()
 
@@ -192,6 +316,14 @@ class TestHabits:
         received_object = get_user_by_name(self.db, another_user.user_name)
         assert type(received_object) is User and received_object.user_name == "some other user"
 
+        # Test that adding a user with the same name raises a UserNameAlreadyExistsError
+        try:
+            add_user(self.db, another_user)
+        except UserNameAlreadyExistsError:
+            pass
+        else:
+            pytest.fail()
+
         # Test that a list with all stored users is returned
         all_users = get_all_users(self.db)
         assert type(all_users) == list and len(all_users) == 3
@@ -208,6 +340,14 @@ class TestHabits:
         remove_user(self.db, "test admin", "some other user")
         assert len(get_all_users(self.db)) == 2
 
+        # Test that removing a non-existent user raises a UserNameIsUnknownError
+        try:
+            remove_user(self.db, "test admin", "some other user")
+        except UserNameIsUnknownError:
+            pass
+        else:
+            pytest.fail()
+
         # Test that correct boolean is returned
         assert validate_password(self.db, "test user", "some password") is True
         assert validate_password(self.db, "test user", "incorrect password") is False
@@ -222,6 +362,12 @@ class TestHabits:
         assert type(received_object) is Habit and received_object.name == "first habit"
         assert received_object.current_streak == 2 and received_object.longest_streak == 7
 
+        # Test that datetimes are stored as integer epoch seconds and received as datetime instances
+        cur = self.db.cursor()
+        cur.execute("SELECT DISTINCT typeof(created), typeof(deadline) FROM habits")
+        assert cur.fetchall() == [("integer", "integer")]
+        assert received_object.created == self.created and received_object.deadline == self.deadline
+
         # Test that the correct list with all stored habits is received from database
         all_active_habits = get_all_habits(self.db, "test user", True)
         assert type(all_active_habits) == list and len(all_active_habits) == 3
@@ -256,6 +402,22 @@ class TestHabits:
         received_object = get_habit_by_name(self.db, test_habit.name, "test user")
         assert received_object.current_streak == 1 and received_object.longest_streak == 1
 
+        # Test that the current streak is reset if the deadline has passed
+        overdue_habit = Habit(
+            habit_id="overdue id",
+            name="overdue habit",
+            created=self.created,
+            period=1,
+            deadline=datetime.now().replace(microsecond=0) - timedelta(days=3),
+            is_active=True)
+        add_habit(self.db, overdue_habit, "test user")
+        update_streaks(self.db, overdue_habit.name, "test user")
+        update_streaks(self.db, overdue_habit.name, "test user")
+        received_object = get_habit_by_name(self.db, overdue_habit.name, "test user")
+        assert received_object.current_streak == 0 and received_object.longest_streak == 0
+        assert received_object.deadline == overdue_habit.deadline + timedelta(days=2)
+        remove_habit(self.db, overdue_habit.name, "test user")
+
         # Test that the habit active status is changed to inactive in the database
         update_active_status(self.db, test_habit.name, "test user", False)
         received_object = get_habit_by_name(self.db, test_habit.name, "test user")
@@ -287,9 +449,28 @@ class TestHabits:
             pytest.fail()
 
         # Test that all completed tasks for a habit are received from database
-        received_tasks = get_all_tasks(self.db, "first habit")
+        received_tasks = get_all_tasks(self.db, "first habit", "test user")
         assert type(received_tasks) is list and len(received_tasks) == 2
 
+        # Test that habits with the same name of different users do not share their tasks
+        same_name_habit = Habit(
+            habit_id="same name id",
+            name="first habit",
+            created=self.created,
+            period=2,
+            deadline=self.deadline,
+            is_active=True)
+        add_habit(self.db, same_name_habit, "different user")
+        update_streaks(self.db, same_name_habit.name, "different user")
+        assert len(get_all_tasks(self.db, "first habit", "different user")) == 1
+        assert len(get_all_tasks(self.db, "first habit", "test user")) == 2
+
+        # Test that the tasks of a habit are removed together with the habit
+        remove_habit(self.db, same_name_habit.name, "different user")
+        cur.execute("SELECT COUNT(*) FROM tasks WHERE habit_id='same name id'")
+        assert cur.fetchone()[0] == 0
+        assert len(get_all_tasks(self.db, "first habit", "test user")) == 2
+
     def test_analysis(self):
         """Tests functionalities of the analysis module."""
 
@@ -333,11 +514,903 @@ class TestHabits:
         assert output == ["second habit with 9 times"]
 
         # Test that all completed tasks for a habit are returned
-        completed_tasks = get_all_tasks(self.db, "first habit")
+        completed_tasks = get_all_tasks(self.db, "first habit", "test user")
         choice = "Completed tasks."
         output = analyse_habits(choice, completed_tasks=completed_tasks)
         assert output == ['1. Task. Completed on: 2022-04-21 18:00:00', '2. Task. Completed on: 2022-04-21 18:00:00']
 
+    def test_unit_of_work(self):
+        """Tests that composite operations are committed in a single transaction."""
+
+        executed_statements = []
+        self.db.set_trace_callback(executed_statements.append)
+
+        # Test that updating the streaks of a habit is committed exactly once
+        update_streaks(self.db, "third habit", "test user")
+        assert executed_statements.count("COMMIT") == 1
+
+        # Test that removing a habit and its tasks is committed exactly once
+        executed_statements.clear()
+        remove_habit(self.db, "first habit", "test user")
+        assert executed_statements.count("COMMIT") == 1
+        self.db.set_trace_callback(None)
+
+        # Test that all operations of a failed unit of work are rolled back
+        try:
+            with unit_of_work(self.db):
+                remove_habit(self.db, "second habit", "test user")
+                remove_habit(self.db, "non existing habit", "test user")
+        except HabitNameIsUnknownError:
+            pass
+        else:
+            pytest.fail()
+        assert type(get_habit_by_name(self.db, "second habit", "test user")) is Habit
+        assert len(get_all_tasks(self.db, "second habit", "test user")) == 1
+
+    def test_connection_profiles(self):
+        """Tests that the tuning profiles are applied to new connections."""
+
+        # Test that a connection without profile keeps the SQLite defaults
+        assert get_connection_settings(self.db)["profile"] is None
+
+        # Test that the chosen profile is reported back by the connection
+        for profile in ["durable", "throughput", "analytics"]:
+            profile_db = connect_to_db("profile_test.db", profile)
+            settings = get_connection_settings(profile_db)
+            profile_db.close()
+            assert settings["profile"] == profile and settings["journal_mode"] == "wal"
+        os.remove("profile_test.db")
+
+    def test_query_counts(self):
+        """Tests the number of SQL statements issued by the db_logic and user_logic functions."""
+
+        # Test that all habits including their current streaks are received with a single statement
+        with count_statements(self.db) as executed_statements:
+            all_active_habits = get_all_habits(self.db, "test user", True)
+        assert len(executed_statements) == 1
+        assert [habit.current_streak for habit in all_active_habits] == [2, 1, 0]
+
+        # Test that a single habit including its current streak is received with a single statement
+        with count_statements(self.db) as executed_statements:
+            received_object = get_habit_by_name(self.db, "first habit", "test user")
+        assert len(executed_statements) == 1 and received_object.current_streak == 2
+
+        # Test that several habits are received by name with a single statement, unknown names are skipped
+        with count_statements(self.db) as executed_statements:
+            received_objects = get_habits_by_names(self.db, ["second habit", "unknown habit", "first habit"],
+                                                   "test user")
+        assert len(executed_statements) == 1
+        assert sorted(habit.name for habit in received_objects) == ["first habit", "second habit"]
+
+        # Test that a query executed twice in a row is counted twice while trigger echoes are not counted
+        with count_statements(self.db) as executed_statements:
+            get_habit_by_name(self.db, "first habit", "test user")
+            get_habit_by_name(self.db, "first habit", "test user")
+        assert len(executed_statements) == 2 and executed_statements[0] == executed_statements[1]
+
+        # Test that no public function issues more statements than its upper bound, writes count their transaction
+        second_habit = get_habit_by_name(self.db, "second habit", "test user")
+        build_missing_completion_bitmaps(self.db, "test user")
+        now = datetime.now()
+        upper_bounds = [
+            (get_all_habits, lambda: get_all_habits(self.db, "test user", True, streaks_from_bitmap=True), 2),
+            (get_habit_by_name, lambda: get_habit_by_name(self.db, "first habit", "test user", True), 2),
+            (get_habits_by_names, lambda: get_habits_by_names(self.db, ["first habit"], "test user"), 1),
+            (search_habits, lambda: search_habits(self.db, "test user", "habit"), 2),
+            (get_completion_bitmap, lambda: get_completion_bitmap(self.db, second_habit, "test user"), 1),
+            (build_missing_completion_bitmaps, lambda: build_missing_completion_bitmaps(self.db, "test user"), 3 + 2),
+            (get_all_tasks, lambda: get_all_tasks(self.db, "first habit", "test user"), 2),
+            (iterate_completed_tasks, lambda: list(iterate_completed_tasks(self.db, "first habit", "test user")), 2),
+            (update_streaks, lambda: update_streaks(self.db, "different user habit", "different user"), 6),
+            # A stored bitmap is kept up to date with one more statement
+            (update_streaks, lambda: update_streaks(self.db, "second habit", "test user"), 7),
+            (update_active_status, lambda: update_active_status(self.db, "third habit", "test user", False), 4),
+            (expire_overdue_habits, lambda: expire_overdue_habits(self.db, now), 3),
+            (get_daily_completions,
+             lambda: get_daily_completions(self.db, "first habit", "test user", self.created.date(), now.date()), 1),
+            (get_weekly_completions,
+             lambda: get_weekly_completions(self.db, "first habit", "test user", self.created.date(), now.date()), 1),
+            (get_habit_counts, lambda: get_habit_counts(self.db, "test user"), 1),
+            (add_habit, lambda: add_habit(self.db, Habit("new id", "new habit", self.created, 1, self.deadline, True),
+                                          "test user"), 3),
+            (remove_habit, lambda: remove_habit(self.db, "new habit", "test user"), 3),
+            (import_habits, lambda: import_habits(self.db, [
+                Habit(f"imported id {number}", f"imported habit {number}", self.created, 1, self.deadline, True)
+                for number in range(2)
+            ], "test user"), 4),
+            (import_tasks, lambda: import_tasks(self.db, [Task(str(number), self.created) for number in range(3, 5)],
+                                                "imported id 0"), 4),
+            # One statement to find the habits with old tasks and one transaction per found habit
+            (archive_tasks, lambda: archive_tasks(self.db, 1, now), 1 + 3 * 5),
+            (validate_password, lambda: validate_password(self.db, "test user", "some password"), 1),
+            (get_user_by_name, lambda: get_user_by_name(self.db, "test user"), 1),
+            (add_user, lambda: add_user(self.db, User("new user", "some password")), 3),
+            (get_all_users, lambda: get_all_users(self.db), 1),
+            (get_users_page, lambda: get_users_page(self.db, None, 20, "test"), 1),
+            (remove_user, lambda: remove_user(self.db, "test admin", "new user"), 4)
+        ]
+        for function, call, upper_bound in upper_bounds:
+            with count_statements(self.db) as executed_statements:
+                call()
+            assert len(executed_statements) <= upper_bound, \
+                f"{function.__name__} issued {len(executed_statements)} statements: {executed_statements}"
+
+        # Test that every public function has an upper bound, only the functions opening connections are exempt
+        public_functions = {
+            name for module in [db_logic, user_logic]
+            for name, function in inspect.getmembers(module, inspect.isfunction)
+            if function.__module__ == module.__name__ and not name.startswith("_")
+        }
+        assert public_functions - {"connect_to_db", "create_connection_pool"} == \
+               {function.__name__ for function, _, _ in upper_bounds}
+
+    def test_bulk_import(self):
+        """Tests that habits and tasks are imported in bulk without duplicates."""
+
+        # Test that Habit instances and habit rows are imported, existing habits are skipped
+        imported_habits = [
+            Habit(f"imported id {number}", f"imported habit {number}", self.created, 1, self.deadline, True)
+            for number in range(5)
+        ]
+        report = import_habits(self.db, imported_habits, "test user", chunk_size=2)
+        assert report["rows"] == 5 and report["inserted"] == 5 and report["rows_per_second"] > 0
+        report = import_habits(self.db, [
+            ("first habit id", "first habit", "test user", self.created, 1, self.deadline, True, 0, 0),
+            ("imported row id", "imported row habit", "test user", self.created, 1, self.deadline, True, 0, 0)
+        ])
+        assert report["rows"] == 2 and report["inserted"] == 1
+        assert len(get_all_habits(self.db, "test user", True)) == 9
+
+        # Test that Task instances and task rows are imported, existing tasks are skipped
+        imported_tasks = [Task(str(number), self.created + timedelta(days=number)) for number in range(100)]
+        report = import_tasks(self.db, imported_tasks, "imported id 0", chunk_size=30)
+        assert report["rows"] == 100 and report["inserted"] == 100
+        report = import_tasks(self.db, [(task.task_id, task.created, "imported id 1") for task in imported_tasks])
+        assert report["inserted"] == 100
+        report = import_tasks(self.db, imported_tasks, "imported id 0")
+        assert report["rows"] == 100 and report["inserted"] == 0
+        assert len(get_all_tasks(self.db, "imported habit 0", "test user")) == 100
+
+        # Test that a chunk with a task of an unknown habit is not stored
+        try:
+            import_tasks(self.db, [("new task", self.created, "imported id 2"),
+                                   ("new task", self.created, "unknown id")])
+        except HabitIdIsUnknownError:
+            pass
+        else:
+            pytest.fail()
+        assert get_all_tasks(self.db, "imported habit 2", "test user") == []
+        assert not self.db.in_transaction
+
+    def test_export(self):
+        """Tests functionalities of the export module."""
+
+        # Test that the habits of a user are exported as CSV
+        file = io.StringIO()
+        assert export_habits(self.db, file, "csv", "test user", batch_size=2) == 4
+        lines = file.getvalue().splitlines()
+        assert lines[0].startswith("habit_id,name,user_name") and len(lines) == 5
+        assert lines[1] == "some id,first habit,test user,2022-04-21 18:00:00,2,2032-04-21 18:00:00,1,7,2"
+
+        # Test that all tasks and the tasks of a single habit are exported as JSONL
+        file = io.StringIO()
+        assert export_tasks(self.db, file, "jsonl") == 3
+        file = io.StringIO()
+        assert export_tasks(self.db, file, "jsonl", "test user", "second habit") == 1
+        assert json.loads(file.getvalue()) == {
+            "task_id": "1",
+            "created": "2022-04-21 18:00:00",
+            "habit_id": "some other id",
+            "habit_name": "second habit",
+            "user_name": "test user"
+        }
+
+        # Test that the command line export keeps the journal mode of the database file
+        export_main(["tasks", "--db", "test.db", "--output", "export_test.csv"])
+        try:
+            with open("export_test.csv", encoding="utf-8") as file:
+                assert len(file.read().splitlines()) == 4
+        finally:
+            os.remove("export_test.csv")
+        assert self.db.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+        # Test that the command line export fails for a missing database without creating it
+        try:
+            export_main(["habits", "--db", "missing_test.db"])
+        except SystemExit as error:
+            assert error.code == 2
+        else:
+            pytest.fail()
+        assert not os.path.exists("missing_test.db")
+
+    def test_archive(self):
+        """Tests that old tasks are archived and still read together with the live tasks."""
+
+        # Test that the history is restored in ascending order
+        history = [self.created + timedelta(days=days, seconds=days * 7) for days in [9, 0, 3, 1]]
+        assert decompress_history(compress_history(history)) == sorted(history)
+
+        # Test that only tasks older than the given number of periods of their habit are archived
+        now = self.created + timedelta(days=10)
+        assert archive_tasks(self.db, periods=2, now=now) == 2
+        assert archive_tasks(self.db, periods=2, now=now) == 0
+        cur = self.db.cursor()
+        cur.execute("SELECT COUNT(*) FROM tasks")
+        assert cur.fetchone()[0] == 1
+
+        # Test that archived and live tasks are read together
+        cur.execute("INSERT INTO tasks VALUES ('3', :created, 'some id')", {"created": now})
+        self.db.commit()
+        assert archive_tasks(self.db, periods=1, now=now + timedelta(days=3)) == 2
+        all_tasks = get_all_tasks(self.db, "first habit", "test user")
+        assert [task.task_id for task in all_tasks] == [None, None, None]
+        assert [task.created for task in all_tasks] == [self.created, self.created, now]
+        assert len(get_all_tasks(self.db, "second habit", "test user")) == 1
+
+        # Test that archived tasks are exported and deleted together with their habit
+        file = io.StringIO()
+        assert export_tasks(self.db, file, "jsonl") == 4
+        remove_habit(self.db, "first habit", "test user")
+        cur.execute("SELECT COUNT(*) FROM task_archives")
+        assert cur.fetchone()[0] == 1
+
+    def test_completion_bitmap(self):
+        """Tests the streaks computed from completion bitmaps."""
+
+        # Test that streaks and rates are computed from the completed periods
+        completion_bitmap = CompletionBitmap(self.created, 2)
+        for days in [0, 1, 3, 5, 9, 11]:
+            completion_bitmap.mark(self.created + timedelta(days=days))
+        assert completion_bitmap.is_completed(2) and not completion_bitmap.is_completed(3)
+        assert completion_bitmap.longest_streak() == 3
+        assert completion_bitmap.current_streak(self.created + timedelta(days=11)) == 2
+        assert completion_bitmap.current_streak(self.created + timedelta(days=13)) == 2
+        assert completion_bitmap.current_streak(self.created + timedelta(days=15)) == 0
+        assert completion_bitmap.completion_rate(self.created + timedelta(days=11)) == 5 / 6
+        assert CompletionBitmap(self.created, 2, completion_bitmap.to_bytes()).longest_streak() == 3
+
+        # Test that reading the streaks never writes, a habit without bitmap keeps its stored streaks
+        test_habit = get_habit_by_name(self.db, "first habit", "test user", streaks_from_bitmap=True)
+        assert test_habit.current_streak == 2 and test_habit.longest_streak == 7
+        assert get_completion_bitmap(self.db, test_habit, "test user").longest_streak() == 1
+        assert get_completion_bitmap_item(self.db, "some id") is None
+
+        # Test that the missing bitmaps are built by the maintenance call and kept up to date by completions
+        assert build_missing_completion_bitmaps(self.db, "test user") == 4
+        assert build_missing_completion_bitmaps(self.db, "test user") == 0
+        test_habit = get_habit_by_name(self.db, "first habit", "test user", streaks_from_bitmap=True)
+        assert test_habit.current_streak == 0 and test_habit.longest_streak == 1
+        update_streaks(self.db, "first habit", "test user")
+        completed = datetime.now()
+        test_habits = get_all_habits(self.db, "test user", True, streaks_from_bitmap=True)
+        assert [habit.current_streak for habit in test_habits if habit.habit_id == "some id"] == [1]
+        completion_bitmap = get_completion_bitmap(self.db, test_habit, "test user")
+        assert completion_bitmap.is_completed(completion_bitmap.period_of(completed))
+
+        # Test that a completion leaves a missing bitmap to the maintenance call
+        update_streaks(self.db, "different user habit", "different user")
+        assert get_completion_bitmap_item(self.db, "different user id") is None
+
+        # Test that storing tasks in another way discards the bitmap
+        import_tasks(self.db, [("bitmap task", self.created + timedelta(days=1), "some id")])
+        assert get_completion_bitmap_item(self.db, "some id") is None
+
+    def test_async_database(self):
+        """Tests functionalities of the AsyncDatabase class with concurrent coroutines."""
+
+        async def use_database():
+            async with AsyncDatabase("async_test.db", workers=4) as database:
+                await database.add_user(User("async user", "password"))
+                await asyncio.gather(*[
+                    database.add_habit(Habit(f"id {number}", f"habit {number}", self.created, 1, self.deadline, True),
+                                       "async user")
+                    for number in range(20)
+                ])
+                await asyncio.gather(*[
+                    database.update_streaks(f"habit {number}", "async user") for number in range(20)
+                ])
+                habits, tasks, user = await asyncio.gather(
+                    database.get_all_habits("async user", True),
+                    database.get_all_tasks("habit 0", "async user"),
+                    database.get_user_by_name("async user")
+                )
+                assert len(habits) == 20 and all(habit.current_streak == 1 for habit in habits)
+                assert len(tasks) == 1 and isinstance(tasks[0], Task)
+                assert user.user_name == "async user"
+                await database.update_streaks("habit 1", "async user", self.created + timedelta(days=1))
+                tasks = await database.get_all_tasks("habit 1", "async user")
+                assert tasks[0].created == self.created + timedelta(days=1)
+                found_habits = await database.search_habits("async user", "habit 1", 11, True)
+                assert sorted(habit.name for habit in found_habits) == [
+                    f"habit {number}" for number in [1, *range(10, 20)]
+                ]
+                completed_tasks = [
+                    task async for task in database.iterate_completed_tasks("habit 1", "async user", page_size=1)
+                ]
+                assert [task.created for task in completed_tasks] == [task.created for task in tasks]
+                try:
+                    await database.add_habit(Habit("id 0", "habit 0", self.created, 1, self.deadline, True),
+                                             "async user")
+                except HabitNameAlreadyExistsError:
+                    pass
+                else:
+                    pytest.fail()
+
+        try:
+            asyncio.run(use_database())
+        finally:
+            os.remove("async_test.db")
+
+    def test_connection_pool(self):
+        """Tests functionalities of the ConnectionPool class with concurrent threads."""
+        pool = create_connection_pool("pool_test.db", size=2)
+
+        def complete_habit(number):
+            with pool.write() as db:
+                add_habit(db, Habit(f"id {number}", f"habit {number}", self.created, 1, self.deadline, True),
+                          "pool user")
+                update_streaks(db, f"habit {number}", "pool user")
+            with pool.read() as db:
+                return get_habit_by_name(db, f"habit {number}", "pool user").current_streak
+
+        try:
+            # Test that many threads share the connections of the pool
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                assert list(executor.map(complete_habit, range(16))) == [1] * 16
+
+            # Test that nested checkouts of a thread return the same connection
+            with pool.read() as db:
+                with pool.read() as nested_db:
+                    assert nested_db is db
+            with pool.write() as db:
+                with pool.read() as nested_db:
+                    assert nested_db is db
+
+            # Test that the reader connections refuse writes
+            with pool.read() as db:
+                try:
+                    add_habit(db, Habit("read id", "read habit", self.created, 1, self.deadline, True), "pool user")
+                except sqlite3.OperationalError:
+                    pass
+                else:
+                    pytest.fail()
+
+            # Test that a closed connection fails once and is replaced after the error
+            with pool.read() as db:
+                db.close()
+            failures = 0
+            for _ in range(3):
+                try:
+                    with pool.read() as db:
+                        assert len(get_all_habits(db, "pool user", True)) == 16
+                except sqlite3.ProgrammingError:
+                    failures += 1
+            assert failures == 1
+        finally:
+            pool.close()
+            os.remove("pool_test.db")
+
+    def test_memory_storage(self):
+        """Tests the db_logic and user_logic functions on the in-memory storage."""
+        storage = MemoryStorage()
+
+        # Test that users and habits are stored and read like in the database
+        add_user(storage, User("memory user", "password"))
+        add_user(storage, User("memory admin", "password", "True"))
+        add_habit(storage, Habit("id 1", "first habit", self.created, 2, self.deadline, True), "memory user")
+        add_habit(storage, Habit("id 2", "second habit", self.created, 3, self.deadline, True), "memory user")
+        update_streaks(storage, "first habit", "memory user")
+        update_active_status(storage, "second habit", "memory user", False)
+        assert validate_password(storage, "memory user", "password")
+        assert [user.user_name for user in get_all_users(storage)] == ["memory user", "memory admin"]
+        test_habit = get_habit_by_name(storage, "first habit", "memory user")
+        assert test_habit.current_streak == 1 and test_habit.longest_streak == 1
+        assert [habit.name for habit in get_all_habits(storage, "memory user", False)] == ["second habit"]
+        assert len(get_all_tasks(storage, "first habit", "memory user")) == 1
+        try:
+            add_habit(storage, Habit("id 3", "first habit", self.created, 2, self.deadline, True), "memory user")
+        except HabitNameAlreadyExistsError:
+            pass
+        else:
+            pytest.fail()
+        try:
+            remove_user(storage, "memory user", "memory admin")
+        except MissingAuthorizationError:
+            pass
+        else:
+            pytest.fail()
+
+        # Test that a failed unit of work leaves no changes behind
+        try:
+            with storage.unit_of_work():
+                update_streaks(storage, "first habit", "memory user")
+                remove_habit(storage, "unknown habit", "memory user")
+        except HabitNameIsUnknownError:
+            pass
+        else:
+            pytest.fail()
+        assert get_habit_by_name(storage, "first habit", "memory user").current_streak == 1
+        assert len(get_all_tasks(storage, "first habit", "memory user")) == 1
+
+        # Test that bulk imports skip duplicates and that removing a habit removes its tasks
+        assert import_tasks(storage, [("1", self.created, "id 1"), ("1", self.created, "id 1")])["inserted"] == 1
+        try:
+            import_tasks(storage, [("2", self.created, "id 1"), ("2", self.created, "unknown id")])
+        except HabitIdIsUnknownError:
+            pass
+        else:
+            pytest.fail()
+        assert archive_tasks(storage, periods=1, now=self.created + timedelta(days=3)) == 1
+        assert len(get_all_tasks(storage, "first habit", "memory user")) == 2
+        remove_habit(storage, "first habit", "memory user")
+        assert get_all_tasks(storage, "first habit", "memory user") == []
+
+    def test_completion_queue(self):
+        """Tests that queued completions are written in batches by the CompletionQueue class."""
+        completions = CompletionQueue("test.db", flush_interval=10, max_batch=2)
+        try:
+            # Test that all queued completions are written in order on flush
+            now = datetime.now().replace(microsecond=0)
+            for hours in range(3):
+                completions.complete("first habit", "test user", now + timedelta(hours=hours))
+            completions.complete("unknown habit", "test user")
+            completions.flush()
+            test_habit = get_habit_by_name(self.db, "first habit", "test user")
+            assert test_habit.current_streak == 5 and test_habit.longest_streak == 7
+            assert test_habit.deadline == now + timedelta(hours=2, days=test_habit.period)
+            assert len(get_all_tasks(self.db, "first habit", "test user")) == 5
+
+            # Test that a failed completion is reported without losing the others
+            assert [error[0] for error in completions.errors] == ["unknown habit"]
+
+            # Test that a late completion resets the streak
+            completions.complete("first habit", "test user", now + timedelta(days=30))
+        finally:
+            completions.close()
+        assert get_habit_by_name(self.db, "first habit", "test user").current_streak == 0
+
+        # Test that flush returns after close and that a writer that can not connect is reported to the caller
+        completions.flush()
+        try:
+            CompletionQueue(os.path.join("missing directory", "test.db"))
+        except sqlite3.OperationalError:
+            pass
+        else:
+            pytest.fail()
+
+    def test_sweeper(self):
+        """Tests that overdue habits are expired in bulk."""
+
+        # Test that no habit is expired before its deadline
+        sweeper = DeadlineSweeper("test.db", interval=10)
+        sweeper.start()
+        sweeper.stop()
+        assert sweeper.expired == 0
+
+        # Test that active overdue habits are reset and their deadline is moved by whole periods
+        now = self.deadline + timedelta(days=5)
+        assert expire_overdue_habits(self.db, now) == 4
+        test_habit = get_habit_by_name(self.db, "first habit", "test user")
+        assert test_habit.current_streak == 0 and test_habit.longest_streak == 7
+        assert test_habit.deadline == self.deadline + timedelta(days=6)
+        assert get_habit_by_name(self.db, "second habit", "test user").deadline == self.deadline + timedelta(days=10)
+        assert get_habit_by_name(self.db, "inactive habit", "test user").deadline == self.deadline
+        assert expire_overdue_habits(self.db, now) == 0
+
+        # Test that the in-memory storage expires the same habits
+        storage = MemoryStorage()
+        add_habit(storage, Habit("id 1", "first habit", self.created, 2, self.deadline, True), "memory user")
+        update_streaks(storage, "first habit", "memory user")
+        assert expire_overdue_habits(storage, now) == 1
+        test_habit = get_habit_by_name(storage, "first habit", "memory user")
+        assert test_habit.current_streak == 0 and test_habit.deadline > now
+
+        # Test that the command line sweeper fails for a missing database without creating it
+        try:
+            sweeper_main(["--db", "missing_test.db"])
+        except SystemExit as error:
+            assert error.code == 2
+        else:
+            pytest.fail()
+        assert not os.path.exists("missing_test.db")
+
+    def test_rollups(self):
+        """Tests that the completion and habit count rollups are kept up to date."""
+
+        # Test that completed tasks are counted per day and per ISO week
+        day = self.created.date()
+        assert get_daily_completions(self.db, "first habit", "test user", day, day) == {day: 2}
+        assert get_daily_completions(self.db, "first habit", "test user", day + timedelta(days=1),
+                                     day + timedelta(days=9)) == {}
+        update_streaks(self.db, "first habit", "test user", self.created + timedelta(days=4))
+        assert get_weekly_completions(self.db, "first habit", "test user", day, day + timedelta(days=4)) == {
+            (2022, 16): 2,
+            (2022, 17): 1
+        }
+
+        # Test that active and paused habits are counted per user
+        assert get_habit_counts(self.db, "test user") == {"active": 3, "paused": 1}
+        update_active_status(self.db, "first habit", "test user", False)
+        remove_habit(self.db, "second habit", "test user")
+        assert get_habit_counts(self.db, "test user") == {"active": 1, "paused": 2}
+        assert get_habit_counts(self.db, "unknown user") == {"active": 0, "paused": 0}
+
+        # Test that archived tasks stay counted and that the migration counts archived and live tasks
+        assert archive_tasks(self.db, periods=1, now=self.created + timedelta(days=30)) == 3
+        assert get_daily_completions(self.db, "first habit", "test user", day, day) == {day: 2}
+        cur = self.db.cursor()
+        for table in ["daily_completions", "weekly_completions", "habit_counts"]:
+            cur.execute(f"DROP TABLE {table}")
+        cur.execute("PRAGMA user_version = 7")
+        self.db.commit()
+        self.db.close()
+        self.db = connect_to_db("test.db")
+        assert get_weekly_completions(self.db, "first habit", "test user", day, day + timedelta(days=4)) == {
+            (2022, 16): 2,
+            (2022, 17): 1
+        }
+        assert get_habit_counts(self.db, "test user") == {"active": 1, "paused": 2}
+
+        # Test that the in-memory storage keeps the same rollups
+        storage = MemoryStorage()
+        add_habit(storage, Habit("id 1", "first habit", self.created, 2, self.deadline, True), "memory user")
+        update_streaks(storage, "first habit", "memory user", self.created)
+        update_active_status(storage, "first habit", "memory user", False)
+        assert get_daily_completions(storage, "first habit", "memory user", day, day) == {day: 1}
+        assert get_weekly_completions(storage, "first habit", "memory user", day, day) == {(2022, 16): 1}
+        assert get_habit_counts(storage, "memory user") == {"active": 0, "paused": 1}
+
+    def test_search_habits(self):
+        """Tests that habits are searched by prefix, by part of their name, and by similar names."""
+
+        # Test that short queries are matched as prefix and longer ones anywhere in the name of the user's habits
+        assert [habit.name for habit in search_habits(self.db, "test user", "fi")] == ["first habit"]
+        assert [habit.name for habit in search_habits(self.db, "test user", "", limit=2)] == [
+            "first habit", "inactive habit"
+        ]
+        assert search_habits(self.db, "test user", "HABIT", limit=2)[0].name in ["first habit", "third habit"]
+        assert len(search_habits(self.db, "test user", "habit")) == 4
+        assert [habit.name for habit in search_habits(self.db, "test user", "cond")] == ["second habit"]
+
+        # Test that short queries ignore the case like longer ones
+        assert [habit.name for habit in search_habits(self.db, "test user", "FI")] == ["first habit"]
+        assert [habit.name for habit in search_habits(self.db, "test user", "In")] == ["inactive habit"]
+
+        # Test that short queries only ignore the case of ASCII letters while longer ones ignore the case of all
+        add_habit(self.db, Habit("umlaut id", "Ärger los", self.created, 1, self.deadline, True), "test user")
+        assert [habit.name for habit in search_habits(self.db, "test user", "ÄR")] == ["Ärger los"]
+        assert search_habits(self.db, "test user", "är") == []
+        assert [habit.name for habit in search_habits(self.db, "test user", "ärger")] == ["Ärger los"]
+        remove_habit(self.db, "Ärger los", "test user")
+
+        # Test that only the habits with the given active status are searched and counted for the limit
+        assert [habit.name for habit in search_habits(self.db, "test user", "", limit=1, is_active=False)] == [
+            "inactive habit"
+        ]
+        assert [habit.name for habit in search_habits(self.db, "test user", "habit", limit=1, is_active=False)] == [
+            "inactive habit"
+        ]
+        assert len(search_habits(self.db, "test user", "habit", is_active=True)) == 3
+        assert search_habits(self.db, "test user", "secnd", is_active=False) == []
+
+        # Test that similar names are found if the query is not part of any name
+        assert search_habits(self.db, "test user", "secnd")[0].name == "second habit"
+        assert search_habits(self.db, "test user", "xyz") == []
+
+        # Test that the search index follows stored and deleted habits
+        add_habit(self.db, Habit("search id", "evening walk", self.created, 1, self.deadline, True), "test user")
+        remove_habit(self.db, "second habit", "test user")
+        assert [habit.name for habit in search_habits(self.db, "test user", "walk")] == ["evening walk"]
+        assert search_habits(self.db, "test user", "cond") == []
+        assert [habit.name for habit in search_habits(self.db, "different user", "habit")] == [
+            "different user habit"
+        ]
+
+        # Test that the in-memory storage finds the same habits
+        storage = MemoryStorage()
+        for number, name in enumerate(["first habit", "second habit", "evening walk"]):
+            add_habit(storage, Habit(str(number), name, self.created, 1, self.deadline, True), "memory user")
+        assert [habit.name for habit in search_habits(storage, "memory user", "fi")] == ["first habit"]
+        assert [habit.name for habit in search_habits(storage, "memory user", "WALK")] == ["evening walk"]
+        assert search_habits(storage, "memory user", "secnd")[0].name == "second habit"
+        add_habit(storage, Habit("3", "Ärger los", self.created, 1, self.deadline, True), "memory user")
+        assert [habit.name for habit in search_habits(storage, "memory user", "ÄR")] == ["Ärger los"]
+        assert search_habits(storage, "memory user", "är") == []
+        assert [habit.name for habit in search_habits(storage, "memory user", "ärger")] == ["Ärger los"]
+        update_active_status(storage, "first habit", "memory user", False)
+        assert [habit.name for habit in search_habits(storage, "memory user", "FI", is_active=False)] == [
+            "first habit"
+        ]
+        assert search_habits(storage, "memory user", "fi", is_active=True) == []
+
+    def test_users_page(self):
+        """Tests that the users are paged by name together with the number of their habits."""
+
+        # Test that the pages follow each other without gaps or overlaps
+        for number in range(5):
+            add_user(self.db, User(f"paged user {number}", "password"))
+        first_page = get_users_page(self.db, limit=3)
+        assert [user.user_name for user, _ in first_page] == ["paged user 0", "paged user 1", "paged user 2"]
+        second_page = get_users_page(self.db, first_page[-1][0].user_name, 3)
+        assert [user.user_name for user, _ in second_page] == ["paged user 3", "paged user 4", "test admin"]
+        last_page = get_users_page(self.db, second_page[-1][0].user_name, 3)
+        assert [user.user_name for user, _ in last_page] == ["test user"]
+        assert get_users_page(self.db, "test user", 3) == []
+
+        # Test that the habits are counted and that users are filtered by the beginning of their name
+        assert last_page[0][1] == {"active": 3, "paused": 1}
+        assert first_page[0][1] == {"active": 0, "paused": 0}
+        assert [user.user_name for user, _ in get_users_page(self.db, None, 10, "test")] == ["test admin", "test user"]
+
+        # Test that the in-memory storage returns the same pages
+        storage = MemoryStorage()
+        for user_name in ["b user", "a user", "c user"]:
+            add_user(storage, User(user_name, "password"))
+        add_habit(storage, Habit("id 1", "first habit", self.created, 2, self.deadline, True), "b user")
+        memory_page = get_users_page(storage, "a user", 1)
+        assert [user.user_name for user, _ in memory_page] == ["b user"]
+        assert memory_page[0][1] == {"active": 1, "paused": 0}
+
+    def test_iterate_completed_tasks(self):
+        """Tests that live and archived tasks are read page by page and filtered by day."""
+
+        # Test that archived and live tasks are yielded in order across several pages
+        for days in range(1, 8):
+            update_streaks(self.db, "first habit", "test user", self.created + timedelta(days=days))
+        assert archive_tasks(self.db, periods=1, now=self.created + timedelta(days=3)) == 2
+        completed_tasks = list(iterate_completed_tasks(self.db, "first habit", "test user", page_size=2))
+        assert [task.created for task in completed_tasks] == [self.created] + [
+            self.created + timedelta(days=days) for days in range(8)
+        ]
+        assert [task.task_id is None for task in completed_tasks] == [True] * 2 + [False] * 7
+
+        # Test that only the tasks of the given days are yielded
+        first_day = (self.created + timedelta(days=1)).date()
+        completed_tasks = iterate_completed_tasks(self.db, "first habit", "test user", first_day,
+                                                  first_day + timedelta(days=2), page_size=1)
+        assert [task.created for task in completed_tasks] == [
+            self.created + timedelta(days=days) for days in range(1, 4)
+        ]
+        assert list(iterate_completed_tasks(self.db, "unknown habit", "test user")) == []
+
+        # Test that a page of tasks is numbered from the given first number
+        completed_tasks = iterate_completed_tasks(self.db, "first habit", "test user", first_day,
+                                                  first_day + timedelta(days=2), page_size=1)
+        output = analyse_habits("Completed tasks.", completed_tasks=completed_tasks, first_number=3)
+        assert output == [
+            "3. Task. Completed on: 2022-04-22 18:00:00",
+            "4. Task. Completed on: 2022-04-23 18:00:00",
+            "5. Task. Completed on: 2022-04-24 18:00:00"
+        ]
+
+        # Test that the in-memory storage yields the same pages
+        storage = MemoryStorage()
+        add_habit(storage, Habit("id 1", "first habit", self.created, 1, self.deadline, True), "memory user")
+        for days in range(5):
+            update_streaks(storage, "first habit", "memory user", self.created + timedelta(days=days))
+        completed_tasks = iterate_completed_tasks(storage, "first habit", "memory user", first_day, page_size=2)
+        assert [task.created for task in completed_tasks] == [
+            self.created + timedelta(days=days) for days in range(1, 5)
+        ]
+
+    def test_instrumentation(self):
+        """Tests that the calls of the db functions and their SQL statements are recorded."""
+
+        # Test that nothing is recorded while the instrumentation is disabled
+        instrumentation.reset()
+        get_habit_by_name(self.db, "first habit", "test user")
+        assert instrumentation.get_report() == {"functions": {}, "statements": {}}
+
+        # Test that calls, rows, callers, and statements are recorded with literals replaced
+        self.db.close()
+        try:
+            self.db = connect_to_db("test.db", instrumentation="json")
+            get_habit_by_name(self.db, "first habit", "test user")
+            get_habit_by_name(self.db, "second habit", "test user")
+            completed_tasks = list(iterate_completed_tasks(self.db, "first habit", "test user", page_size=1))
+            db_module.store_task_item(self.db, self.created + timedelta(days=1), "some other id")
+            report = instrumentation.get_report()
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+        function_report = report["functions"]["db.get_habit_item_by_name"]
+        assert function_report["calls"] == 2 and function_report["rows"] == 2
+        assert function_report["callers"] == {"db_logic.get_habit_by_name": 2}
+        assert 0 < function_report["p50_ms"] <= function_report["p95_ms"] <= function_report["p99_ms"]
+        assert report["functions"]["db.get_task_items_page"]["calls"] == 3 and len(completed_tasks) == 2
+        statements = [
+            statement for statement, statement_report in report["statements"].items()
+            if statement_report["functions"] == {"db.get_habit_item_by_name": 2}
+        ]
+        assert len(statements) == 1 and "'first habit'" not in statements[0] and "name=?" in statements[0]
+
+        # Test that statements are timed and their changed rows include the rows changed by their triggers
+        statement_report = report["statements"][statements[0]]
+        assert statement_report["changed_rows"] == 0
+        assert 0 < statement_report["p50_ms"] <= statement_report["p95_ms"] <= statement_report["p99_ms"]
+        insert_report = next(statement_report for statement, statement_report in report["statements"].items()
+                             if statement.startswith("INSERT INTO tasks"))
+        assert insert_report["changed_rows"] > 1 and insert_report["p50_ms"] > 0
+
+        # Test that the report is written as JSON and as text table
+        file = io.StringIO()
+        instrumentation.dump(file, "text")
+        assert file.getvalue().startswith("function")
+        file = io.StringIO()
+        instrumentation.dump(file, "json")
+        assert json.loads(file.getvalue()) == {"functions": {}, "statements": {}}
+
+    def test_generate_dataset(self):
+        """Tests that synthetic datasets are reproducible and consistent with the streak computation."""
+
+        # Test that users, habits, and tasks are stored and that generating again stores nothing new
+        now = self.created + timedelta(days=100)
+        result = generate_dataset(self.db, users=20, mean_habits_per_user=3, history_days=60, now=now)
+        assert result["users"] == 20 and result["habits"] >= 20 and result["tasks"] > 0
+        assert validate_password(self.db, "user 7", hashlib.sha3_256("user 7".encode()).hexdigest())
+        repeated = generate_dataset(self.db, users=20, mean_habits_per_user=3, history_days=60, now=now)
+        assert repeated["users"] == 0 and repeated["habits"] == 0
+
+        # Test that the generated streaks match the streaks computed from the generated tasks
+        for habit in get_all_habits(self.db, "user 3", True):
+            completion_bitmap = get_completion_bitmap(self.db, habit, "user 3")
+            assert habit.longest_streak == completion_bitmap.longest_streak()
+            assert habit.current_streak == completion_bitmap.current_streak(now)
+            assert habit.deadline > now
+
+    def test_query_plans(self):
+        """Tests that the SQL statements of the db module search habits, tasks, and users through an index."""
+
+        # Every public function of the db module is called, the third value allows a scan to the calls that read all
+        # rows of a table or its first page in index order. The migrations run before the test and are not checked.
+        calls = [
+            ("store_user_item", lambda: db_module.store_user_item(self.db, "new user", "some password", "False"),
+             False),
+            ("store_user_items", lambda: db_module.store_user_items(
+                self.db, [("new id", "bulk user", "some password", "False")]), False),
+            ("get_user_item_by_name", lambda: db_module.get_user_item_by_name(self.db, "test user"), False),
+            ("get_all_user_items", lambda: db_module.get_all_user_items(self.db), True),
+            ("get_user_items_page", lambda: db_module.get_user_items_page(self.db, None, 20), True),
+            ("get_user_items_page", lambda: db_module.get_user_items_page(self.db, "test admin", 20, "test"), False),
+            ("store_habit_item", lambda: db_module.store_habit_item(
+                self.db, "new habit id", "new habit", "test user", self.created, 1, self.deadline), False),
+            ("store_habit_items", lambda: db_module.store_habit_items(
+                self.db, [("bulk habit id", "bulk habit", "test user", self.created, 1, self.deadline, True, 0, 0)]),
+             False),
+            ("update_streaks_habit_item", lambda: db_module.update_streaks_habit_item(
+                self.db, "first habit", "test user", self.deadline), False),
+            ("reset_streak_habit_item", lambda: db_module.reset_streak_habit_item(
+                self.db, "first habit", "test user", self.deadline), False),
+            ("update_active_status_habit_item", lambda: db_module.update_active_status_habit_item(
+                self.db, "second habit", "test user", self.deadline, False), False),
+            ("expire_overdue_habit_items", lambda: db_module.expire_overdue_habit_items(self.db, self.created), False),
+            ("get_all_habit_items_by_active_status", lambda: db_module.get_all_habit_items_by_active_status(
+                self.db, "test user", True), False),
+            ("get_habit_item_by_name", lambda: db_module.get_habit_item_by_name(self.db, "first habit", "test user"),
+             False),
+            ("get_habit_items_by_names", lambda: db_module.get_habit_items_by_names(
+                self.db, ["first habit", "second habit"], "test user"), False),
+            ("search_habit_items", lambda: db_module.search_habit_items(self.db, "test user", "fi", 10), False),
+            ("search_habit_items", lambda: db_module.search_habit_items(
+                self.db, "test user", "FI", 10, is_active=False), False),
+            ("search_habit_items", lambda: db_module.search_habit_items(self.db, "test user", "habit", 10), False),
+            ("search_habit_items", lambda: db_module.search_habit_items(self.db, "test user", "habbit", 10, True),
+             False),
+            ("store_task_item", lambda: db_module.store_task_item(self.db, self.created, "some id"), False),
+            ("store_task_items", lambda: db_module.store_task_items(self.db, [("bulk id", self.created, "some id")]),
+             False),
+            ("get_tasks_by_habit_name", lambda: db_module.get_tasks_by_habit_name(self.db, "first habit", "test user"),
+             False),
+            ("get_task_items_page", lambda: db_module.get_task_items_page(
+                self.db, "first habit", "test user", None, 20), False),
+            ("get_task_items_page", lambda: db_module.get_task_items_page(
+                self.db, "first habit", "test user", (self.created, "1"), 20, self.created, self.deadline), False),
+            ("iterate_habit_items", lambda: list(db_module.iterate_habit_items(self.db)), True),
+            ("iterate_habit_items", lambda: list(db_module.iterate_habit_items(self.db, "test user")), False),
+            ("iterate_task_items", lambda: list(db_module.iterate_task_items(self.db)), True),
+            ("iterate_task_items", lambda: list(db_module.iterate_task_items(self.db, "test user")), False),
+            ("iterate_task_items", lambda: list(db_module.iterate_task_items(self.db, "test user", "first habit")),
+             False),
+            ("get_habit_periods_with_task_items_before", lambda: db_module.get_habit_periods_with_task_items_before(
+                self.db, 1, self.deadline), True),
+            ("delete_task_items_before", lambda: db_module.delete_task_items_before(self.db, "some id", self.deadline),
+             False),
+            ("store_task_archive_item", lambda: db_module.store_task_archive_item(self.db, "some id", 2, b"history"),
+             False),
+            ("get_task_archive_item", lambda: db_module.get_task_archive_item(self.db, "some id"), False),
+            ("get_task_archive_item_by_habit_name", lambda: db_module.get_task_archive_item_by_habit_name(
+                self.db, "first habit", "test user"), False),
+            ("iterate_task_archive_items", lambda: list(db_module.iterate_task_archive_items(self.db)), True),
+            ("iterate_task_archive_items", lambda: list(db_module.iterate_task_archive_items(self.db, "test user")),
+             False),
+            ("iterate_task_archive_items", lambda: list(db_module.iterate_task_archive_items(
+                self.db, "test user", "first habit")), False),
+            ("store_completion_bitmap_item", lambda: db_module.store_completion_bitmap_item(
+                self.db, "some id", b"\x01"), False),
+            ("get_completion_bitmap_item", lambda: db_module.get_completion_bitmap_item(self.db, "some id"), False),
+            ("get_completion_bitmap_items_by_user", lambda: db_module.get_completion_bitmap_items_by_user(
+                self.db, "test user"), False),
+            ("get_daily_completion_items", lambda: db_module.get_daily_completion_items(
+                self.db, "first habit", "test user", 0, 100000), False),
+            ("get_weekly_completion_items", lambda: db_module.get_weekly_completion_items(
+                self.db, "first habit", "test user", 0, 10000), False),
+            ("get_habit_count_item", lambda: db_module.get_habit_count_item(self.db, "test user"), False),
+            ("delete_habit_item", lambda: db_module.delete_habit_item(self.db, "new habit", "test user"), False),
+            ("delete_user_item", lambda: db_module.delete_user_item(self.db, "new user"), False)
+        ]
+        table_scan = re.compile(r"SCAN (habits|tasks|users)\b")
+        for name, call, scan_allowed in calls:
+            with count_statements(self.db) as executed_statements:
+                call()
+            assert executed_statements, f"{name} issued no statements"
+            for statement in executed_statements:
+                query_plan = [row[3] for row in self.db.execute(f"EXPLAIN QUERY PLAN {statement}")]
+                assert scan_allowed or not any(table_scan.match(step) for step in query_plan), \
+                    f"{name} scans a table: {statement} {query_plan}"
+
+        # Test that every public function of the db module is called, only those that run no query are exempt
+        public_functions = {
+            name for name, function in inspect.getmembers(db_module, inspect.isfunction)
+            if function.__module__ == "db" and not name.startswith("_")
+        }
+        exempt_functions = {"get_db", "get_read_only_db", "get_connection_settings", "datetime_to_epoch",
+                            "epoch_to_datetime", "unit_of_work"}
+        assert public_functions - exempt_functions == {name for name, _, _ in calls}
+
+        # Test that a scan is noticed
+        query_plan = [row[3] for row in self.db.execute("EXPLAIN QUERY PLAN SELECT * FROM habits WHERE period=1")]
+        assert any(table_scan.match(step) for step in query_plan)
+
+    def test_migrations(self):
+        """Tests that a database created with the first schema version is upgraded with correct streaks."""
+
+        # Test that the tasks of a habit name shared by two users only count for the habit they are assigned to
+        old_db = sqlite3.connect("migration_test.db")
+        cur = old_db.cursor()
+        cur.execute("""CREATE TABLE habits (
+            habit_id TEXT PRIMARY KEY,
+            name TEXT,
+            user_name TEXT,
+            created DATETIME,
+            period INT,
+            deadline DATETIME,
+            is_active BOOL,
+            longest INT
+        )""")
+        cur.execute("""CREATE TABLE users (
+            user_id TEXT,
+            user_name TEXT,
+            password TEXT,
+            is_admin BOOL,
+            FOREIGN KEY (user_name) REFERENCES habits(user_name)
+        )""")
+        cur.execute("""CREATE TABLE tasks (
+            task_id TEXT,
+            created DATETIME,
+            habit_name TEXT,
+            FOREIGN KEY (habit_name) REFERENCES habits(name)
+        )""")
+        cur.executemany("INSERT INTO habits VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            ("alice id", "run", "alice", "2022-04-01 18:00:00", 1, "2032-04-21 18:00:00", True, 0),
+            ("bob id", "run", "bob", "2022-04-10 18:00:00", 1, "2032-04-21 18:00:00", True, 0)
+        ])
+        cur.executemany("INSERT INTO tasks VALUES (?, ?, ?)", [
+            (f"task id {day}", f"2022-04-{day} 18:00:00", "run") for day in range(11, 14)
+        ])
+        old_db.commit()
+        old_db.close()
+        try:
+            migrated_db = connect_to_db("migration_test.db")
+            alice_habit = get_habit_by_name(migrated_db, "run", "alice")
+            bob_habit = get_habit_by_name(migrated_db, "run", "bob")
+            alice_tasks = get_all_tasks(migrated_db, "run", "alice")
+            bob_tasks = get_all_tasks(migrated_db, "run", "bob")
+            migrated_db.close()
+        finally:
+            os.remove("migration_test.db")
+        assert alice_tasks == [] and alice_habit.current_streak == 0
+        assert len(bob_tasks) == 3 and bob_habit.current_streak == 3
+
     #
     @staticmethod
     def teardown_method():
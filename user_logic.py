@@ -1,6 +1,9 @@
 """
 Contains the logic to access all database functionalities related to user management.
 
+The db argument of the functions is a sqlite3 connection or any storage of the storage module,
+e.g. storage.MemoryStorage.
+
 Functions:
     validate_password(db: str, user_name: str, password: str) -> bool
         Receives username and password and validates if it matches the database entries.
@@ -12,8 +15,10 @@ Functions:
         Removes a user from the database.
     get_all_users(db: str)
         Returns a list of all stored users.
+    get_users_page(db: str, after: str = None, limit: int = 20, name_prefix: str = None) -> list
+        Returns the next page of users ordered by name together with the number of their habits.
 """
-from db import store_user_item, get_user_item_by_name, delete_user_item, get_all_user_items
+from storage import as_storage
 from custom_exceptions import MissingAuthorizationError
 from user import User
 
@@ -34,7 +39,7 @@ def validate_password(db: str, user_name: str, password: str) -> bool:
         bool
             True if the entered username/password combination matches the database entries, False otherwise.
     """
-    user_item = get_user_item_by_name(db, user_name)
+    user_item = as_storage(db).get_user_item_by_name(user_name)
     if user_item:
         return user_item[0][2] == password
     else:
@@ -55,7 +60,7 @@ def get_user_by_name(db: str, user_name: str) -> User or None:
         User or None
             If user is found in database it is returned as a User instance, if not None is returned
     """
-    user_item = get_user_item_by_name(db, user_name)
+    user_item = as_storage(db).get_user_item_by_name(user_name)
     if user_item is not None:
         return User(
             user_name=user_item[0][1],
@@ -76,7 +81,7 @@ def add_user(db: str, user: User):
         user: User
             The User instance that shall be stored in the database
     """
-    store_user_item(db, user.user_name, user.password, user.is_admin)
+    as_storage(db).store_user_item(user.user_name, user.password, user.is_admin)
 
 
 def remove_user(db: str, active_user: str, user_name: str):
@@ -98,10 +103,12 @@ def remove_user(db: str, active_user: str, user_name: str):
         MissingAuthorizationError
             Raised if a none admin user tries to delete a user
     """
-    if get_user_by_name(db, active_user).is_admin == "True":
-        delete_user_item(db, user_name)
-    else:
-        raise MissingAuthorizationError
+    storage = as_storage(db)
+    with storage.unit_of_work():
+        if get_user_by_name(storage, active_user).is_admin == "True":
+            storage.delete_user_item(user_name)
+        else:
+            raise MissingAuthorizationError
 
 
 def get_all_users(db: str):
@@ -117,7 +124,36 @@ def get_all_users(db: str):
             A list of all the users found in the database, can be empty.
     """
     all_users = []
-    for item in get_all_user_items(db):
+    for item in as_storage(db).get_all_user_items():
         user = User(item[1], item[2], item[3])
         all_users.append(user)
     return all_users
+
+
+def get_users_page(db: str, after: str = None, limit: int = 20, name_prefix: str = None) -> list:
+    """
+    Returns the next page of users ordered by name together with the number of their habits.
+
+    The next page is requested with the name of the last user of the current page as after,
+    an empty page means that there are no more users.
+
+    Params:
+        db: str
+            Name of the database in which the users are stored
+        after: str
+            Name of the last user of the previous page (default None returns the first page)
+        limit: int
+            Highest number of users on the page (default 20)
+        name_prefix: str
+            Only users whose name starts with this prefix are returned (default None returns all users)
+
+    Return:
+        list
+            Tuples of User instance and dict with the number of "active" and "paused" habits of the user
+    """
+    assert limit >= 1, f"Limit {limit} has to be greater or equal than one"
+
+    return [
+        (User(item[1], item[2], item[3]), {"active": item[4], "paused": item[5]})
+        for item in as_storage(db).get_user_items_page(after, limit, name_prefix)
+    ]